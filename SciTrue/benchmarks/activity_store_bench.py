@@ -0,0 +1,79 @@
+#%%
+# Append and lookup cost of the SQLite activity store as the history grows.
+# Run from the SciTrue directory:  python -m benchmarks.activity_store_bench
+import os
+import sys
+import time
+import random
+import tempfile
+import statistics
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from storage.activity_store import (
+    connect,
+    log_activity,
+    find_cached_summary,
+    get_activity_history,
+    get_history_page,
+    _insert_entries,
+)
+
+SIZES = [1_000, 10_000, 100_000, 200_000]
+SAMPLES = 200
+
+
+def make_entry(i):
+    return {
+        "user": f"user{i % 500}@example.com",
+        "email": f"user{i % 500}@example.com",
+        "claim": f"Synthetic claim number {i} about coffee and health",
+        "articles": 1 + i % 15,
+        "summary": "Lorem ipsum " * 40,
+        "overall accuracy": "70/100",
+        "overall reason for accuracy": "Mostly True",
+        "subclaims": [{"claim": f"sub {i}-{j}", "accuracy": "80"} for j in range(5)],
+        "timestamp": "2025-07-01 12:00:00",
+    }
+
+
+def timed(fn, samples=SAMPLES):
+    durations = []
+    for _ in range(samples):
+        start = time.perf_counter()
+        fn()
+        durations.append(time.perf_counter() - start)
+    return statistics.median(durations) * 1e3
+
+
+def main():
+    rng = random.Random(0)
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "bench_activity.db")
+        conn = connect(db_path)
+        size = 0
+        print(f"{'entries':>10} {'append ms':>10} {'hit ms':>10} {'miss ms':>10} {'history ms':>11} "
+              f"{'page ms':>8} {'search ms':>10}")
+        for target in SIZES:
+            conn.execute("BEGIN")
+            _insert_entries(conn, (make_entry(i) for i in range(size, target)))
+            conn.execute("COMMIT")
+            size = target
+
+            counter = iter(range(10 ** 9))
+            append_ms = timed(lambda: log_activity(make_entry(size + next(counter)), db_path))
+            hit_ms = timed(lambda: find_cached_summary(
+                f"Synthetic claim number {rng.randrange(size)} about coffee and health", 1 + rng.randrange(15), db_path))
+            miss_ms = timed(lambda: find_cached_summary("A claim nobody asked", 5, db_path))
+            history_ms = timed(lambda: get_activity_history(f"user{rng.randrange(500)}@example.com", db_path), samples=20)
+            # One page of the history view, and a search over a user's claims.
+            page_ms = timed(lambda: get_history_page(
+                f"user{rng.randrange(500)}@example.com", 10 * rng.randrange(5), 10, None, db_path))
+            search_ms = timed(lambda: get_history_page(
+                f"user{rng.randrange(500)}@example.com", 0, 10, str(rng.randrange(1000)), db_path))
+            print(f"{size:>10} {append_ms:>10.3f} {hit_ms:>10.3f} {miss_ms:>10.3f} {history_ms:>11.3f} "
+                  f"{page_ms:>8.3f} {search_ms:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,215 @@
+#%%
+# Record/replay of the external providers the pipeline talks to (OpenAI,
+# Semantic Scholar retrieval, SJR). Recording wraps the real functions and
+# stores every response with its observed latency; replay serves them back
+# offline with a configurable latency model, so pipeline timings can be
+# measured without API keys.
+#
+# The generations/ and calls/ packages the orchestrator imports are not part
+# of this repository. load_orchestrator(offline=True) puts placeholder modules
+# in their place when they cannot be imported, and replay then also serves
+# the recorded output of the parsing helpers from generations/ (LOCAL), so a
+# cassette recorded where those packages exist replays anywhere.
+#
+# Both modes pin the SJR journal index to an empty one, so every venue goes
+# through get_journal_info_dict and is recorded. Otherwise the calls made
+# would depend on whether data/scimagojr.csv is present, and replay would
+# need the table.
+import os
+import io
+import sys
+import json
+import math
+import time
+import types
+import random
+import asyncio
+import hashlib
+import importlib
+
+import pandas as pd
+
+import storage.stage_cache as stage_cache
+from storage.journal_index import JournalIndex
+
+# name in pipeline.orchestrator -> is it a coroutine function
+PROVIDERS = {
+    "get_revised_query": True,
+    "main_evidence_list": False,
+    "get_one_completion": True,
+    "get_journal_info_dict": False,
+}
+# Local steps from generations/, recorded always and replayed only when the
+# real module is missing.
+LOCAL = {
+    "clean_and_convert": False,
+    "add_evidence_to_claims": False,
+    "update_list_with_journal_and_venue": False,
+}
+MODULES = {
+    "generations.evidence_synthesis": ["main_evidence_list"],
+    "generations.claim_refinement": ["get_revised_query"],
+    "generations.parsing_and_saving_functions": list(LOCAL),
+    "calls.one_generation": ["get_one_completion"],
+    "calls.sjr": ["get_journal_info_dict"],
+}
+_placeholders = set()       # names of functions whose module was replaced
+
+
+def _json_default(value):
+    if isinstance(value, pd.DataFrame):
+        return value.to_json(orient="split")
+    if hasattr(value, "item"):      # numpy scalars
+        return value.item()
+    return str(value)
+
+
+def call_key(provider, args, kwargs):
+    blob = json.dumps([provider, list(args), sorted(kwargs.items())], default=_json_default)
+    return f"{provider}:{hashlib.sha256(blob.encode('utf-8')).hexdigest()}"
+
+
+def encode(value):
+    if isinstance(value, pd.DataFrame):
+        return {"__dataframe__": value.to_json(orient="split")}
+    return value
+
+
+def decode(value):
+    if isinstance(value, dict) and "__dataframe__" in value:
+        return pd.read_json(io.StringIO(value["__dataframe__"]), orient="split", dtype=False, convert_dates=False)
+    return value
+
+
+class Cassette:
+    def __init__(self, path):
+        self.path = path
+        self.entries = {}
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                self.entries = json.load(f)
+
+    def save(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.entries, f, ensure_ascii=False, default=_json_default)
+        os.replace(tmp_path, self.path)
+
+    def put(self, key, response, latency):
+        # A JSON copy, taken now: later steps may mutate the response in place.
+        response = json.loads(json.dumps(encode(response), ensure_ascii=False, default=_json_default))
+        self.entries[key] = {"response": response, "latency": latency}
+
+    def get(self, key):
+        if key not in self.entries:
+            raise KeyError(f"Call not in cassette {self.path}: {key}. Record it first.")
+        entry = self.entries[key]
+        return decode(entry["response"]), entry["latency"]
+
+# ----------------- LATENCY MODELS -----------------
+
+def latency_model(spec: str, seed: int = 0):
+    # "recorded", "zero", "fixed:<seconds>" or "lognormal:<median seconds>:<sigma>".
+    rng = random.Random(seed)
+    kind, _, params = spec.partition(":")
+    if kind == "recorded":
+        return lambda recorded: recorded
+    if kind == "zero":
+        return lambda recorded: 0.0
+    if kind == "fixed":
+        seconds = float(params)
+        return lambda recorded: seconds
+    if kind == "lognormal":
+        median, sigma = (float(p) for p in params.split(":"))
+        return lambda recorded: rng.lognormvariate(math.log(median), sigma)
+    raise ValueError(f"Unknown latency model: {spec}")
+
+# ----------------- PATCHING -----------------
+
+def _placeholder(module_name, name):
+    def missing(*args, **kwargs):
+        raise RuntimeError(f"{module_name}.{name} is not installed; it can only be replayed from a cassette.")
+    missing.__name__ = name
+    return missing
+
+
+def load_orchestrator(offline: bool = False):
+    # pipeline.orchestrator; with offline=True it imports without generations/ and calls/.
+    if offline:
+        for module_name, names in MODULES.items():
+            try:
+                importlib.import_module(module_name)
+            except ImportError:
+                package, _, _ = module_name.partition(".")
+                if package not in sys.modules:
+                    sys.modules[package] = types.ModuleType(package)
+                    sys.modules[package].__path__ = []
+                module = types.ModuleType(module_name)
+                for name in names:
+                    setattr(module, name, _placeholder(module_name, name))
+                    _placeholders.add(name)
+                sys.modules[module_name] = module
+                setattr(sys.modules[package], module_name.partition(".")[2], module)
+    import pipeline.orchestrator as orchestrator
+    return orchestrator
+
+
+def _disable_stage_cache(orchestrator):
+    stage_cache.STAGE_CACHE_ENABLED = False
+    orchestrator.STAGE_CACHE_ENABLED = False
+
+
+def _pin_journal_index(orchestrator):
+    empty = JournalIndex()
+    orchestrator.get_journal_index = lambda: empty
+
+
+def record(cassette: Cassette):
+    # Wrap the real providers and local steps so every call is stored in the cassette.
+    orchestrator = load_orchestrator()
+    _disable_stage_cache(orchestrator)
+    _pin_journal_index(orchestrator)
+    for name, is_async in {**PROVIDERS, **LOCAL}.items():
+        real = getattr(orchestrator, name)
+        if is_async:
+            async def wrapper(*args, _real=real, _name=name, **kwargs):
+                key = call_key(_name, args, kwargs)      # before the call, which may mutate its arguments
+                start = time.perf_counter()
+                response = await _real(*args, **kwargs)
+                cassette.put(key, response, time.perf_counter() - start)
+                return response
+        else:
+            def wrapper(*args, _real=real, _name=name, **kwargs):
+                key = call_key(_name, args, kwargs)      # before the call, which may mutate its arguments
+                start = time.perf_counter()
+                response = _real(*args, **kwargs)
+                cassette.put(key, response, time.perf_counter() - start)
+                return response
+        setattr(orchestrator, name, wrapper)
+    return orchestrator
+
+
+def replay(cassette: Cassette, latency: str = "recorded", seed: int = 0):
+    # Replace the providers with cassette lookups that sleep per the latency
+    # model; missing local steps are replayed with their recorded time.
+    orchestrator = load_orchestrator(offline=True)
+    _disable_stage_cache(orchestrator)
+    _pin_journal_index(orchestrator)
+    provider_delay = latency_model(latency, seed)
+    replayed = dict(PROVIDERS)
+    replayed.update({name: is_async for name, is_async in LOCAL.items() if name in _placeholders})
+    for name, is_async in replayed.items():
+        delay = provider_delay if name in PROVIDERS else latency_model("recorded")
+        if is_async:
+            async def fake(*args, _name=name, _delay=delay, **kwargs):
+                response, recorded = cassette.get(call_key(_name, args, kwargs))
+                await asyncio.sleep(_delay(recorded))
+                return response
+        else:
+            def fake(*args, _name=name, _delay=delay, **kwargs):
+                response, recorded = cassette.get(call_key(_name, args, kwargs))
+                time.sleep(_delay(recorded))
+                return response
+        setattr(orchestrator, name, fake)
+    return orchestrator
@@ -0,0 +1,61 @@
+#%%
+# Load time of data/Datasets.xlsx through pandas/openpyxl vs. the Parquet
+# cache in storage/dataset_cache.py, each in a fresh interpreter so imports
+# count too, as they do for a batch or sampling script.
+#
+#   python -m benchmarks.dataset_cache_bench --runs 5
+import os
+import sys
+import json
+import argparse
+import tempfile
+import statistics
+import subprocess
+
+SCITRUE_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# name -> statement timed in the child interpreter
+TARGETS = {
+    "import pyarrow.parquet": "import pyarrow.parquet",
+    "read_excel, all sheets": "import pandas as pd; pd.read_excel(DATASETS_PATH, sheet_name=None)",
+    "read_excel, one sheet": "import pandas as pd; pd.read_excel(DATASETS_PATH, sheet_name='Social_Science')",
+    "cache, all sheets": "from storage.dataset_cache import load_sheet, sheet_names; [load_sheet(s) for s in sheet_names()]",
+    "cache, one column": "from storage.dataset_cache import load_sheet; load_sheet('Social_Science', ['Claim'])",
+    "cache, as DataFrame": "from storage.dataset_cache import load_sheet_frame; load_sheet_frame('Social_Science')",
+}
+
+CHILD = """
+import sys, time, json
+sys.path.insert(0, {root!r})
+start = time.perf_counter()
+from storage.activity_store import DATA_ROOT
+DATASETS_PATH = DATA_ROOT + '/Datasets.xlsx'
+exec({statement!r})
+print(json.dumps({{"seconds": time.perf_counter() - start, "pandas": "pandas" in sys.modules}}))
+"""
+
+
+def run_child(statement, env):
+    out = subprocess.run([sys.executable, "-c", CHILD.format(root=SCITRUE_ROOT, statement=statement)],
+                         capture_output=True, text=True, env=env, check=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Datasets.xlsx load time, openpyxl vs. Parquet cache.")
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        env = {**os.environ, "SCITRUE_DATASET_CACHE_DIR": cache_dir}
+        first = run_child(TARGETS["cache, all sheets"], env)
+        print(f"first load (converts the workbook): {first['seconds'] * 1000:.0f} ms\n")
+        print(f"{'target':<24} {'median ms':>10} {'pandas':>7}")
+        for name, statement in TARGETS.items():
+            results = [run_child(statement, env) for _ in range(args.runs)]
+            print(f"{name:<24} {statistics.median(r['seconds'] for r in results) * 1000:>10.1f} "
+                  f"{str(results[0]['pandas']):>7}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+#%%
+# Per-rerun and per-save cost of the evaluation UI's file access, before
+# (json.load on every rerun, linear claim scan, full rewrite on save) and
+# after (eval/eval_store.py), as an annotator's file grows.
+# Run from the SciTrue directory:  python -m benchmarks.eval_store_bench
+import os
+import sys
+import json
+import time
+import random
+import tempfile
+import statistics
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "eval"))
+
+from eval_store import load_results, get_eval_store, claim_key
+
+SIZES = [100, 1_000, 5_000]
+SAMPLES = 50
+
+
+def make_result(i):
+    return {
+        "claim": f"Synthetic claim number {i} about coffee and health",
+        "num_articles": 5,
+        "output": {
+            "summary": "Summary text " * 80,
+            "subclaims": [{"claim": f"Sub-claim {j}", "title": f"Paper {i}-{j}", "paragraph": "text " * 60}
+                          for j in range(5)],
+        },
+    }
+
+
+def make_eval(i):
+    return {
+        "summary_attribution": "Yes",
+        "overall_verdict": "Yes",
+        "subclaim_ratings": {str(j): {"source_exists": "Yes", "factual": "Yes", "combined_reason": ""}
+                             for j in range(5)},
+        "claim": f"Synthetic claim number {i} about coffee and health",
+        "user": "bench",
+        "saved_at": "2025-07-01 12:00:00",
+    }
+
+
+def old_rerun(results_path, eval_path, claim):
+    with open(results_path, "r", encoding="utf-8") as f:
+        json.load(f)
+    with open(eval_path, "r", encoding="utf-8") as f:
+        evals = json.load(f)
+    evaluated = set(ev.get("claim", "").strip().lower() for ev in evals)
+    for ev in evals:
+        if ev.get("claim", "").strip().lower() == claim.strip().lower():
+            return ev, evaluated
+    return None, evaluated
+
+
+def old_save(eval_path, result):
+    with open(eval_path, "r", encoding="utf-8") as f:
+        evals = json.load(f)
+    key = result.get("claim", "").strip().lower()
+    for i, ev in enumerate(evals):
+        if ev.get("claim", "").strip().lower() == key:
+            evals[i] = result
+            break
+    else:
+        evals.append(result)
+    with open(eval_path, "w", encoding="utf-8") as f:
+        json.dump(evals, f, indent=2, ensure_ascii=False)
+
+
+def new_rerun(results_path, eval_path, claim):
+    results = load_results(results_path)
+    store = get_eval_store(eval_path)
+    results.find(claim)
+    return store.get(claim), store.keys()
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    fn(*args)
+    return (time.perf_counter() - start) * 1000
+
+
+def main():
+    rng = random.Random(0)
+    print(f"{'claims':>8} {'rerun old ms':>13} {'rerun new ms':>13} {'save old ms':>12} {'save new ms':>12}")
+    for size in SIZES:
+        with tempfile.TemporaryDirectory() as tmp:
+            results_path = os.path.join(tmp, "results.json")
+            old_path = os.path.join(tmp, "old3.json")
+            new_path = os.path.join(tmp, "new3.json")
+            with open(results_path, "w", encoding="utf-8") as f:
+                json.dump([make_result(i) for i in range(size)], f, indent=2)
+            for path in (old_path, new_path):
+                with open(path, "w", encoding="utf-8") as f:
+                    json.dump([make_eval(i) for i in range(size)], f, indent=2)
+
+            claims = [make_result(rng.randrange(size))["claim"] for _ in range(SAMPLES)]
+            new_rerun(results_path, new_path, claims[0])       # first load, as the first rerun pays it
+            rerun_old = [timed(old_rerun, results_path, old_path, claim) for claim in claims]
+            rerun_new = [timed(new_rerun, results_path, new_path, claim) for claim in claims]
+            save_old = [timed(old_save, old_path, make_eval(rng.randrange(size))) for _ in range(SAMPLES)]
+            store = get_eval_store(new_path)
+            save_new = [timed(store.upsert, make_eval(rng.randrange(size))) for _ in range(SAMPLES)]
+
+            with open(old_path, "r", encoding="utf-8") as f:
+                old_evals = {claim_key(ev["claim"]): ev for ev in json.load(f)}
+            assert set(old_evals) == store.keys()
+            print(f"{size:>8} {statistics.median(rerun_old):>13.2f} {statistics.median(rerun_new):>13.3f} "
+                  f"{statistics.median(save_old):>12.2f} {statistics.median(save_new):>12.3f}")
+
+
+if __name__ == "__main__":
+    main()
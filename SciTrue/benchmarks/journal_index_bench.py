@@ -0,0 +1,74 @@
+#%%
+# Build time and per-report resolution latency of the SJR journal index.
+# Uses the real SCImago table when SCITRUE_SJR_CSV points at one, otherwise a
+# synthetic table of the same size (~30k journals).
+# Run from the SciTrue directory:  python -m benchmarks.journal_index_bench
+import os
+import sys
+import time
+import random
+import statistics
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from storage.journal_index import JournalIndex, load_journal_index, SJR_CSV_PATH
+
+N_JOURNALS = 30_000
+REPORT_SIZE = 15
+RUNS = 2_000
+
+WORDS = ("journal international review clinical molecular applied physics chemistry biology medicine "
+         "engineering letters research science nature advances computational neural systems ecology "
+         "economics psychology materials energy environmental cancer cell genetics").split()
+
+
+def synthetic_rows(rng):
+    seen = set()
+    while len(seen) < N_JOURNALS:
+        seen.add(" ".join(rng.choice(WORDS).title() for _ in range(rng.randint(2, 6))) + f" {len(seen)}")
+    for i, title in enumerate(sorted(seen)):
+        yield {"Title": title, "Issn": f"{i:07d}1", "SJR": "1,5", "H index": "100", "Country": "US"}
+
+
+def report_names(index, rng):
+    names = []
+    for _ in range(REPORT_SIZE):
+        record = index.records[rng.randrange(len(index))]
+        kind = rng.random()
+        if kind < 0.6:
+            names.append(record["Title"])
+        elif kind < 0.75:
+            names.append(record["Title"].upper().replace(" And ", " & "))
+        elif kind < 0.85:
+            names.append(record["Issn"].split(",")[0])
+        elif kind < 0.95:
+            title = record["Title"]
+            names.append(title[:-2] + title[-1])       # typo -> fuzzy path
+        else:
+            names.append(f"Unknown Venue {rng.random()}")
+    return names
+
+
+def main():
+    rng = random.Random(0)
+    start = time.perf_counter()
+    index = load_journal_index() if os.path.exists(SJR_CSV_PATH) else JournalIndex(synthetic_rows(rng))
+    print(f"built index of {len(index)} journals in {time.perf_counter() - start:.2f}s")
+
+    reports = [report_names(index, rng) for _ in range(RUNS)]
+    durations = []
+    resolved = 0
+    for names in reports:
+        start = time.perf_counter()
+        infos = index.resolve_many(names)
+        durations.append((time.perf_counter() - start) * 1e3)
+        resolved += sum(info is not None for info in infos.values())
+    durations.sort()
+    print(f"{REPORT_SIZE} venues per report, {RUNS} reports: "
+          f"p50 {statistics.median(durations):.3f} ms, "
+          f"p99 {durations[int(len(durations) * 0.99)]:.3f} ms, "
+          f"resolved {resolved / (RUNS * REPORT_SIZE):.0%}")
+
+
+if __name__ == "__main__":
+    main()
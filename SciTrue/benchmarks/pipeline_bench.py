@@ -0,0 +1,146 @@
+#%%
+# End-to-end pipeline benchmark with recorded provider responses.
+#
+#   # once, with OPEN_API_KEY / S2_API_KEY set:
+#   python -m benchmarks.pipeline_bench record --claims claims.txt --ks 1-15
+#   # afterwards, fully offline:
+#   python -m benchmarks.pipeline_bench replay --latency lognormal:1.5:0.4 --runs 5
+#
+# Reports p50/p95 wall time per stage and the p50 of each stage's memory
+# high-water mark for each k. Replay does not need the generations/ and
+# calls/ packages (see benchmarks/cassette.py).
+import os
+import sys
+import time
+import asyncio
+import argparse
+import statistics
+import tracemalloc
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.cassette import Cassette, record, replay
+
+DEFAULT_CASSETTE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "cassettes", "pipeline.json")
+STAGES = ["refinement", "retrieval", "summary", "extraction", "sjr", "render", "total"]
+# Stages as on_stage reports them; "render" is everything after extraction
+# (waiting for SJR, building the report and the HTML).
+ALLOCATION_STAGES = ["refinement", "retrieval", "summary", "extraction", "render"]
+DEFAULT_CLAIMS = [
+    "Coffee consumption reduces the risk of certain diseases.",
+    "Artificial intelligence will inevitably lead to widespread unemployment.",
+    "Low-fat dairy is healthier than full-fat dairy.",
+]
+
+
+def parse_ks(value: str):
+    ks = []
+    for part in value.split(","):
+        lo, _, hi = part.partition("-")
+        ks.extend(range(int(lo), int(hi or lo) + 1))
+    return ks
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(q * (len(values) - 1))))]
+
+
+def run_once(orchestrator, claim, k):
+    # One verification. Returns the result and allocations: per stage, the
+    # high-water mark of traced memory above what was live when the stage
+    # started, and "peak", the high-water mark of the whole run.
+    allocations = {}
+    marks = {"start": 0, "peak": 0}
+
+    def mark(stage):
+        current, peak = tracemalloc.get_traced_memory()
+        allocations[stage] = peak - marks["start"]
+        marks["start"] = current
+        marks["peak"] = max(marks["peak"], peak)
+        tracemalloc.reset_peak()
+
+    def on_stage(stage, payload):
+        if stage in ALLOCATION_STAGES:
+            mark(stage)
+
+    tracemalloc.start()
+    try:
+        result = asyncio.run(orchestrator.verify_claim(claim, k, on_stage=on_stage))
+        mark("render")
+    finally:
+        tracemalloc.stop()
+    allocations["peak"] = marks["peak"]
+    return result, allocations
+
+
+def load_claims(path):
+    if not path:
+        return DEFAULT_CLAIMS
+    with open(path, "r", encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Record/replay benchmark of the claim pipeline.")
+    parser.add_argument("mode", choices=["record", "replay"])
+    parser.add_argument("--cassette", default=DEFAULT_CASSETTE)
+    parser.add_argument("--claims", help="text file with one claim per line")
+    parser.add_argument("--ks", default="1-15")
+    parser.add_argument("--runs", type=int, default=3, help="replay runs per claim and k")
+    parser.add_argument("--latency", default="recorded",
+                        help="recorded | zero | fixed:<s> | lognormal:<median s>:<sigma>")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    claims = load_claims(args.claims)
+    ks = parse_ks(args.ks)
+    cassette = Cassette(args.cassette)
+
+    if args.mode == "record":
+        orchestrator = record(cassette)
+        for k in ks:
+            for claim in claims:
+                start = time.perf_counter()
+                result = asyncio.run(orchestrator.verify_claim(claim, k))
+                print(f"recorded k={k:<2} ok={result['ok']!s:<5} {time.perf_counter() - start:6.1f}s  {claim[:60]}")
+                cassette.save()
+        print(f"{len(cassette.entries)} calls in {args.cassette}")
+        return
+
+    orchestrator = replay(cassette, args.latency, args.seed)
+    rows = []
+    for k in ks:
+        timings = {stage: [] for stage in STAGES}
+        allocations = {stage: [] for stage in ALLOCATION_STAGES + ["peak"]}
+        for claim in claims:
+            for _ in range(args.runs):
+                try:
+                    result, allocated = run_once(orchestrator, claim, k)
+                except KeyError as e:
+                    print(f"skip k={k} {claim[:40]!r}: {e}")
+                    break
+                for stage in STAGES:
+                    if stage in result["timings"]:
+                        timings[stage].append(result["timings"][stage])
+                for stage, size in allocated.items():
+                    allocations[stage].append(size / 1e6)
+        if allocations["peak"]:
+            rows.append((k, timings, allocations))
+
+    print(f"{'k':>3} " + " ".join(f"{stage + ' p50/p95 s':>24}" for stage in STAGES))
+    for k, timings, _ in rows:
+        cells = []
+        for stage in STAGES:
+            values = timings[stage]
+            cells.append(f"{percentile(values, 0.5):>11.3f}/{percentile(values, 0.95):<11.3f}" if values else "-")
+        print(f"{k:>3} " + " ".join(f"{cell:>24}" for cell in cells))
+    print()
+    print(f"{'k':>3} " + " ".join(f"{stage + ' MB p50':>16}" for stage in ALLOCATION_STAGES + ["peak"]))
+    for k, _, allocations in rows:
+        cells = [f"{statistics.median(values):.2f}" if values else "-"
+                 for values in (allocations[stage] for stage in ALLOCATION_STAGES + ["peak"])]
+        print(f"{k:>3} " + " ".join(f"{cell:>16}" for cell in cells))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+#%%
+# Cold-start cost of a Streamlit worker: wall time, peak RSS and module count
+# for importing the app and its pieces in a fresh interpreter each run.
+#
+#   python -m benchmarks.startup_bench --runs 5
+#   python -m benchmarks.startup_bench --importtime scitrue   # slowest imports
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+
+SCITRUE_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEMO_DIR = os.path.join(SCITRUE_ROOT, "demo")
+
+# name -> statement timed in the child interpreter
+TARGETS = {
+    "python": "pass",
+    "scitrue": "import scitrue",
+    "pipeline": "import pipeline.orchestrator",
+    "flask_service": "import flask_service; flask_service.create_app(dict, lambda users: None)",
+}
+
+CHILD = """
+import sys, time, json, resource
+sys.path[:0] = {paths!r}
+start = time.perf_counter()
+exec({statement!r})
+seconds = time.perf_counter() - start
+print(json.dumps({{
+    "seconds": seconds,
+    "rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    "modules": len(sys.modules),
+    "torch": "torch" in sys.modules,
+    "pandas": "pandas" in sys.modules,
+    "flask": "flask" in sys.modules,
+}}))
+"""
+
+
+def measure(statement, extra_args=()):
+    code = CHILD.format(paths=[SCITRUE_ROOT, DEMO_DIR], statement=statement)
+    proc = subprocess.run(
+        [sys.executable, *extra_args, "-c", code], capture_output=True, text=True, cwd=DEMO_DIR,
+    )
+    if proc.returncode != 0:
+        return None, proc.stderr
+    return json.loads(proc.stdout.strip().splitlines()[-1]), proc.stderr
+
+
+def top_imports(statement, limit: int = 20):
+    # Parses python -X importtime output: "import time: self | cumulative | name".
+    _, stderr = measure(statement, ("-X", "importtime"))
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append((int(cumulative_us), int(self_us), name.rstrip()))
+    for cumulative_us, self_us, name in sorted(rows, reverse=True)[:limit]:
+        print(f"{cumulative_us / 1000:9.1f} ms {self_us / 1000:9.1f} ms  {name}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import time and RSS of the Streamlit worker.")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--targets", nargs="*", default=list(TARGETS))
+    parser.add_argument("--importtime", metavar="TARGET", help="list the slowest imports of one target")
+    args = parser.parse_args()
+
+    if args.importtime:
+        top_imports(TARGETS[args.importtime])
+        return
+
+    print(f"{'target':>14} {'p50 s':>8} {'max s':>8} {'RSS MB':>8} {'modules':>8}  loaded")
+    for name in args.targets:
+        samples = []
+        for _ in range(args.runs):
+            sample, stderr = measure(TARGETS[name])
+            if sample is None:
+                print(f"{name:>14} failed: {stderr.strip().splitlines()[-1] if stderr.strip() else 'unknown error'}")
+                break
+            samples.append(sample)
+        if not samples:
+            continue
+        seconds = [sample["seconds"] for sample in samples]
+        loaded = ", ".join(lib for lib in ("torch", "pandas", "flask") if samples[-1][lib]) or "-"
+        print(f"{name:>14} {statistics.median(seconds):>8.3f} {max(seconds):>8.3f} "
+              f"{statistics.median(sample['rss_mb'] for sample in samples):>8.1f} {samples[-1]['modules']:>8}  {loaded}")
+
+
+if __name__ == "__main__":
+    main()
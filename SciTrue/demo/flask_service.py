@@ -0,0 +1,207 @@
+#%%
+# The Flask side of the demo: email verification links, /metrics and the
+# headless POST /verify API. Flask, flask_mail, itsdangerous and the pipeline
+# are imported when the app is created, so a Streamlit script run that never
+# starts the service does not load them.
+#
+# The server listens on every interface because the email links must be
+# reachable, but /verify spends LLM credits: it needs
+# "Authorization: Bearer <token>", or, with no token configured, a request
+# from this machine. Each token stands for one account, and verifications are
+# logged to that account's history:
+#
+#   SCITRUE_API_TOKENS="alice@example.org=<token>,bob@example.org=<token>"
+#   SCITRUE_API_TOKEN=<token>       # shared token, logged as "api"
+#
+# A body "email" other than the token's account is refused. Each client
+# address is also limited to SCITRUE_API_RATE requests per minute.
+import os
+import hmac
+import time
+import threading
+from collections import deque
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
+MAX_ARTICLES = 15
+API_TOKEN = os.getenv("SCITRUE_API_TOKEN")
+API_IDENTITY = "api"
+API_RATE = int(os.getenv("SCITRUE_API_RATE", 10))
+LOCAL_ADDRESSES = {"127.0.0.1", "::1"}
+
+_app = None
+
+
+def parse_api_tokens(value: str) -> dict:
+    # "email=token,email=token" -> {token: email}
+    tokens = {}
+    for item in (value or "").split(","):
+        email, _, token = item.strip().partition("=")
+        if email.strip() and token.strip():
+            tokens[token.strip()] = email.strip()
+    return tokens
+
+
+API_TOKENS = parse_api_tokens(os.getenv("SCITRUE_API_TOKENS"))
+
+
+class ClientRateLimiter:
+    # At most `limit` requests per client in any `window` seconds.
+    def __init__(self, limit: int, window: float = 60.0):
+        self.limit = limit
+        self.window = window
+        self.requests = {}      # client -> deque of request times
+        self.lock = threading.Lock()
+
+    def retry_after(self, client, now=None) -> float:
+        # 0 and the request is counted, or the seconds until the client may retry.
+        now = time.monotonic() if now is None else now
+        with self.lock:
+            times = self.requests.setdefault(client, deque())
+            while times and times[0] <= now - self.window:
+                times.popleft()
+            if len(times) >= self.limit:
+                return times[0] + self.window - now
+            times.append(now)
+            if len(self.requests) > 10_000:
+                for key in [key for key, value in self.requests.items() if not value or value[-1] <= now - self.window]:
+                    del self.requests[key]
+            return 0.0
+
+
+def api_identity(authorization, remote_addr):
+    # Account the request acts for, or None if it is not authorized.
+    tokens = dict(API_TOKENS)
+    if API_TOKEN:
+        tokens.setdefault(API_TOKEN, API_IDENTITY)
+    if not tokens:
+        return API_IDENTITY if remote_addr in LOCAL_ADDRESSES else None
+    scheme, _, token = (authorization or "").partition(" ")
+    if scheme.lower() != "bearer":
+        return None
+    identity = None
+    for known, email in tokens.items():
+        # Every token is compared, so the time taken does not tell which one matched.
+        if hmac.compare_digest(token.strip().encode(), known.encode()):
+            identity = email
+    return identity
+
+
+def create_app(load_users, save_users):
+    from flask import Flask, Response, jsonify, request, url_for
+    from flask_mail import Mail, Message
+    from itsdangerous import URLSafeTimedSerializer
+    from pipeline.orchestrator import build_log_entry
+    from pipeline.report_snapshot import log_with_snapshot
+    from pipeline.tracing import render_openmetrics, OPENMETRICS_CONTENT_TYPE
+    from pipeline.worker_pool import get_pool, PoolFull, VERIFY_TIMEOUT
+    from storage.activity_store import find_cached_summary
+
+    flask_app = Flask(__name__)
+    flask_app.config.update(
+        SECRET_KEY="YOUR_RANDOM_SECRET_KEY",
+        MAIL_SERVER="smtp.gmail.com",
+        MAIL_PORT=587,
+        MAIL_USE_TLS=True,
+        MAIL_USERNAME=os.getenv("MAIL_USERNAME"),
+        MAIL_PASSWORD=os.getenv("MAIL_PASSWORD"),
+    )
+    mail = Mail(flask_app)
+    serializer = URLSafeTimedSerializer(flask_app.config["SECRET_KEY"])
+    limiter = ClientRateLimiter(API_RATE)
+
+    @flask_app.route("/send_confirmation/<email>")
+    def send_confirmation(email):
+        try:
+            token = serializer.dumps(email, salt="email-confirm")
+            link = url_for("confirm_email", token=token, _external=True)
+            mail.send(Message("Verify Email", sender=flask_app.config["MAIL_USERNAME"], recipients=[email], body=f"Verify: {link}"))
+            return "Email sent!"
+        except Exception as e:
+            print(f"Error sending email: {e}")
+            return f"Error sending email: {e}"
+
+    @flask_app.route("/confirm_email/<token>")
+    def confirm_email(token):
+        try:
+            email = serializer.loads(token, salt="email-confirm", max_age=3600)
+            users = load_users()
+            users[email] = {"is_verified": True}
+            save_users(users)
+            return "Verified! Set a password now."
+        except Exception:
+            return "Invalid or expired link!"
+
+    @flask_app.route("/metrics")
+    def metrics_endpoint():
+        # Stage timings, cache hit rates, token and error counts of this process.
+        return Response(render_openmetrics(), mimetype=OPENMETRICS_CONTENT_TYPE)
+
+    @flask_app.route("/verify", methods=["POST"])
+    def verify():
+        # {"claim": str, "k": int, "user"?: str, "email"?: str} -> the entry
+        # log_activity stores for the claim, same as the Streamlit app. The
+        # entry goes to the history of the token's account.
+        identity = api_identity(request.headers.get("Authorization"), request.remote_addr)
+        if identity is None:
+            return jsonify(error="Missing or invalid API token."), 401
+        wait = limiter.retry_after(request.remote_addr)
+        if wait:
+            response = jsonify(error=f"Rate limit of {API_RATE} requests per minute exceeded.")
+            response.headers["Retry-After"] = str(int(wait) + 1)
+            return response, 429
+        body = request.get_json(silent=True) or {}
+        claim = str(body.get("claim") or "").strip()
+        try:
+            k = int(body.get("k"))
+        except (TypeError, ValueError):
+            k = 0
+        if not claim:
+            return jsonify(error="'claim' is required."), 400
+        if not 1 <= k <= MAX_ARTICLES:
+            return jsonify(error=f"'k' must be a number between 1-{MAX_ARTICLES}."), 400
+        email = str(body.get("email") or "").strip()
+        if email and email != identity:
+            return jsonify(error="'email' must be the account of the API token."), 403
+
+        cached_entry = find_cached_summary(claim, k)
+        if cached_entry:
+            response = jsonify(cached_entry)
+            response.headers["X-SciTrue-Cache"] = "hit"
+            return response
+
+        try:
+            future = get_pool().submit(claim, k)
+        except PoolFull:
+            response = jsonify(error="Too many verifications in progress, retry later.")
+            response.headers["Retry-After"] = "30"
+            return response, 503
+        try:
+            result = future.result(timeout=VERIFY_TIMEOUT)
+        except FutureTimeoutError:
+            future.cancel()
+            return jsonify(error=f"Verification did not finish within {VERIFY_TIMEOUT:.0f} seconds."), 504
+        except Exception as e:
+            print(f"[ERROR] /verify failed for {claim[:60]!r}: {e}")
+            return jsonify(error=f"Verification failed: {e}"), 500
+        if not result["ok"]:
+            return jsonify(error=result["hint"] or "No summary could be generated for this claim.",
+                           claim=claim, articles=k), 422
+
+        entry = build_log_entry(result, body.get("user") or identity, identity)
+        log_with_snapshot(entry, result["html_code"])
+        response = jsonify(entry)
+        response.headers["X-SciTrue-Cache"] = "miss"
+        return response
+
+    return flask_app
+
+
+def get_app(load_users, save_users):
+    global _app
+    if _app is None:
+        _app = create_app(load_users, save_users)
+    return _app
+
+
+def start_flask(load_users, save_users, host: str = "0.0.0.0", port: int = 5002):
+    get_app(load_users, save_users).run(host=host, port=port, use_reloader=False)
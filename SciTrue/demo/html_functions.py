@@ -471,4 +471,31 @@ label_colors = {
 badge_fields = [
     "Accuracy", "Contribution", "Type", "Label", "Title", "Authors", "Year", "Venue",
     "Relevance", "Relevant Sentence", "Journal Title", "Paragraph"
-]
\ No newline at end of file
+]
+
+
+# Rendered report stored with each history entry (see pipeline/report_snapshot.py).
+# Bump RENDERER_VERSION whenever the output of the functions below changes, so
+# stored snapshots are rendered again the next time they are viewed.
+RENDERER_VERSION = 1
+
+def badge_row(label, value, bg):
+    return (
+        "<div>" + badge_label(label, bg=bg) +
+        f'<span style="font-size:17px;font-weight:600;vertical-align:middle;margin-left:8px;">{value}</span></div>'
+    )
+
+def render_summary_block(entry):
+    return "".join([
+        badge_row("Claim", entry.get("claim", ""), label_colors["Claim"]),
+        badge_row("Articles", entry.get("articles", ""), label_colors["Articles"]),
+        badge_row("Summary", entry.get("summary", ""), label_colors["Summary"]),
+        badge_row("Overall Accuracy", entry.get("overall accuracy", ""), label_colors["Overall Accuracy"]),
+        badge_row("Verdict and Reason", entry.get("overall reason for accuracy", ""), label_colors["Verdict and Reason"]),
+    ])
+
+def render_report_snapshot(entry, tree_html=None):
+    # tree_html: the tree already rendered for a fresh run, if there is one.
+    if tree_html is None:
+        tree_html = generate_html_code(build_html_tree(entry.get("subclaims", [])))
+    return {"summary_html": render_summary_block(entry), "tree_html": tree_html}
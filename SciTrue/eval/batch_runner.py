@@ -0,0 +1,179 @@
+#%%
+# Shared runner for the baseline scripts (gpt4o.py, sonar_pro.py).
+# Claims go through a bounded pool of workers behind a per-provider rate
+# limit. Transient request failures (rate limits, timeouts, 5xx) are retried
+# with jittered exponential backoff; anything else, e.g. a bad key or a 4xx,
+# fails the claim at once. Every finished claim is appended to a JSONL
+# checkpoint right away, keyed by claim, model and prompt version, so an
+# interrupted run resumes where it stopped while a run with another model or
+# prompt starts over. The usual results JSON is rebuilt from the checkpoint
+# at the end, in its published format: the run keys stay in the checkpoint.
+import os
+import json
+import time
+import random
+import asyncio
+import argparse
+
+# Requests per minute; override with e.g. SCITRUE_RATE_OPENAI=120.
+PROVIDER_RATE_LIMITS = {
+    "openai": 60,
+    "perplexity": 50,
+}
+DEFAULT_CONCURRENCY = 8
+MAX_RETRIES = 4
+BASE_BACKOFF = 2.0
+MAX_BACKOFF = 60.0
+RETRY_STATUS = {408, 429}       # plus every 5xx
+CHECKPOINT_KEYS = ("model", "prompt_version")      # checkpoint only, not in the results JSON
+# Exception classes of openai (both APIs) and requests that mean a rate limit,
+# a timeout or a server error but do not always carry a status code.
+RETRY_ERRORS = {
+    "RateLimitError", "Timeout", "APITimeoutError", "ReadTimeout", "ConnectTimeout",
+    "ServiceUnavailableError", "InternalServerError", "TryAgain",
+}
+
+
+def provider_rate(provider: str) -> float:
+    return float(os.getenv(f"SCITRUE_RATE_{provider.upper()}", PROVIDER_RATE_LIMITS.get(provider, 60)))
+
+
+class RateLimiter:
+    # Spaces request starts evenly at rate_per_minute.
+    def __init__(self, rate_per_minute: float):
+        self.interval = 60.0 / rate_per_minute if rate_per_minute > 0 else 0.0
+        self.next_slot = 0.0
+        self.lock = asyncio.Lock()
+
+    async def wait(self):
+        async with self.lock:
+            now = time.monotonic()
+            delay = self.next_slot - now
+            self.next_slot = max(now, self.next_slot) + self.interval
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+def backoff_delay(attempt: int) -> float:
+    return min(MAX_BACKOFF, BASE_BACKOFF * 2 ** attempt) * random.uniform(0.5, 1.5)
+
+
+def status_code(e):
+    # HTTP status of a provider error: openai>=1 (status_code), legacy openai
+    # (http_status) or requests.HTTPError (response.status_code).
+    status = getattr(e, "status_code", None) or getattr(e, "http_status", None)
+    if status is None:
+        status = getattr(getattr(e, "response", None), "status_code", None)
+    return status if isinstance(status, int) else None
+
+
+def is_retryable(e) -> bool:
+    status = status_code(e)
+    if status is not None:
+        return status in RETRY_STATUS or status >= 500
+    if isinstance(e, (TimeoutError, asyncio.TimeoutError)):
+        return True
+    return any(cls.__name__ in RETRY_ERRORS for cls in type(e).__mro__)
+
+
+def load_checkpoint(checkpoint_path, model=None, prompt_version=None):
+    # Latest record per claim for this model and prompt version; records of
+    # other runs and a torn last line from a crash are ignored.
+    records = {}
+    if not os.path.exists(checkpoint_path):
+        return records
+    with open(checkpoint_path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if (record.get("model"), record.get("prompt_version")) == (model, prompt_version):
+                records[record["claim"]] = record
+    return records
+
+
+def append_checkpoint(checkpoint_path, record):
+    with open(checkpoint_path, "a", encoding="utf-8") as f:
+        f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def write_results(output_path, claim_article_list, records):
+    results = [
+        {key: value for key, value in records[claim].items() if key not in CHECKPOINT_KEYS}
+        for claim, _ in claim_article_list if claim in records
+    ]
+    tmp_path = output_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, output_path)
+    return results
+
+
+async def process_claim(claim, num_articles, request_fn, parse_fn, limiter):
+    text = None
+    for attempt in range(MAX_RETRIES + 1):
+        await limiter.wait()
+        try:
+            text = await asyncio.to_thread(request_fn, claim, num_articles)
+            break
+        except Exception as e:
+            if attempt == MAX_RETRIES or not is_retryable(e):
+                return {"claim": claim, "num_articles": num_articles, "error": str(e), "raw_response": None}
+            delay = backoff_delay(attempt)
+            print(f"[RETRY] {claim[:60]!r} attempt {attempt + 1} failed ({e}); retrying in {delay:.1f}s")
+            await asyncio.sleep(delay)
+    try:
+        data = parse_fn(text)
+        return {"claim": claim, "num_articles": num_articles, "output": data}
+    except Exception as e:
+        return {"claim": claim, "num_articles": num_articles, "error": str(e), "raw_response": text}
+
+
+async def run_batch(claim_article_list, request_fn, parse_fn, output_path, provider, model, prompt_version,
+                    concurrency: int = DEFAULT_CONCURRENCY, resume: bool = True, retry_errors: bool = True):
+    # request_fn(claim, num_articles) -> raw text (blocking, run in a thread);
+    # parse_fn(text) -> parsed output. Returns the results list written to output_path.
+    checkpoint_path = output_path + ".checkpoint.jsonl"
+    if not resume and os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+    records = load_checkpoint(checkpoint_path, model, prompt_version)
+    todo = [
+        (claim, num_articles) for claim, num_articles in claim_article_list
+        if claim not in records or (retry_errors and "error" in records[claim])
+    ]
+    print(f"{len(claim_article_list) - len(todo)} claims already done, {len(todo)} to run "
+          f"({concurrency} workers, {provider_rate(provider):.0f} requests/min).")
+
+    limiter = RateLimiter(provider_rate(provider))
+    queue = asyncio.Queue()
+    for item in todo:
+        queue.put_nowait(item)
+    done = [0]
+
+    async def worker():
+        while True:
+            try:
+                claim, num_articles = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            record = await process_claim(claim, num_articles, request_fn, parse_fn, limiter)
+            record.update(model=model, prompt_version=prompt_version)
+            records[claim] = record
+            append_checkpoint(checkpoint_path, record)
+            done[0] += 1
+            status = "error: " + record["error"][:80] if "error" in record else "ok"
+            print(f"[{done[0]}/{len(todo)}] {claim[:70]} -> {status}")
+
+    await asyncio.gather(*(worker() for _ in range(max(1, concurrency))))
+    return write_results(output_path, claim_article_list, records)
+
+
+def batch_arg_parser(description):
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY)
+    parser.add_argument("--fresh", action="store_true", help="ignore the checkpoint and rerun every claim")
+    parser.add_argument("--keep-errors", action="store_true", help="do not retry claims that failed in an earlier run")
+    return parser
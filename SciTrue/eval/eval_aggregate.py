@@ -0,0 +1,208 @@
+#%%
+# Reliability numbers from the annotators' eval files (eval_output/
+# <user>_<source>3.json, see eval_store.py). Every rating of every
+# annotator and source becomes one row of a long frame:
+#
+#   source | user | claim | subclaim | criterion | value
+#
+# with value 1.0 for "Yes", 0.0 for "No" and NaN if missing; claim-level
+# criteria (summary_attribution, overall_verdict) have subclaim -1. Rates,
+# Wilson intervals and inter-annotator agreement are group-bys over that
+# frame. Each file is flattened once per version (mtime and size), so a
+# rerun after new evaluations land only re-reads the files that changed.
+#
+#   python eval/eval_aggregate.py
+#   python eval/eval_aggregate.py --by-user --csv rates.csv
+import os
+import re
+import sys
+import glob
+import argparse
+import threading
+
+import numpy as np
+import pandas as pd
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(BASE_DIR)
+
+from eval_store import EvalStore, claim_key, source_slug, file_signature
+
+EVAL_DIR = os.path.join(BASE_DIR, "eval_output")
+SOURCES = ("GPT-4o", "Perplexity", "SciTrue")
+CLAIM_CRITERIA = ("summary_attribution", "overall_verdict")
+SUBCLAIM_CRITERIA = (
+    "source_exists",
+    "title_inline",
+    "authors_inline",
+    "scientific_check",
+    "factual",
+    "attribution_contribution",
+    "attribution_context_and_assumption",
+    "attribution_credibility",
+)
+CRITERIA = CLAIM_CRITERIA + SUBCLAIM_CRITERIA
+Z = 1.959964        # 95% intervals
+EVAL_FILE = re.compile(
+    r"^(?P<user>.+)_(?P<slug>" + "|".join(source_slug(s) for s in SOURCES) + r")3\.json$"
+)
+_SLUG_TO_SOURCE = {source_slug(s): s for s in SOURCES}
+_VALUES = {"Yes": 1.0, "No": 0.0}
+COLUMNS = ("source", "user", "claim", "subclaim", "criterion", "value")
+# Fixed categories, so per-file frames concatenate without re-encoding.
+_DTYPES = {
+    "source": pd.CategoricalDtype(SOURCES),
+    "criterion": pd.CategoricalDtype(CRITERIA),
+    "subclaim": "int16",
+    "value": "float64",
+}
+
+
+def eval_files(eval_dir: str = EVAL_DIR) -> dict:
+    # path -> (source, user) for every eval file.
+    files = {}
+    for path in glob.glob(os.path.join(eval_dir, "*3.json")):
+        match = EVAL_FILE.match(os.path.basename(path))
+        if match:
+            files[path] = (_SLUG_TO_SOURCE[match.group("slug")], match.group("user"))
+    return files
+
+
+def flatten_evals(evals, source: str, user: str) -> pd.DataFrame:
+    columns = {name: [] for name in COLUMNS}
+
+    def add(claim, subclaim, criterion, value):
+        columns["claim"].append(claim)
+        columns["subclaim"].append(subclaim)
+        columns["criterion"].append(criterion)
+        columns["value"].append(_VALUES.get(value, np.nan))
+
+    for ev in evals:
+        claim = claim_key(ev.get("claim"))
+        for criterion in CLAIM_CRITERIA:
+            add(claim, -1, criterion, ev.get(criterion))
+        for i, ratings in (ev.get("subclaim_ratings") or {}).items():
+            for criterion in SUBCLAIM_CRITERIA:
+                if criterion in ratings:
+                    add(claim, int(i), criterion, ratings[criterion])
+    columns["source"] = [source] * len(columns["claim"])
+    columns["user"] = [user] * len(columns["claim"])
+    frame = pd.DataFrame(columns, columns=list(COLUMNS))
+    return frame.astype(_DTYPES)
+
+# ----------------- INCREMENTAL LOADING -----------------
+
+_frames = {}        # path -> (signature, frame)
+_combined = {}      # eval_dir -> (signatures, frame)
+_frames_lock = threading.Lock()
+
+
+def load_ratings(eval_dir: str = EVAL_DIR) -> pd.DataFrame:
+    # All ratings under eval_dir; files unchanged since the last call are not read again.
+    eval_dir = os.path.abspath(eval_dir)
+    files = eval_files(eval_dir)
+    with _frames_lock:
+        signatures = {}
+        for path, (source, user) in sorted(files.items()):
+            signature = file_signature(path)
+            signatures[path] = signature
+            cached = _frames.get(path)
+            if cached is None or cached[0] != signature:
+                evals = EvalStore(path).all()
+                _frames[path] = (signature, flatten_evals(evals, source, user))
+        for path in [p for p in _frames if os.path.dirname(p) == eval_dir and p not in files]:
+            del _frames[path]
+        cached = _combined.get(eval_dir)
+        if cached is not None and cached[0] == signatures:
+            return cached[1]
+        parts = [_frames[path][1] for path in sorted(signatures)]
+        if parts:
+            frame = pd.concat(parts, ignore_index=True)
+        else:
+            frame = pd.DataFrame({name: [] for name in COLUMNS}).astype(_DTYPES)
+        frame["user"] = frame["user"].astype("category")
+        _combined[eval_dir] = (signatures, frame)
+        return frame
+
+# ----------------- STATISTICS -----------------
+
+def wilson_interval(successes, n, z: float = Z):
+    # Element-wise Wilson score interval; NaN where n is 0.
+    successes = np.asarray(successes, dtype=float)
+    n = np.asarray(n, dtype=float)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        p = successes / n
+        denominator = 1 + z ** 2 / n
+        center = (p + z ** 2 / (2 * n)) / denominator
+        half = z * np.sqrt(p * (1 - p) / n + z ** 2 / (4 * n ** 2)) / denominator
+    return center - half, center + half
+
+
+def criterion_rates(ratings: pd.DataFrame, by=("source", "criterion")) -> pd.DataFrame:
+    # Share of "Yes" per group with its 95% Wilson interval.
+    rated = ratings[ratings["value"].notna()]
+    grouped = rated.groupby(list(by), observed=True)["value"].agg(n="size", yes="sum")
+    grouped["rate"] = grouped["yes"] / grouped["n"]
+    grouped["ci_low"], grouped["ci_high"] = wilson_interval(grouped["yes"], grouped["n"])
+    return grouped
+
+
+def agreement(ratings: pd.DataFrame, by=("source", "criterion")) -> pd.DataFrame:
+    # Inter-annotator agreement per group over the items (claim, sub-claim)
+    # rated by at least two annotators: percent agreement (mean share of
+    # agreeing rater pairs per item) and Fleiss' kappa for Yes/No, which
+    # allows a different number of raters per item.
+    by = list(by)
+    rated = ratings[ratings["value"].notna()]
+    items = rated.groupby(by + ["claim", "subclaim"], observed=True)["value"].agg(n="size", yes="sum")
+    items = items[items["n"] >= 2]
+    no = items["n"] - items["yes"]
+    items = items.assign(
+        pairs_agree=(items["yes"] * (items["yes"] - 1) + no * (no - 1)) / (items["n"] * (items["n"] - 1)),
+    )
+    grouped = items.groupby(level=by, observed=True).agg(
+        items=("n", "size"), ratings=("n", "sum"), yes=("yes", "sum"), percent_agreement=("pairs_agree", "mean"),
+    )
+    p_yes = grouped["yes"] / grouped["ratings"]
+    expected = p_yes ** 2 + (1 - p_yes) ** 2
+    with np.errstate(invalid="ignore", divide="ignore"):
+        grouped["fleiss_kappa"] = np.where(
+            expected < 1, (grouped["percent_agreement"] - expected) / (1 - expected), np.nan
+        )
+    return grouped.drop(columns=["yes"])
+
+
+def reliability_table(ratings: pd.DataFrame) -> pd.DataFrame:
+    # criterion x source table of "rate [ci_low, ci_high]" strings, as reported.
+    rates = criterion_rates(ratings).reset_index()
+    rates["cell"] = [
+        f"{rate:.0%} [{low:.0%}, {high:.0%}] n={n}"
+        for rate, low, high, n in zip(rates["rate"], rates["ci_low"], rates["ci_high"], rates["n"])
+    ]
+    table = rates.pivot(index="criterion", columns="source", values="cell")
+    return table.reindex([c for c in CRITERIA if c in table.index])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rates, intervals and agreement from the annotators' eval files.")
+    parser.add_argument("--eval-dir", default=EVAL_DIR)
+    parser.add_argument("--by-user", action="store_true", help="rates per annotator as well")
+    parser.add_argument("--csv", help="write the per-criterion rates to this CSV file")
+    args = parser.parse_args()
+
+    ratings = load_ratings(args.eval_dir)
+    if ratings.empty:
+        print(f"No eval files under {args.eval_dir}")
+        return
+    print(f"{ratings['user'].nunique()} annotators, {len(ratings)} ratings\n")
+    with pd.option_context("display.width", 200, "display.max_columns", None, "display.max_colwidth", 40):
+        print(reliability_table(ratings).to_string(), "\n")
+        print(agreement(ratings).round(3).to_string(), "\n")
+        if args.by_user:
+            print(criterion_rates(ratings, ("source", "user", "criterion")).round(3).to_string())
+    if args.csv:
+        criterion_rates(ratings).to_csv(args.csv)
+
+
+if __name__ == "__main__":
+    main()
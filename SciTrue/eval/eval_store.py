@@ -0,0 +1,132 @@
+#%%
+# Loaders and the annotator store behind eval_ui.py.
+# Results files and per-annotator eval files are parsed once and indexed by
+# claim key; later calls stat the files and reuse the parsed copy until the
+# mtime or size changes. A save upserts the evaluation by claim key and
+# rewrites the annotator's eval file through a temp file and os.replace, so
+# the *3.json file other tools read is complete after every save and never
+# half written.
+import os
+import json
+import threading
+
+
+def claim_key(claim) -> str:
+    return (claim or "").strip().lower()
+
+
+def source_slug(source: str) -> str:
+    # "GPT-4o" -> "gpt4o", as used in eval file names.
+    return source.lower().replace('-', '').replace(' ', '')
+
+
+def file_signature(*paths):
+    # (mtime_ns, size) per path, None for a missing file.
+    signature = []
+    for path in paths:
+        try:
+            st = os.stat(path)
+            signature.append((st.st_mtime_ns, st.st_size))
+        except FileNotFoundError:
+            signature.append(None)
+    return tuple(signature)
+
+# ----------------- RESULTS FILES -----------------
+
+class Results:
+    # One system's results JSON: the entries in file order plus claim key -> position.
+    def __init__(self, entries: list):
+        self.entries = entries
+        self.index = {}
+        for i, entry in enumerate(entries):
+            self.index.setdefault(claim_key(entry.get("claim")), i)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def find(self, claim):
+        i = self.index.get(claim_key(claim))
+        return None if i is None else self.entries[i]
+
+
+_results_cache = {}     # path -> (signature, Results)
+_results_lock = threading.Lock()
+
+
+def load_results(path: str):
+    # Results for path, or None if the file does not exist.
+    signature = file_signature(path)
+    if signature[0] is None:
+        return None
+    with _results_lock:
+        cached = _results_cache.get(path)
+        if cached is not None and cached[0] == signature:
+            return cached[1]
+    with open(path, "r", encoding="utf-8") as f:
+        results = Results(json.load(f))
+    with _results_lock:
+        _results_cache[path] = (signature, results)
+    return results
+
+# ----------------- ANNOTATOR STORE -----------------
+
+class EvalStore:
+    # One annotator's evaluations of one system, keyed by claim key in the
+    # order they were first saved.
+    def __init__(self, path: str):
+        self.path = path
+        self.lock = threading.Lock()
+        self.signature = None
+        self.evals = {}
+
+    def _refresh(self):
+        # Caller holds self.lock.
+        signature = file_signature(self.path)
+        if signature == self.signature:
+            return
+        evals = {}
+        if signature[0] is not None:
+            with open(self.path, "r", encoding="utf-8") as f:
+                for ev in json.load(f):
+                    evals[claim_key(ev.get("claim"))] = ev
+        self.evals = evals
+        self.signature = signature
+
+    def get(self, claim):
+        with self.lock:
+            self._refresh()
+            return self.evals.get(claim_key(claim))
+
+    def keys(self) -> set:
+        with self.lock:
+            self._refresh()
+            return set(self.evals)
+
+    def all(self) -> list:
+        with self.lock:
+            self._refresh()
+            return list(self.evals.values())
+
+    def upsert(self, result: dict):
+        # Replaces the evaluation of result["claim"] or adds it.
+        with self.lock:
+            self._refresh()
+            self.evals[claim_key(result.get("claim"))] = result
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(list(self.evals.values()), f, indent=2, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+            self.signature = file_signature(self.path)
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_eval_store(path: str) -> EvalStore:
+    with _stores_lock:
+        store = _stores.get(path)
+        if store is None:
+            store = _stores[path] = EvalStore(path)
+        return store
@@ -1,11 +1,14 @@
 #%%
 import streamlit as st
 from datetime import datetime
-import json
 import os
+import sys
 
 # === CONFIG: Paths to your JSON output files ===
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(BASE_DIR)
+
+from eval_store import load_results, get_eval_store, claim_key, source_slug
 
 JSON_FILES = {
     "GPT-4o": os.path.join(BASE_DIR, "gpt4o", "gpt4o_results3.json"),
@@ -13,15 +16,15 @@ JSON_FILES = {
     "SciTrue": os.path.join(BASE_DIR, "scitrue", "scitrue_results.json"),
 }
 def get_eval_file(source, username):
-    filename = f"{username.lower()}_{source.lower().replace('-', '').replace(' ', '')}3.json"
+    filename = f"{username.lower()}_{source_slug(source)}3.json"
     return os.path.join(BASE_DIR, "eval_output", filename)
 
 def load_json_output(path):
-    if not os.path.exists(path):
+    # Parsed once per file version; reruns reuse it until the file changes.
+    results = load_results(path)
+    if results is None:
         st.error(f"JSON file not found: {path}")
-        return None
-    with open(path, "r", encoding="utf-8") as f:
-        return json.load(f)
+    return results
 
 def badge_label(text, bg="#eee"):
     return f'<span style="background-color:{bg}; padding:4px 8px; border-radius:4px; font-weight:bold;">{text}</span>'
@@ -67,42 +70,12 @@ def get_username():
     return st.session_state["username"]
 
 def save_or_update_evaluation(result, source, username):
-    out_file = get_eval_file(source, username)
-    if os.path.exists(out_file):
-        with open(out_file, "r", encoding="utf-8") as f:
-            all_evals = json.load(f)
-    else:
-        all_evals = []
-    claim_key = result.get("claim", "").strip().lower()
-    updated = False
-    for i, ev in enumerate(all_evals):
-        if ev.get("claim", "").strip().lower() == claim_key:
-            all_evals[i] = result
-            updated = True
-            break
-    if not updated:
-        all_evals.append(result)
-    with open(out_file, "w", encoding="utf-8") as f:
-        json.dump(all_evals, f, indent=2, ensure_ascii=False)
-
-def load_existing_evals(source, username):
-    file = get_eval_file(source, username)
-    if os.path.exists(file):
-        with open(file, "r", encoding="utf-8") as f:
-            all_evals = json.load(f)
-        return all_evals
-    return []
+    get_eval_store(get_eval_file(source, username)).upsert(result)
 
 def evaluation_app(entry, source_name, username):
 
     # Load existing eval if any
-    all_existing = load_existing_evals(source_name, username)
-    claim_key = entry.get("claim", "").strip().lower()
-    existing_eval = None
-    for ev in all_existing:
-        if ev.get("claim", "").strip().lower() == claim_key:
-            existing_eval = ev
-            break
+    existing_eval = get_eval_store(get_eval_file(source_name, username)).get(entry.get("claim", ""))
 
     st.title("📝 Summary and Claim Evaluation")
     st.markdown(f"**Evaluating data from:** `{source_name}`  &nbsp;&nbsp;|&nbsp;&nbsp; 👤 **User:** `{username}`")
@@ -469,23 +442,21 @@ def main():
     json_choice = st.sidebar.selectbox("Choose a system output to evaluate:", list(JSON_FILES.keys()))
     selected_json_path = JSON_FILES[json_choice]
 
-    data = load_json_output(selected_json_path)
-    if not data:
+    results = load_json_output(selected_json_path)
+    if not results:
         st.stop()
+    data = results.entries
 
-    existing_evals = load_existing_evals(json_choice, username)
-    evaluated_claims = set(ev.get("claim", "").strip().lower() for ev in existing_evals)
+    evaluated_claims = get_eval_store(get_eval_file(json_choice, username)).keys()
 
-    options = []
-    for i, entry in enumerate(data):
-        claim = entry.get('claim', '').strip()
+    def claim_label(i):
+        claim = data[i].get('claim', '').strip()
         mark = "✔️ " if claim.lower() in evaluated_claims else ""
-        options.append(f"{mark}Claim {i+1}: {claim[:70]}")
+        return f"{mark}Claim {i+1}: {claim[:70]}"
 
-    choice = st.selectbox("Which claim would you like to evaluate?", options)
-    selected_idx = options.index(choice)
+    selected_idx = st.selectbox("Which claim would you like to evaluate?", range(len(data)), format_func=claim_label)
     selected_entry = data[selected_idx]
-    selected_claim = selected_entry.get("claim", "").strip().lower()
+    selected_claim = claim_key(selected_entry.get("claim", ""))
 
     if "last_loaded_claim" not in st.session_state:
         st.session_state["last_loaded_claim"] = ""
@@ -1,8 +1,12 @@
 import os
+import sys
 import json
-import re
+import asyncio
 import openai
-from generations.parsing_and_saving_functions import clean_and_convert
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from batch_runner import run_batch, batch_arg_parser
+from pipeline.llm_json import parse_llm_json
 api_key = os.getenv("OPEN_API_KEY")
 if not api_key:
     raise EnvironmentError("OPENAI_API_KEY not set")
@@ -62,9 +66,12 @@ Do NOT include any text outside this JSON.
 """
 }
 
-results = []
+JSON_OUTPUT_PATH = os.path.join(BASE_DIR, "gpt4o_results3.json")
+MODEL = "gpt-4o-search-preview"
+PROMPT_VERSION = "1"     # bump when system_message changes; checkpoints are keyed on it
 
-for claim, num_articles in claim_article_list:
+
+def request_completion(claim, num_articles):
     user_message = {
         "role": "user",
         "content": json.dumps({
@@ -72,45 +79,27 @@ for claim, num_articles in claim_article_list:
             "number of articles": str(num_articles)
         })
     }
-    try:
-        response = openai.ChatCompletion.create(
-            model="gpt-4o-search-preview",
-            messages=[system_message, user_message],
-            max_tokens=16384,
-            response_format={"type": "text"},  # Must be "text" with this model
-            web_search_options={"search_context_size": "high"}
-        )
-        text = response.choices[0].message["content"].strip()
-        print(user_message['content'])
-        # Extract JSON from GPT output text
-        json_string = text.replace('```json', '').replace('```', '').strip()
-        json_string = re.sub(r',\s*([\]}])', r'\1', json_string)
-        json_match = re.search(r"\{.*\}", json_string, re.DOTALL)
-        json_match=re.sub(r"^```json\s*|```$", "", text.strip(), flags=re.DOTALL)
-        
-        if not json_match:
-            raise ValueError("No JSON object found in the response")
-
-        # json_str = json_match.group(0)
-       
+    response = openai.ChatCompletion.create(
+        model=MODEL,
+        messages=[system_message, user_message],
+        max_tokens=16384,
+        response_format={"type": "text"},  # Must be "text" with this model
+        web_search_options={"search_context_size": "high"}
+    )
+    print(user_message['content'])
+    return response.choices[0].message["content"].strip()
 
-        data = json.loads(json_match)
 
-        results.append({
-            "claim": claim,
-            "num_articles": num_articles,
-            "output": data
-        })
-
-    except Exception as e:
-        results.append({
-            "claim": claim,
-            "num_articles": num_articles,
-            "error": str(e),
-            "raw_response": text if 'text' in locals() else None
-        })
+def parse_response(text):
+    # Raises LLMJSONError (a ValueError) when no JSON object can be recovered.
+    return parse_llm_json(text, expect=dict)
 
-with open("eval/gpt4o/gpt4o_results3.json", "w", encoding="utf-8") as f:
-    json.dump(results, f, ensure_ascii=False, indent=2)
 
-print("✅ Results saved to gpt4o_outputs.json")
+if __name__ == "__main__":
+    args = batch_arg_parser("Run the GPT-4o search baseline over data/test3.txt.").parse_args()
+    asyncio.run(run_batch(
+        claim_article_list, request_completion, parse_response, JSON_OUTPUT_PATH, provider="openai",
+        model=MODEL, prompt_version=PROMPT_VERSION,
+        concurrency=args.concurrency, resume=not args.fresh, retry_errors=not args.keep_errors,
+    ))
+    print("✅ Results saved to gpt4o_results3.json")
@@ -1,7 +1,12 @@
 import os
+import sys
 import json
-import re
+import asyncio
 import requests
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from batch_runner import run_batch, batch_arg_parser
+from pipeline.llm_json import parse_llm_json
 # API key from env
 api_key = os.getenv("PERPLEXITY_API_KEY")
 
@@ -64,9 +69,13 @@ Do NOT include any text outside this JSON.
 """
 }
 
-results = []
+base_dir = os.path.dirname(os.path.abspath(__file__))
+JSON_OUTPUT_PATH = os.path.join(base_dir, 'sonar_pro_outputs3.json')
+MODEL = "sonar-pro"
+PROMPT_VERSION = "1"     # bump when system_message changes; checkpoints are keyed on it
+
 
-for claim, num_articles in claim_article_list:
+def request_completion(claim, num_articles):
     user_message = {
         "role": "user",
         "content": json.dumps({
@@ -76,45 +85,32 @@ for claim, num_articles in claim_article_list:
     }
 
     payload = {
-        "model": "sonar-pro",
+        "model": MODEL,
         "messages": [system_message, user_message]
     }
 
-    try:
-        response = requests.post(
-            "https://api.perplexity.ai/chat/completions",
-            headers=headers,
-            data=json.dumps(payload)
-        )
-        response.raise_for_status()
-        res_json = response.json()
-
-        text = res_json["choices"][0]["message"]["content"].strip()
-
-        json_match = re.search(r"\{.*\}", text, re.DOTALL)
-        if not json_match:
-            raise ValueError("No JSON object found in the response")
-
-        data = json.loads(json_match.group(0))
+    response = requests.post(
+        "https://api.perplexity.ai/chat/completions",
+        headers=headers,
+        data=json.dumps(payload),
+        timeout=300
+    )
+    response.raise_for_status()
+    res_json = response.json()
 
-        results.append({
-            "claim": claim,
-            "num_articles": num_articles,
-            "output": data
-        })
+    return res_json["choices"][0]["message"]["content"].strip()
 
-    except Exception as e:
-        results.append({
-            "claim": claim,
-            "num_articles": num_articles,
-            "error": str(e),
-            "raw_response": text if 'text' in locals() else None
-        })
 
-base_dir = os.path.dirname(os.path.abspath(__file__))
-JSON_OUTPUT_PATH = os.path.join(base_dir, 'sonar_pro_outputs3.json')
+def parse_response(text):
+    # Raises LLMJSONError (a ValueError) when no JSON object can be recovered.
+    return parse_llm_json(text, expect=dict)
 
-with open(JSON_OUTPUT_PATH, "w", encoding="utf-8") as f:
-    json.dump(results, f, ensure_ascii=False, indent=2)
 
-print("✅ Results saved to sonar_pro_outputs.json")
+if __name__ == "__main__":
+    args = batch_arg_parser("Run the Perplexity Sonar Pro baseline over data/test3.txt.").parse_args()
+    asyncio.run(run_batch(
+        claim_article_list, request_completion, parse_response, JSON_OUTPUT_PATH, provider="perplexity",
+        model=MODEL, prompt_version=PROMPT_VERSION,
+        concurrency=args.concurrency, resume=not args.fresh, retry_errors=not args.keep_errors,
+    ))
+    print("✅ Results saved to sonar_pro_outputs3.json")
@@ -0,0 +1,149 @@
+#%%
+# Background workers draining storage/job_queue.py. Each worker thread claims
+# one job at a time, runs it on the shared verification pool, writes stage
+# progress and the partial summary back to the job, and logs the finished
+# result to the activity store, once for everyone waiting on the job. start_job_workers() is idempotent, so every
+# Streamlit script run can call it and a process starts its workers once.
+import os
+import time
+import socket
+import threading
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
+from pipeline.orchestrator import build_log_entry, SUMMARY_FIELDS
+from pipeline.streaming import STREAM_SUMMARY
+from pipeline.worker_pool import get_pool, PoolFull, VERIFY_TIMEOUT
+from pipeline.report_snapshot import log_with_snapshot
+from storage.job_queue import (
+    claim_next_job,
+    update_job,
+    finish_job,
+    fail_job,
+    job_waiters,
+    requeue_stale_jobs,
+    purge_finished_jobs,
+)
+
+JOB_WORKERS = int(os.getenv("SCITRUE_JOB_WORKERS", "4"))
+POLL_SECONDS = 0.5
+HEARTBEAT_SECONDS = 15
+MAINTENANCE_SECONDS = 60
+# Partial summary text is written at most this often while streaming.
+PARTIAL_WRITE_SECONDS = 0.5
+
+STAGE_PROGRESS = {
+    "refinement": 20,
+    "retrieval": 40,
+    "summary_delta": 50,
+    "summary": 70,
+    "extraction": 80,
+}
+
+_started = False
+_start_lock = threading.Lock()
+
+
+def job_result(result, entry):
+    # What the UI needs to render a finished job besides the log entry.
+    return {
+        "entry": entry,
+        "html_code": result["html_code"],
+        "hint": result["hint"],
+        "timings": result["timings"],
+        "extraction_error": result.get("extraction_error"),
+        "extraction_raw": result.get("extraction_raw"),
+    }
+
+
+def stage_reporter(job_id):
+    last_partial = [0.0]
+
+    def on_stage(stage, payload):
+        if stage not in STAGE_PROGRESS:
+            return
+        if stage == "summary_delta":
+            now = time.monotonic()
+            if now - last_partial[0] < PARTIAL_WRITE_SECONDS:
+                return
+            last_partial[0] = now
+            update_job(job_id, "summary", STAGE_PROGRESS[stage], partial=payload)
+        elif stage == "summary":
+            partial = {field: payload.get(field, "") for field in SUMMARY_FIELDS}
+            update_job(job_id, stage, STAGE_PROGRESS[stage], partial=partial)
+        elif stage == "retrieval":
+            update_job(job_id, stage, STAGE_PROGRESS[stage], hint=payload or None)
+        else:
+            update_job(job_id, stage, STAGE_PROGRESS[stage])
+    return on_stage
+
+
+def run_job(job):
+    pool = get_pool()
+    while True:
+        try:
+            future = pool.submit(job["claim"], job["articles"], request_id=job["id"],
+                                 on_stage=stage_reporter(job["id"]), stream=STREAM_SUMMARY)
+            break
+        except PoolFull:
+            update_job(job["id"])
+            time.sleep(POLL_SECONDS)
+    # Same limit as the /verify API. Cancelling the future stops this
+    # submission's wait; once no submission waits on the run any more,
+    # SingleFlight cancels the pipeline, which frees its worker and lease. A
+    # provider call already running in a thread still finishes, but nothing
+    # waits for it.
+    deadline = time.monotonic() + VERIFY_TIMEOUT
+    while True:
+        try:
+            result = future.result(timeout=max(0.0, min(HEARTBEAT_SECONDS, deadline - time.monotonic())))
+            break
+        except FutureTimeoutError:
+            if time.monotonic() >= deadline:
+                future.cancel()
+                fail_job(job["id"], error=f"Verification did not finish within {VERIFY_TIMEOUT:.0f} seconds.")
+                return
+            update_job(job["id"])
+    if not result["ok"]:
+        fail_job(job["id"], hint=result["hint"] or "No summary could be generated for this claim.")
+        return
+    # Each submitter gets the claim in their own history. The waiters are
+    # read once the job is done, when no one can join it any more.
+    finish_job(job["id"], job_result(result, build_log_entry(result, job["user"], job["email"])))
+    for waiter in job_waiters(job["id"]) or [{"user": job["user"], "email": job["email"]}]:
+        log_with_snapshot(build_log_entry(result, waiter["user"], waiter["email"]), result["html_code"])
+
+
+def worker_loop(worker_id):
+    last_maintenance = 0.0
+    while True:
+        if time.monotonic() - last_maintenance > MAINTENANCE_SECONDS:
+            last_maintenance = time.monotonic()
+            try:
+                requeue_stale_jobs()
+                purge_finished_jobs()
+            except Exception as e:
+                print(f"[ERROR] Job queue maintenance failed: {e}")
+        try:
+            job = claim_next_job(worker_id)
+        except Exception as e:
+            print(f"[ERROR] Could not claim a job: {e}")
+            job = None
+        if job is None:
+            time.sleep(POLL_SECONDS)
+            continue
+        try:
+            run_job(job)
+        except Exception as e:
+            print(f"[ERROR] Job {job['id']} failed: {e}")
+            fail_job(job["id"], error=str(e))
+
+
+def start_job_workers(count: int = JOB_WORKERS):
+    global _started
+    with _start_lock:
+        if _started:
+            return
+        prefix = f"{socket.gethostname()}:{os.getpid()}"
+        for i in range(count):
+            threading.Thread(target=worker_loop, args=(f"{prefix}:{i}",), name=f"job-worker-{i}", daemon=True).start()
+        _started = True
@@ -0,0 +1,278 @@
+#%%
+# JSON from LLM output. parse_llm_json is the one tolerant parser for every
+# completion that should hold JSON: it accepts code fences, prose around the
+# value, trailing commas, smart-quote string delimiters, raw newlines inside
+# strings and a truncated tail. With complete=True a truncated value raises
+# LLMJSONTruncated instead, for callers that must not take half an answer
+# for a whole one. JSONFieldStreamer handles completions that
+# are still being generated, so a UI can show e.g. the executive summary
+# while the rest is streaming in. Corpus and fuzz tests: tests/test_llm_json.py.
+import re
+import json
+
+_ESCAPES = {'"': '"', '\\': '\\', '/': '/', 'b': '\b', 'f': '\f', 'n': '\n', 'r': '\r', 't': '\t'}
+
+
+class JSONFieldStreamer:
+    # feed(chunk) returns {field: newly decoded text} for the watched top-level
+    # string fields; values holds everything decoded so far.
+    def __init__(self, fields):
+        self.fields = set(fields)
+        self.values = {field: "" for field in fields}
+        self.done = set()
+        self.depth = 0
+        self.in_string = False
+        self.escape = ""
+        self.expect_key = False
+        self.token = []
+        self.key = None
+        self.current = None   # watched field whose value is being read
+
+    def _emit_char(self, out, ch):
+        if self.current is not None:
+            out[self.current] = out.get(self.current, "") + ch
+            self.values[self.current] += ch
+        elif self.expect_key:
+            self.token.append(ch)
+
+    def _end_string(self):
+        if self.current is not None:
+            self.done.add(self.current)
+            self.current = None
+        elif self.expect_key and self.depth == 1:
+            self.key = "".join(self.token)
+        self.token = []
+
+    def feed(self, chunk: str):
+        out = {}
+        for ch in chunk:
+            if self.in_string:
+                if self.escape:
+                    self.escape += ch
+                    if self.escape[1] == "u":
+                        if len(self.escape) < 6:
+                            continue
+                        try:
+                            decoded = chr(int(self.escape[2:], 16))
+                        except ValueError:
+                            decoded = ""
+                    else:
+                        decoded = _ESCAPES.get(ch, ch)
+                    self.escape = ""
+                    self._emit_char(out, decoded)
+                elif ch == "\\":
+                    self.escape = ch
+                elif ch == '"':
+                    self.in_string = False
+                    self._end_string()
+                else:
+                    self._emit_char(out, ch)
+                continue
+            if ch == '"':
+                self.in_string = True
+                if self.depth == 1 and not self.expect_key and self.key in self.fields and self.key not in self.done:
+                    self.current = self.key
+            elif ch in "{[":
+                self.depth += 1
+                self.expect_key = ch == "{" and self.depth == 1
+            elif ch in "}]":
+                self.depth -= 1
+            elif ch == ":" and self.depth == 1:
+                self.expect_key = False
+            elif ch == "," and self.depth == 1:
+                self.expect_key = True
+                self.key = None
+        return out
+
+
+# ----------------- TOLERANT PARSER -----------------
+
+class LLMJSONError(ValueError):
+    # No JSON value could be recovered; raw holds the text that was parsed.
+    def __init__(self, message, raw=""):
+        super().__init__(message)
+        self.raw = raw
+
+
+class LLMJSONTruncated(LLMJSONError):
+    # The completion ended before the value did. value is what parse_llm_json
+    # returns without complete=True; cut is False when only closing brackets
+    # were missing, True when a string or element was cut off or dropped.
+    def __init__(self, message, raw="", value=None, cut=True):
+        super().__init__(message, raw)
+        self.value = value
+        self.cut = cut
+
+
+_decoder = json.JSONDecoder()
+_FENCE_TAG = re.compile(r"[a-zA-Z]*[ \t]*\n?")
+# Characters that change the repair state; everything between them is copied as is.
+_OUTSIDE = re.compile(r'["\u201c\u201d{}\[\],:]|\b(?:None|True|False)\b')
+_INSIDE = re.compile(r'["\\\u201c\u201d\x00-\x1f]')
+_LITERALS = {"None": "null", "True": "true", "False": "false"}
+_CONTROL = {"\n": "\\n", "\r": "\\r", "\t": "\\t"}
+_CLOSERS = {"{": "}", "[": "]"}
+# Inside prose an array only counts if it holds objects, arrays or strings,
+# so citations like "[1]" are skipped; at the start of the text any value counts.
+_START = re.compile(r'^\s*([\[{])|\{|\[(?=\s*[\[{"\u201c\]])')
+_MAX_STARTS = 20
+_MAX_CUTS = 5
+
+
+def _repair(text: str):
+    # One pass over text that rewrites the lenient parts into strict JSON.
+    # Returns (repaired, tail): tail is None when every string and bracket was
+    # closed, otherwise (in_string, stack, cuts) for _close_candidates, where
+    # cuts are (length, stack) just before each comma.
+    out = []
+    stack = []
+    cuts = []
+    in_string = False
+    smart = False   # the open string was started by a smart quote
+    pos = 0
+    n = len(text)
+    while pos < n:
+        match = (_INSIDE if in_string else _OUTSIDE).search(text, pos)
+        if match is None:
+            out.append(text[pos:])
+            break
+        out.append(text[pos:match.start()])
+        token = match.group()
+        pos = match.end()
+        if in_string:
+            if token == "\\":
+                out.append(text[match.start():pos + 1])
+                pos += 1
+            elif token == '"':
+                if smart:
+                    out.append('\\"')
+                else:
+                    out.append('"')
+                    in_string = False
+            elif token in "\u201c\u201d":
+                if smart:
+                    out.append('"')
+                    in_string = False
+                else:
+                    out.append(token)
+            else:
+                out.append(_CONTROL.get(token) or f"\\u{ord(token):04x}")
+        elif token in _LITERALS:
+            out.append(_LITERALS[token])
+        elif token == '"' or token in "\u201c\u201d":
+            out.append('"')
+            in_string = True
+            smart = token != '"'
+        elif token in "{[":
+            stack.append(token)
+            out.append(token)
+        elif token in "}]":
+            _drop_trailing_comma(out)
+            if stack:
+                stack.pop()
+            out.append(token)
+        elif token == ",":
+            cuts.append((len(out), tuple(stack)))
+            out.append(token)
+        else:
+            out.append(token)
+    repaired = "".join(out)
+    if not in_string and not stack:
+        return repaired, None
+    if in_string and repaired.endswith("\\") and not repaired.endswith("\\\\"):
+        repaired = repaired[:-1]
+    return repaired, (in_string, tuple(stack), [("".join(out[:length]), st) for length, st in cuts[-_MAX_CUTS:]])
+
+
+def _drop_trailing_comma(out):
+    i = len(out) - 1
+    while i >= 0 and not out[i].strip():
+        i -= 1
+    if i >= 0 and out[i].rstrip().endswith(","):
+        out[i] = out[i].rstrip()[:-1]
+
+
+def _close(text: str, stack) -> str:
+    text = text.rstrip()
+    if text.endswith(":"):
+        text += " null"
+    elif text.endswith(","):
+        text = text[:-1]
+    return text + "".join(_CLOSERS[bracket] for bracket in reversed(stack))
+
+
+def _close_candidates(repaired, tail):
+    # Closes a truncated value: first as it stands, then cut back to each of
+    # the last commas, dropping the element that was cut off. Yields
+    # (candidate, cut): cut is False only when nothing but closing brackets
+    # was added, i.e. every string and element in it is complete.
+    in_string, stack, cuts = tail
+    yield _close(repaired + ('"' if in_string else ""), stack), in_string or repaired.rstrip().endswith(":")
+    for text, cut_stack in reversed(cuts):
+        yield _close(text, cut_stack), True
+
+
+def _decode(text: str, start: int, expect):
+    # Decodes the value at text[start:], ignoring whatever follows it.
+    # Returns (value, cut): cut is None for a complete value, else as in
+    # _close_candidates.
+    segment = text[start:]
+    try:
+        return _decoder.raw_decode(segment)[0], None
+    except json.JSONDecodeError:
+        pass
+    repaired, tail = _repair(segment)
+    candidates = [(repaired, None)] if tail is None else [(repaired, None), *_close_candidates(repaired, tail)]
+    for candidate, cut in candidates:
+        try:
+            value = _decoder.raw_decode(candidate)[0]
+        except json.JSONDecodeError:
+            continue
+        if expect is None or isinstance(value, expect):
+            return value, cut
+    raise json.JSONDecodeError("no JSON value", segment, 0)
+
+
+def _sources(text: str):
+    # The contents of the first code fence, then the text without fences.
+    fence = text.find("```")
+    if fence >= 0:
+        start = _FENCE_TAG.match(text, fence + 3).end()
+        end = text.find("```", start)
+        yield text[start:] if end < 0 else text[start:end]
+        yield text.replace("```json", "").replace("```", "")
+    else:
+        yield text
+
+
+def parse_llm_json(text: str, expect=None, complete: bool = False):
+    # The JSON value in an LLM completion. expect (dict or list) restricts the
+    # result to that type; a truncated value is closed after its last complete
+    # element, or with complete=True rejected with LLMJSONTruncated. Raises
+    # LLMJSONError if nothing can be recovered.
+    if not isinstance(text, str):
+        raise LLMJSONError(f"expected str, got {type(text).__name__}", "")
+    try:
+        value = json.loads(text)
+        if expect is None or isinstance(value, expect):
+            return value
+    except json.JSONDecodeError:
+        pass
+    openers = {dict: "{", list: "["}.get(expect, "{[")
+    for source in _sources(text):
+        starts = 0
+        for match in _START.finditer(source):
+            start = match.start(1) if match.group(1) else match.start()
+            if source[start] not in openers:
+                continue
+            try:
+                value, cut = _decode(source, start, expect)
+            except json.JSONDecodeError:
+                starts += 1
+                if starts >= _MAX_STARTS:
+                    break
+                continue
+            if cut is not None and complete:
+                raise LLMJSONTruncated("the completion ends before the JSON value does", text, value, cut)
+            return value
+    raise LLMJSONError("no JSON value found in the completion", text)
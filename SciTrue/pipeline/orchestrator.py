@@ -0,0 +1,528 @@
+#%%
+# The claim verification pipeline as one coroutine on a single event loop.
+# Stages that do not depend on each other run concurrently: SJR lookups for
+# the retrieved venues start right after retrieval and overlap with the
+# summary and sub-claim completions. Blocking stages run in worker threads.
+import os
+import sys
+import json
+import time
+import uuid
+import asyncio
+import threading
+from datetime import datetime
+
+SCITRUE_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(SCITRUE_ROOT)
+sys.path.append(os.path.join(SCITRUE_ROOT, "demo"))
+
+from prompt_makers.claim_extract_prompt import make_claim_extraction_query, PROMPT_VERSION as EXTRACTION_PROMPT_VERSION
+from prompt_makers.claim_refinement_prompt import PROMPT_VERSION as REFINEMENT_PROMPT_VERSION
+from prompt_makers.evidence_list_prompt_maker import PROMPT_VERSION as EVIDENCE_PROMPT_VERSION
+from prompt_makers.report_with_link_prompt import (
+    build_report_prompt,
+    has_rows,
+    is_usable_revision,
+    save_evidence_debug,
+    NOT_SCIENTIFIC_HINT,
+    PROMPT_VERSION as REPORT_PROMPT_VERSION,
+)
+from generations.evidence_synthesis import main_evidence_list
+from generations.claim_refinement import get_revised_query
+from generations.parsing_and_saving_functions import (
+    clean_and_convert,
+    add_evidence_to_claims,
+    update_list_with_journal_and_venue,
+)
+from calls.one_generation import get_one_completion
+from calls.sjr import get_journal_info_dict
+from html_functions import build_html_tree, generate_html_code
+from storage.stage_cache import cached_acall, get_cached, put_cached, stage_key, STAGE_CACHE_ENABLED, MISSING
+from storage.journal_index import get_journal_index
+from storage.claim_similarity import claim_vector, cosine
+from pipeline.llm_json import JSONFieldStreamer, LLMJSONError, LLMJSONTruncated, parse_llm_json
+from pipeline.streaming import stream_completion, stream_model
+from pipeline.tracing import Trace, estimate_tokens, metrics
+
+SUMMARY_FIELDS = ("executive summary", "accuracy", "reason for accuracy")
+
+# Speculative retrieval: start retrieving on the raw claim while it is being
+# refined, and keep that work if the refined query turns out equivalent. On a
+# miss the speculative retrieval still runs to the end (its worker thread
+# cannot be interrupted), so with SCITRUE_SPECULATION_MERGE its rows are
+# appended to the revised query's evidence rather than thrown away.
+SPECULATIVE_RETRIEVAL = os.getenv("SCITRUE_SPECULATIVE_RETRIEVAL", "0") == "1"
+SPECULATION_THRESHOLD = float(os.getenv("SCITRUE_SPECULATION_THRESHOLD", "0.9"))
+SPECULATION_MERGE = os.getenv("SCITRUE_SPECULATION_MERGE", "1") == "1"
+EVIDENCE_KEY = ("url", "relevant sentence")
+
+speculation_stats = {"attempts": 0, "hits": 0, "merged": 0, "saved_seconds": 0.0}
+_speculation_lock = threading.Lock()
+
+SJR_HELP_URL = "https://www.scimagojr.com/help.php"
+
+# Written to by the generation modules; created on the first run rather than
+# as an import side effect.
+OUTPUT_DIRS = [
+    os.path.join(SCITRUE_ROOT, "outputs", "report"),
+    os.path.join(SCITRUE_ROOT, "outputs", "evidence"),
+]
+_output_dirs_ready = False
+
+
+def notify(on_stage, stage, payload=None):
+    if on_stage is not None:
+        on_stage(stage, payload)
+
+
+def ensure_output_dirs():
+    global _output_dirs_ready
+    if not _output_dirs_ready:
+        for d in OUTPUT_DIRS:
+            os.makedirs(d, exist_ok=True)
+        _output_dirs_ready = True
+
+# ----------------- SJR ENRICHMENT -----------------
+
+def journal_lookup_name(journal_name, venue_name):
+    # '&' is spelled out here for the get_journal_info_dict fallback; the
+    # index normalizes it on its own.
+    journal_name = (journal_name or '').strip().replace('&', 'and').strip()
+    venue_name = (venue_name or '').strip().replace('&', 'and').strip()
+    return journal_name or venue_name
+
+
+def format_sjr(journal_info):
+    return {
+        "SCImago Journal Rank": journal_info['SJR'],
+        "Country": journal_info["Country"],
+        "Journal  H index": journal_info["H index"],
+        "Metric Definitions": SJR_HELP_URL,
+    }
+
+
+async def lookup_journal(name):
+    try:
+        return await cached_acall(
+            "sjr", name,
+            lambda: asyncio.to_thread(get_journal_info_dict, name),
+            cache_if=lambda info: isinstance(info, dict),
+        )
+    except Exception as e:
+        print(f"[ERROR] Failed to fetch SJR info for '{name}': {e}")
+        return None
+
+
+async def lookup_journals(names, tags=None):
+    # One batch against the preloaded SJR index; only names it cannot resolve
+    # fall back to individual get_journal_info_dict calls.
+    infos = get_journal_index().resolve_many(names)
+    unresolved = sorted(name for name, info in infos.items() if info is None)
+    if tags is not None:
+        tags["index_hits"] = tags.get("index_hits", 0) + len(infos) - len(unresolved)
+        tags["fallback_lookups"] = tags.get("fallback_lookups", 0) + len(unresolved)
+    fallback = await asyncio.gather(*(lookup_journal(name) for name in unresolved))
+    infos.update(zip(unresolved, fallback))
+    return infos
+
+
+def evidence_journal_names(raw_data, k):
+    relevant = raw_data[raw_data['relevance'] == "yes"].head(k)
+    journals = relevant['journal_title'] if 'journal_title' in relevant else [''] * len(relevant)
+    venues = relevant['venue'] if 'venue' in relevant else [''] * len(relevant)
+    return [journal_lookup_name(j, v) for j, v in zip(journals, venues)]
+
+
+def attach_sjr(extended_output, journal_infos):
+    for item in extended_output:
+        name = journal_lookup_name(item.get('journal_title', ''), item.get('venue', ''))
+        if not name:
+            continue
+        journal_info = journal_infos.get(name)
+        if isinstance(journal_info, dict):
+            item['sjr'] = format_sjr(journal_info)
+        else:
+            print(f"[WARN] No SJR info found for journal: '{name}'")
+
+# ----------------- SUMMARY -----------------
+
+async def stream_summary(prompt, model, timings, start, on_stage):
+    # Streams the summary completion and reports the decoded JSON fields as they
+    # grow. Falls back to the one-shot completion if streaming fails before
+    # producing anything.
+    streamer = JSONFieldStreamer(SUMMARY_FIELDS)
+    chunks = []
+    try:
+        async for delta in stream_completion(prompt, model):
+            chunks.append(delta)
+            new_text = streamer.feed(delta)
+            if new_text.get("executive summary") and "summary_first_token" not in timings:
+                timings["summary_first_token"] = time.perf_counter() - start
+            if new_text:
+                notify(on_stage, "summary_delta", dict(streamer.values))
+    except Exception as e:
+        if chunks:
+            raise
+        print(f"[WARN] Streaming completion failed, retrying without streaming: {e}")
+        return await get_one_completion(prompt)
+    return "".join(chunks)
+
+
+async def generate_summary(prompt, timings, start, on_stage, stream, tags=None):
+    model = stream_model() if stream else None
+    if model is None:
+        return await cached_acall(
+            "summary", prompt, lambda: get_one_completion(prompt), version=REPORT_PROMPT_VERSION,
+            cache_if=summary_is_complete, tags=tags,
+        )
+    # Streaming uses get_one_completion's model, so both paths share one cache
+    # entry (keyed on that model); a hit is simply not streamed.
+    tags = tags if tags is not None else {}
+    key = stage_key("summary", prompt, REPORT_PROMPT_VERSION, model)
+    tags["cache"] = "off"
+    if STAGE_CACHE_ENABLED:
+        completion = get_cached(key, "summary")
+        if completion is not MISSING:
+            tags["cache"] = "hit"
+            return completion
+        tags["cache"] = "miss"
+    tags["streamed"] = True
+    completion = await stream_summary(prompt, model, timings, start, on_stage)
+    if STAGE_CACHE_ENABLED and summary_is_complete(completion):
+        put_cached(key, "summary", completion)
+    return completion
+
+# ----------------- RETRIEVAL -----------------
+
+async def retrieve_evidence(query, k, tags=None):
+    return await cached_acall(
+        "retrieval", {"claim": query, "k": k},
+        lambda: asyncio.to_thread(main_evidence_list, claim=query, k=k),
+        version=EVIDENCE_PROMPT_VERSION, cache_if=has_rows, tags=tags,
+    )
+
+
+async def timed_retrieval(query, k, tags=None):
+    retrieval_start = time.perf_counter()
+    raw_data = await retrieve_evidence(query, k, tags)
+    return raw_data, time.perf_counter() - retrieval_start
+
+
+def queries_equivalent(claim, revised_query, threshold: float = SPECULATION_THRESHOLD) -> bool:
+    if claim.strip().lower() == revised_query.strip().lower():
+        return True
+    return cosine(claim_vector(claim), claim_vector(revised_query)) >= threshold
+
+
+def record_speculation(hit, saved_seconds=0.0, merged=False):
+    with _speculation_lock:
+        speculation_stats["attempts"] += 1
+        if hit:
+            speculation_stats["hits"] += 1
+            speculation_stats["saved_seconds"] += saved_seconds
+        if merged:
+            speculation_stats["merged"] += 1
+
+
+def speculation_hit_rate():
+    with _speculation_lock:
+        attempts = speculation_stats["attempts"]
+        return speculation_stats["hits"] / attempts if attempts else 0.0
+
+
+def speculation_gauges():
+    with _speculation_lock:
+        stats = dict(speculation_stats)
+    return {
+        "speculation_attempts": stats["attempts"],
+        "speculation_hits": stats["hits"],
+        "speculation_hit_rate": round(speculation_hit_rate(), 3),
+        "speculation_merged": stats["merged"],
+        "speculation_saved_seconds": round(stats["saved_seconds"], 3),
+    }
+
+
+metrics.register_gauges("speculation", speculation_gauges)
+
+
+def _retrieve_exception(task):
+    if not task.cancelled():
+        task.exception()
+
+
+def discard_speculation(task):
+    # cancel() only stops waiting: the worker thread running main_evidence_list
+    # finishes regardless. An error it raises is retrieved here instead of
+    # being reported as "Task exception was never retrieved".
+    if task.done():
+        _retrieve_exception(task)
+    else:
+        task.cancel()
+        task.add_done_callback(_retrieve_exception)
+
+
+def finished_speculation(task):
+    # Rows of a speculative retrieval that has already finished, else None.
+    if not task.done() or task.cancelled() or task.exception() is not None:
+        return None
+    raw_data, _ = task.result()
+    return raw_data if has_rows(raw_data) else None
+
+
+def merge_evidence(raw_data, extra):
+    # raw_data followed by the rows of extra it does not already contain, so
+    # the revised query's evidence still comes first in the report prompt.
+    # Returns (merged frame, number of rows added).
+    import pandas as pd
+
+    if not has_rows(raw_data):
+        return extra, len(extra)
+    key = [c for c in EVIDENCE_KEY if c in raw_data and c in extra]
+    if not key:
+        return raw_data, 0
+    seen = set(raw_data[key].astype(str).itertuples(index=False, name=None))
+    new_rows = extra[[row not in seen for row in extra[key].astype(str).itertuples(index=False, name=None)]]
+    if new_rows.empty:
+        return raw_data, 0
+    return pd.concat([raw_data, new_rows], ignore_index=True), len(new_rows)
+
+
+def refinement_is_cached(claim) -> bool:
+    return STAGE_CACHE_ENABLED and get_cached(
+        stage_key("refinement", claim, REFINEMENT_PROMPT_VERSION), "refinement"
+    ) is not MISSING
+
+# ----------------- PIPELINE -----------------
+
+def parse_sub_claims(completion):
+    # The model writes "Empty string" for fields it leaves empty.
+    return parse_llm_json(completion.replace("Empty string", ""), expect=list)
+
+
+def summary_is_complete(completion) -> bool:
+    # False for a completion that ends inside the summary JSON, unless only
+    # the closing brackets are missing: cut off earlier, the summary may end
+    # mid-sentence or lack the accuracy and its reasoning. Such completions
+    # are neither cached nor shown.
+    if not completion:
+        return False
+    try:
+        parse_llm_json(completion, expect=dict, complete=True)
+    except LLMJSONTruncated as e:
+        return not e.cut and all(field in e.value for field in SUMMARY_FIELDS)
+    except LLMJSONError:
+        pass
+    return True
+
+
+def parse_summary(completion):
+    # Falls back to the older cleaner for output the tolerant parser rejects.
+    if completion and not summary_is_complete(completion):
+        print("[WARN] Summary completion was cut off before the summary was complete; discarding it.")
+        return None
+    try:
+        summary = parse_llm_json(completion, expect=dict)
+    except LLMJSONError:
+        return clean_and_convert(completion)
+    return summary if "executive summary" in summary else clean_and_convert(completion)
+
+
+def evidence_counts(raw_data):
+    if not has_rows(raw_data):
+        return {"evidence": 0}
+    counts = {"evidence": len(raw_data)}
+    if 'relevance' in raw_data:
+        counts["relevant"] = int((raw_data['relevance'] == "yes").sum())
+    return counts
+
+
+async def run_pipeline(claim, k, trace, on_stage, stream, speculative):
+    request_id = trace.request_id
+    timings = trace.timings
+    result = {
+        "request_id": request_id,
+        "claim": claim,
+        "articles": k,
+        "ok": False,
+        "hint": None,
+        "timings": timings,
+    }
+    start = trace.start
+    ensure_output_dirs()
+
+    # A cached refinement returns immediately, so there is nothing to overlap.
+    speculation = None
+    speculation_tags = {}
+    if speculative and not refinement_is_cached(claim):
+        speculation = asyncio.create_task(timed_retrieval(claim, k, speculation_tags))
+
+    try:
+        with trace.span("refinement") as tags:
+            revised_query = await cached_acall(
+                "refinement", claim, lambda: get_revised_query(claim), version=REFINEMENT_PROMPT_VERSION, tags=tags,
+            )
+            tags["tokens_out"] = estimate_tokens(revised_query)
+        result["revised_query"] = revised_query
+        if not is_usable_revision(revised_query):
+            result["hint"] = NOT_SCIENTIFIC_HINT
+            return result
+        notify(on_stage, "refinement", revised_query)
+
+        # Evidence classification happens inside main_evidence_list, so it is
+        # part of this span; the tags record how much of the evidence was kept.
+        with trace.span("retrieval") as tags:
+            if speculation is not None and queries_equivalent(claim, revised_query):
+                # Retrieval has been running since before refinement, so the
+                # overlap saved is whichever of the two finished first.
+                raw_data, retrieval_seconds = await speculation
+                record_speculation(True, min(timings["refinement"], retrieval_seconds))
+                result["speculation"] = "hit"
+                tags.update(speculation_tags)
+            else:
+                raw_data = await retrieve_evidence(revised_query, k, tags)
+                if speculation is not None:
+                    # The raw-claim retrieval started earlier and has usually
+                    # finished by now; it is not waited for if it has not.
+                    added = 0
+                    extra = finished_speculation(speculation) if SPECULATION_MERGE else None
+                    if extra is not None:
+                        raw_data, added = merge_evidence(raw_data, extra)
+                        tags["speculation_rows"] = added
+                    record_speculation(False, merged=added > 0)
+                    result["speculation"] = "merged" if added else "miss"
+            tags.update(evidence_counts(raw_data))
+            if "speculation" in result:
+                tags["speculation"] = result["speculation"]
+    finally:
+        if speculation is not None:
+            discard_speculation(speculation)
+    save_evidence_debug(raw_data, request_id)
+    result["evidence"] = raw_data
+    prompt, ok, hint = build_report_prompt(claim, k, raw_data)
+    result["hint"] = hint
+    if not ok:
+        return result
+    notify(on_stage, "retrieval", hint)
+
+    # SJR lookups only need the venues of the top-k evidence, so they run
+    # while the summary and sub-claims are generated.
+    sjr_start = time.perf_counter()
+    sjr_tags = {}
+    sjr_task = asyncio.create_task(lookup_journals(evidence_journal_names(raw_data, k), sjr_tags))
+
+    try:
+        with trace.span("summary", tokens_in=estimate_tokens(prompt)) as tags:
+            completion = await generate_summary(prompt, timings, start, on_stage, stream, tags)
+            tags["tokens_out"] = estimate_tokens(completion)
+            cleaned_data = parse_summary(completion)
+        timings.setdefault("summary_first_token", time.perf_counter() - start)
+        if not cleaned_data:
+            return result
+        result["summary"] = cleaned_data
+        notify(on_stage, "summary", cleaned_data)
+
+        extraction_prompt = make_claim_extraction_query(cleaned_data["executive summary"], claim)
+        with trace.span("extraction", tokens_in=estimate_tokens(extraction_prompt)) as tags:
+            completion = await cached_acall(
+                "extraction", extraction_prompt, lambda: get_one_completion(extraction_prompt),
+                version=EXTRACTION_PROMPT_VERSION, tags=tags,
+            )
+            tags["tokens_out"] = estimate_tokens(completion)
+            try:
+                sub_claims = parse_sub_claims(completion)
+            except LLMJSONError as e:
+                result["extraction_error"] = str(e)
+                result["extraction_raw"] = completion
+                tags["error"] = "LLMJSONError"
+                sub_claims = []
+            tags["subclaims"] = len(sub_claims)
+        result["subclaims"] = sub_claims
+        notify(on_stage, "extraction", sub_claims)
+
+        output = add_evidence_to_claims(cleaned_data, sub_claims)
+        extended_output = update_list_with_journal_and_venue(raw_data, output)
+        try:
+            journal_infos = await sjr_task
+            # Sub-claims can point at venues outside the prefetched top-k.
+            missing = [
+                journal_lookup_name(item.get('journal_title', ''), item.get('venue', ''))
+                for item in extended_output
+            ]
+            missing = [name for name in missing if name and name not in journal_infos]
+            if missing:
+                journal_infos.update(await lookup_journals(missing, sjr_tags))
+        except BaseException as e:
+            sjr_tags["error"] = type(e).__name__
+            raise
+        finally:
+            # The lookups overlap the completions, so this span starts at retrieval.
+            trace.add_span("sjr", sjr_start, time.perf_counter() - sjr_start, sjr_tags)
+        attach_sjr(extended_output, journal_infos)
+    finally:
+        if not sjr_task.done():
+            sjr_task.cancel()
+    result["report"] = extended_output
+
+    with trace.span("render"):
+        result["html_code"] = generate_html_code(build_html_tree(extended_output))
+    result["ok"] = True
+    return result
+
+
+async def verify_claim(claim: str, k: int, request_id: str = None, on_stage=None, stream: bool = False,
+                       speculative: bool = SPECULATIVE_RETRIEVAL):
+    # Runs the whole pipeline for one claim. on_stage(stage, payload) is called
+    # as stages finish so a UI can show partial results; with stream=True it
+    # also receives "summary_delta" updates while the summary is generated.
+    # Every call leaves one trace, see pipeline/tracing.py.
+    trace = Trace(request_id or uuid.uuid4().hex, claim, k)
+    try:
+        result = await run_pipeline(claim, k, trace, on_stage, stream, speculative)
+    except BaseException as e:
+        trace.finish(False, error=type(e).__name__)
+        raise
+    trace.timings["total"] = time.perf_counter() - trace.start
+    trace.finish(result["ok"], hint=result["hint"])
+    if result["ok"]:
+        print(f"[TIMING] {trace.request_id}: first summary text after {trace.timings['summary_first_token']:.2f}s, "
+              f"total {trace.timings['total']:.2f}s")
+        notify(on_stage, "done", result)
+    return result
+
+
+def build_log_entry(result, username, email):
+    # The record stored by log_activity for a finished verification.
+    cleaned_data = result["summary"]
+    return {
+        "user": username,
+        "email": email,
+        "claim": result["claim"],
+        "articles": result["articles"],
+        "summary": cleaned_data['executive summary'],
+        "overall accuracy": cleaned_data.get("accuracy", ""),
+        "overall reason for accuracy": cleaned_data.get("reason for accuracy", ""),
+        "subclaims": result.get("subclaims", []),
+        "timestamp": str(datetime.now()),
+        "elapsed seconds": round(result["timings"].get("total", 0.0), 2),
+    }
+
+
+def run_verification(claim: str, k: int, request_id: str = None, on_stage=None):
+    # Blocking entry point for callers without an event loop (CLI, scripts).
+    return asyncio.run(verify_claim(claim, k, request_id=request_id, on_stage=on_stage))
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Verify a scientific claim from the command line.")
+    parser.add_argument("claim")
+    parser.add_argument("-k", type=int, default=5)
+    args = parser.parse_args()
+    result = run_verification(args.claim, args.k)
+    for stage, seconds in result["timings"].items():
+        print(f"{stage:>12}: {seconds:6.2f}s")
+    if result["ok"]:
+        print(json.dumps(build_log_entry(result, "cli", "cli"), indent=2))
+    else:
+        print(result["hint"] or "No summary could be generated for this claim.")
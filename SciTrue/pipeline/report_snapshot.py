@@ -0,0 +1,36 @@
+#%%
+# Rendered report HTML (summary block plus evidence tree) kept with each
+# activity entry. It is rendered once when the entry is logged and served
+# as is on cache hits and history views. Snapshots from an older
+# RENDERER_VERSION, or entries logged before snapshots existed, are rendered
+# again the first time they are viewed and stored back.
+import os
+import sys
+
+SCITRUE_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(SCITRUE_ROOT)
+sys.path.append(os.path.join(SCITRUE_ROOT, "demo"))
+
+from html_functions import render_report_snapshot, RENDERER_VERSION
+from storage.activity_store import ACTIVITY_DB_PATH, log_activity, get_entry, get_snapshot, put_snapshot
+
+
+def log_with_snapshot(entry, tree_html: str = None, db_path: str = ACTIVITY_DB_PATH) -> int:
+    # log_activity plus the rendered report; tree_html is result["html_code"]
+    # of the run that produced the entry, so the tree is not rendered twice.
+    snapshot = render_report_snapshot(entry, tree_html)
+    return log_activity(entry, db_path, snapshot=snapshot, snapshot_version=RENDERER_VERSION)
+
+
+def load_snapshot(entry_id, entry=None, db_path: str = ACTIVITY_DB_PATH):
+    # {"summary_html", "tree_html"} for a logged entry; None if there is no such entry.
+    snapshot = get_snapshot(entry_id, RENDERER_VERSION, db_path)
+    if snapshot is not None:
+        return snapshot
+    if entry is None:
+        entry = get_entry(entry_id, db_path)
+        if entry is None:
+            return None
+    snapshot = render_report_snapshot(entry)
+    put_snapshot(entry_id, snapshot, RENDERER_VERSION, db_path)
+    return snapshot
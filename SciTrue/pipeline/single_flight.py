@@ -0,0 +1,103 @@
+#%%
+# Single-flight for verifications of the same claim. Within a process,
+# concurrent requests for one normalized (claim, k) await the same task.
+# Across processes, a lease in the job database lets one process run the
+# pipeline while the others wait. The lease holder stores its result in the
+# job database before releasing the lease, and a process that waited takes
+# that result instead of running the pipeline again.
+import os
+import time
+import socket
+import asyncio
+
+from pipeline.tracing import metrics
+from storage.activity_store import normalize_claim
+from storage.job_queue import try_acquire_lease, release_lease, put_flight_result, get_flight_result
+
+LEASE_SECONDS = float(os.getenv("SCITRUE_LEASE_SECONDS", "120"))
+LEASE_POLL_SECONDS = 1.0
+OWNER = f"{socket.gethostname()}:{os.getpid()}"
+
+
+def flight_key(claim: str, k: int) -> str:
+    return f"verify:{int(k)}:{normalize_claim(claim)}"
+
+
+class SingleFlight:
+    # Must be used from a single event loop. Callers that give up do not
+    # cancel the run while others still wait on it; the last one to give up
+    # does, so an abandoned run stops and frees its worker and lease.
+    def __init__(self):
+        self.flights = {}       # key -> task
+        self.waiters = {}       # task -> callers awaiting it
+
+    def in_flight(self) -> int:
+        return len(self.flights)
+
+    def _forget(self, key, task):
+        self.waiters.pop(task, None)
+        if self.flights.get(key) is task:
+            del self.flights[key]
+
+    async def do(self, key, coro_fn):
+        task = self.flights.get(key)
+        if task is None:
+            task = asyncio.ensure_future(coro_fn())
+            self.flights[key] = task
+            self.waiters[task] = 0
+            task.add_done_callback(lambda done: self._forget(key, done))
+        else:
+            metrics.increment("singleflight_coalesced")
+        self.waiters[task] += 1
+        try:
+            return await asyncio.shield(task)
+        finally:
+            if not task.done():
+                self.waiters[task] -= 1
+                if not self.waiters[task]:
+                    # A later request for key starts a new run rather than
+                    # joining this one while it unwinds.
+                    task.cancel()
+                    self._forget(key, task)
+
+
+async def with_lease(key, coro_fn, owner: str = OWNER, max_seconds: float = None, on_shared=None):
+    # Runs coro_fn() while holding the cross-process lease on key, unless the
+    # process that held it meanwhile left a result; on_shared(result) is then
+    # called with that result. The lease is renewed for at most max_seconds,
+    # so a run that hangs lets it expire and another process take over.
+    waiting_since = time.time()
+    waited = False
+    while not await asyncio.to_thread(try_acquire_lease, key, owner, LEASE_SECONDS):
+        waited = True
+        await asyncio.sleep(LEASE_POLL_SECONDS)
+    if waited:
+        metrics.increment("singleflight_waited")
+
+    async def renew():
+        renew_until = None if max_seconds is None else time.monotonic() + max_seconds
+        while True:
+            await asyncio.sleep(LEASE_SECONDS / 3)
+            if renew_until is not None and time.monotonic() >= renew_until:
+                print(f"[WARN] Run for {key[:60]!r} passed {max_seconds:.0f}s; no longer renewing its lease.")
+                return
+            await asyncio.to_thread(try_acquire_lease, key, owner, LEASE_SECONDS)
+
+    renewal = asyncio.create_task(renew())
+    try:
+        if waited:
+            result = await asyncio.to_thread(get_flight_result, key, waiting_since)
+            if result is not None:
+                metrics.increment("singleflight_shared")
+                if on_shared is not None:
+                    on_shared(result)
+                return result
+        result = await coro_fn()
+        try:
+            await asyncio.to_thread(put_flight_result, key, result, LEASE_SECONDS)
+        except Exception as e:
+            print(f"[WARN] Could not share the result for {key[:60]!r}: {e}")
+        return result
+    finally:
+        renewal.cancel()
+        await asyncio.to_thread(release_lease, key, owner)
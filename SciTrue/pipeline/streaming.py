@@ -0,0 +1,57 @@
+#%%
+# Streaming chat completions. Works with both the legacy openai module API
+# (used by the eval scripts) and the openai>=1.0 client. The model is the one
+# get_one_completion uses (storage.stage_cache.completion_model), so turning
+# streaming on never changes which model writes the summary.
+import os
+import openai
+
+from storage.stage_cache import completion_model
+
+STREAM_SUMMARY = os.getenv("SCITRUE_STREAM_SUMMARY", "1") == "1"
+
+_client = None
+_warned = False
+
+
+def _api_key():
+    return os.getenv("OPEN_API_KEY")
+
+
+def _async_client():
+    global _client
+    if _client is None:
+        _client = openai.AsyncOpenAI(api_key=_api_key())
+    return _client
+
+
+def stream_model():
+    # Model to stream with, or None when the one-shot model is not known; the
+    # caller then uses get_one_completion instead of guessing.
+    global _warned
+    model = completion_model()
+    if model == "unknown":
+        if not _warned:
+            print("[WARN] Model of calls.one_generation is unknown (set SCITRUE_MODEL); summaries are not streamed.")
+            _warned = True
+        return None
+    return model
+
+
+async def stream_completion(prompt: str, model: str = None):
+    # Async generator of completion text deltas.
+    model = model or stream_model()
+    messages = [{"role": "user", "content": prompt}]
+    if hasattr(openai, "AsyncOpenAI"):
+        response = await _async_client().chat.completions.create(model=model, messages=messages, stream=True)
+        async for chunk in response:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+    else:
+        response = await openai.ChatCompletion.acreate(
+            model=model, messages=messages, stream=True, api_key=_api_key(),
+        )
+        async for chunk in response:
+            delta = chunk["choices"][0].get("delta", {}).get("content")
+            if delta:
+                yield delta
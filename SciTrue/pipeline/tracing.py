@@ -0,0 +1,272 @@
+#%%
+# Per-request tracing for the verification pipeline. Every stage runs inside
+# a span that records its duration, estimated token counts, stage cache
+# hit/miss and any error. Finished traces are appended to a daily JSONL file
+# and folded into in-process metrics, which are served in OpenMetrics text
+# format (see the /metrics route of the Flask app).
+#
+#   python -m pipeline.tracing          # p50/p95 per stage from the JSONL sink
+import os
+import json
+import time
+import functools
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+
+base_dir = os.path.dirname(os.path.abspath(__file__))
+TRACING_ENABLED = os.getenv("SCITRUE_TRACING", "1") == "1"
+TRACE_DIR = os.getenv("SCITRUE_TRACE_DIR", os.path.join(base_dir, '..', 'outputs', 'traces'))
+
+# Upper bounds of the stage duration histogram, in seconds.
+DURATION_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2, 4, 8, 15, 30, 60, 120)
+
+
+@functools.lru_cache(maxsize=None)
+def token_encoding():
+    # Loaded on the first estimate rather than at import: the first
+    # get_encoding call may download the BPE file.
+    try:
+        import tiktoken
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception:
+        return None
+
+
+def estimate_tokens(text) -> int:
+    # Exact with tiktoken installed, otherwise the usual ~4 characters per token.
+    if not text:
+        return 0
+    text = text if isinstance(text, str) else json.dumps(text, default=str)
+    encoding = token_encoding()
+    if encoding is not None:
+        return len(encoding.encode(text))
+    return (len(text) + 3) // 4
+
+
+class Trace:
+    # Spans of one verify_claim call. timings mirrors the span durations so
+    # callers can keep reading result["timings"].
+    def __init__(self, request_id: str, claim: str, k: int):
+        self.request_id = request_id
+        self.claim = claim
+        self.k = k
+        self.started = time.time()
+        self.start = time.perf_counter()
+        self.timings = {}
+        self.spans = []
+
+    def add_span(self, name: str, start: float, duration: float, tags: dict = None):
+        # For stages that do not fit a with block, e.g. ones running as tasks.
+        self.timings[name] = duration
+        self.spans.append({
+            "name": name,
+            "offset": round(start - self.start, 4),
+            "duration": round(duration, 4),
+            "tags": tags or {},
+        })
+
+    @contextmanager
+    def span(self, name: str, **tags):
+        # Yields the tag dict; the stage fills in tokens, cache result, counts.
+        start = time.perf_counter()
+        try:
+            yield tags
+        except BaseException as e:
+            tags["error"] = type(e).__name__
+            raise
+        finally:
+            self.add_span(name, start, time.perf_counter() - start, tags)
+
+    def finish(self, ok: bool, **tags):
+        self.timings.setdefault("total", time.perf_counter() - self.start)
+        record = {
+            "request_id": self.request_id,
+            "timestamp": datetime.fromtimestamp(self.started).isoformat(),
+            "claim": self.claim,
+            "articles": self.k,
+            "ok": ok,
+            "total": round(self.timings["total"], 4),
+            "tags": tags,
+            "spans": self.spans,
+        }
+        if TRACING_ENABLED:
+            metrics.observe(record)
+            try:
+                write_trace(record)
+            except OSError as e:
+                print(f"[WARN] Could not write trace {self.request_id}: {e}")
+        return record
+
+# ----------------- JSONL SINK -----------------
+
+_sink_lock = threading.Lock()
+
+
+def trace_path(day: str = None, trace_dir: str = TRACE_DIR) -> str:
+    return os.path.join(trace_dir, f"traces-{day or datetime.now().strftime('%Y%m%d')}.jsonl")
+
+
+def write_trace(record, trace_dir: str = TRACE_DIR):
+    line = json.dumps(record, ensure_ascii=False, default=str) + "\n"
+    with _sink_lock:
+        os.makedirs(trace_dir, exist_ok=True)
+        with open(trace_path(trace_dir=trace_dir), "a", encoding="utf-8") as f:
+            f.write(line)
+
+
+def read_traces(trace_dir: str = TRACE_DIR):
+    if not os.path.isdir(trace_dir):
+        return
+    for name in sorted(os.listdir(trace_dir)):
+        if not (name.startswith("traces-") and name.endswith(".jsonl")):
+            continue
+        with open(os.path.join(trace_dir, name), "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+
+# ----------------- METRICS -----------------
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(**labels) -> str:
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + "}"
+
+
+class Metrics:
+    # Process-wide aggregates of finished traces.
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.requests = {}        # outcome -> count
+        self.durations = {}       # stage -> [bucket counts..., sum, count]
+        self.cache = {}           # (stage, result) -> count
+        self.errors = {}          # (stage, error) -> count
+        self.tokens = {}          # (stage, direction) -> count
+        self.counters = {}        # name -> count, for events outside traces
+        self.gauge_sources = {}   # name -> fn() returning {metric: value}
+
+    def observe(self, record):
+        outcome = "ok" if record["ok"] else ("error" if "error" in record["tags"] else "no_result")
+        with self.lock:
+            self.requests[outcome] = self.requests.get(outcome, 0) + 1
+            stages = [(span["name"], span["duration"], span["tags"]) for span in record["spans"]]
+            stages.append(("total", record["total"], {}))
+            for name, duration, tags in stages:
+                histogram = self.durations.setdefault(name, [0] * len(DURATION_BUCKETS) + [0.0, 0])
+                for i, bound in enumerate(DURATION_BUCKETS):
+                    if duration <= bound:
+                        histogram[i] += 1
+                histogram[-2] += duration
+                histogram[-1] += 1
+                if "cache" in tags:
+                    key = (name, tags["cache"])
+                    self.cache[key] = self.cache.get(key, 0) + 1
+                if "error" in tags:
+                    key = (name, tags["error"])
+                    self.errors[key] = self.errors.get(key, 0) + 1
+                if tags.get("cache") == "hit":
+                    continue  # served from the stage cache, no tokens spent
+                for direction in ("in", "out"):
+                    if tags.get(f"tokens_{direction}"):
+                        key = (name, direction)
+                        self.tokens[key] = self.tokens.get(key, 0) + tags[f"tokens_{direction}"]
+
+    def increment(self, name: str, amount: int = 1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def register_gauges(self, name: str, fn):
+        self.gauge_sources[name] = fn
+
+    def render(self) -> str:
+        lines = []
+        with self.lock:
+            lines.append("# TYPE scitrue_requests counter")
+            lines.append("# HELP scitrue_requests Finished verification requests by outcome.")
+            for outcome, count in sorted(self.requests.items()):
+                lines.append(f"scitrue_requests_total{_labels(outcome=outcome)} {count}")
+
+            lines.append("# TYPE scitrue_stage_duration_seconds histogram")
+            lines.append("# UNIT scitrue_stage_duration_seconds seconds")
+            lines.append("# HELP scitrue_stage_duration_seconds Wall time per pipeline stage.")
+            for stage, histogram in sorted(self.durations.items()):
+                for bound, count in zip(DURATION_BUCKETS, histogram):
+                    lines.append(f"scitrue_stage_duration_seconds_bucket{_labels(stage=stage, le=bound)} {count}")
+                lines.append(f"scitrue_stage_duration_seconds_bucket{_labels(stage=stage, le='+Inf')} {histogram[-1]}")
+                lines.append(f"scitrue_stage_duration_seconds_sum{_labels(stage=stage)} {histogram[-2]:.6f}")
+                lines.append(f"scitrue_stage_duration_seconds_count{_labels(stage=stage)} {histogram[-1]}")
+
+            lines.append("# TYPE scitrue_stage_cache counter")
+            lines.append("# HELP scitrue_stage_cache Stage cache lookups by result.")
+            for (stage, result), count in sorted(self.cache.items()):
+                lines.append(f"scitrue_stage_cache_total{_labels(stage=stage, result=result)} {count}")
+
+            lines.append("# TYPE scitrue_stage_errors counter")
+            lines.append("# HELP scitrue_stage_errors Exceptions raised inside a stage.")
+            for (stage, error), count in sorted(self.errors.items()):
+                lines.append(f"scitrue_stage_errors_total{_labels(stage=stage, error=error)} {count}")
+
+            lines.append("# TYPE scitrue_stage_tokens counter")
+            lines.append("# HELP scitrue_stage_tokens Estimated LLM tokens per stage.")
+            for (stage, direction), count in sorted(self.tokens.items()):
+                lines.append(f"scitrue_stage_tokens_total{_labels(stage=stage, direction=direction)} {count}")
+
+            for name, count in sorted(self.counters.items()):
+                lines.append(f"# TYPE scitrue_{name} counter")
+                lines.append(f"scitrue_{name}_total {count}")
+            sources = list(self.gauge_sources.values())
+
+        for fn in sources:
+            for name, value in fn().items():
+                lines.append(f"# TYPE scitrue_{name} gauge")
+                lines.append(f"scitrue_{name} {value}")
+        lines.append("# EOF")
+        return "\n".join(lines) + "\n"
+
+
+metrics = Metrics()
+OPENMETRICS_CONTENT_TYPE = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+
+
+def render_openmetrics() -> str:
+    return metrics.render()
+
+# ----------------- REPORT -----------------
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(q * (len(values) - 1))))]
+
+
+def summarize(trace_dir: str = TRACE_DIR):
+    # Where the time goes: p50/p95 per stage over every stored trace.
+    durations = {}
+    cache = {}
+    count = 0
+    for record in read_traces(trace_dir):
+        count += 1
+        durations.setdefault("total", []).append(record["total"])
+        for span in record["spans"]:
+            durations.setdefault(span["name"], []).append(span["duration"])
+            if "cache" in span["tags"]:
+                hits, total = cache.get(span["name"], (0, 0))
+                cache[span["name"]] = (hits + (span["tags"]["cache"] == "hit"), total + 1)
+    print(f"{count} traces in {trace_dir}")
+    print(f"{'stage':>12} {'n':>6} {'p50':>8} {'p95':>8} {'cache hit':>10}")
+    for name, values in sorted(durations.items(), key=lambda item: -percentile(item[1], 0.5)):
+        hits, total = cache.get(name, (0, 0))
+        hit_rate = f"{hits / total:.0%}" if total else "-"
+        print(f"{name:>12} {len(values):>6} {percentile(values, 0.5):>8.2f} {percentile(values, 0.95):>8.2f} {hit_rate:>10}")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Summarize stored pipeline traces.")
+    parser.add_argument("--dir", default=TRACE_DIR)
+    summarize(parser.parse_args().dir)
@@ -0,0 +1,148 @@
+#%%
+# Bounded pool for running verify_claim from synchronous callers (Flask
+# handlers, background workers). All verifications share one event loop on a
+# daemon thread; a semaphore caps how many run at once and submissions beyond
+# the waiting room are refused instead of queueing without limit.
+# Submissions for a claim that is already being verified share that run
+# (pipeline/single_flight.py) and do not take a worker of their own; every
+# submission's on_stage receives the run's stages, late ones after a replay
+# of the latest payload of each stage so far. A run no submission waits on
+# any more (all timed out or were cancelled) is cancelled. When another
+# process ran the claim, its stages are replayed from the shared result.
+import os
+import asyncio
+import threading
+
+from pipeline.orchestrator import verify_claim
+from pipeline.tracing import metrics
+from pipeline.single_flight import SingleFlight, flight_key, with_lease
+
+VERIFY_WORKERS = int(os.getenv("SCITRUE_VERIFY_WORKERS", "8"))
+VERIFY_MAX_PENDING = int(os.getenv("SCITRUE_VERIFY_MAX_PENDING", "32"))
+VERIFY_TIMEOUT = float(os.getenv("SCITRUE_VERIFY_TIMEOUT", "300"))
+# Stages verify_claim reports, and the result field each one carries.
+RESULT_STAGES = (
+    ("refinement", "revised_query"),
+    ("retrieval", "hint"),
+    ("summary", "summary"),
+    ("extraction", "subclaims"),
+)
+
+
+def replay_stages(result, on_stage):
+    # The on_stage calls a finished result would have made, for a result
+    # another process produced.
+    for stage, field in RESULT_STAGES:
+        if field in result:
+            on_stage(stage, result[field])
+    if result.get("ok"):
+        on_stage("done", result)
+
+
+class PoolFull(Exception):
+    pass
+
+
+class VerificationPool:
+    def __init__(self, workers: int = VERIFY_WORKERS, max_pending: int = VERIFY_MAX_PENDING):
+        self.workers = workers
+        self.capacity = workers + max_pending
+        self.lock = threading.Lock()
+        self.submissions = {}   # flight key -> submissions waiting on that run
+        self.listeners = {}     # flight key -> on_stage callbacks of those submissions
+        self.stages = {}        # flight key -> {stage: latest payload}
+        self.loop = asyncio.new_event_loop()
+        self.semaphore = None
+        self.flights = SingleFlight()
+        self.ready = threading.Event()
+        self.thread = threading.Thread(target=self._run_loop, name="verification-pool", daemon=True)
+        self.thread.start()
+        self.ready.wait()
+
+    def _run_loop(self):
+        asyncio.set_event_loop(self.loop)
+        self.semaphore = asyncio.Semaphore(self.workers)
+        self.ready.set()
+        self.loop.run_forever()
+
+    async def _run(self, claim, k, kwargs):
+        async with self.semaphore:
+            return await verify_claim(claim, k, **kwargs)
+
+    async def _verify(self, claim, k, kwargs):
+        key = flight_key(claim, k)
+        on_stage = lambda stage, payload: self._broadcast(key, stage, payload)
+        kwargs = dict(kwargs, on_stage=on_stage)
+        return await self.flights.do(key, lambda: with_lease(
+            key, lambda: self._run(claim, k, kwargs), max_seconds=VERIFY_TIMEOUT,
+            on_shared=lambda result: replay_stages(result, on_stage),
+        ))
+
+    def _broadcast(self, key, stage, payload):
+        # Runs on the loop thread, as does _listen, so a late listener sees
+        # the replay before any newer stage.
+        with self.lock:
+            self.stages.setdefault(key, {})[stage] = payload
+            listeners = list(self.listeners.get(key, ()))
+        for on_stage in listeners:
+            try:
+                on_stage(stage, payload)
+            except Exception as e:
+                print(f"[ERROR] on_stage callback failed at {stage}: {e}")
+
+    def _listen(self, key, on_stage):
+        with self.lock:
+            self.listeners.setdefault(key, []).append(on_stage)
+            seen = list(self.stages.get(key, {}).items())
+        for stage, payload in seen:
+            try:
+                on_stage(stage, payload)
+            except Exception as e:
+                print(f"[ERROR] on_stage callback failed at {stage}: {e}")
+
+    def _release(self, key):
+        with self.lock:
+            self.submissions[key] -= 1
+            if not self.submissions[key]:
+                del self.submissions[key]
+                self.listeners.pop(key, None)
+                self.stages.pop(key, None)
+
+    def submit(self, claim: str, k: int, **kwargs):
+        # Returns a concurrent.futures.Future with the verify_claim result.
+        # Raises PoolFull when workers and the waiting room are all taken.
+        # The other keyword arguments (request_id, stream) are those of the
+        # submission that started the run.
+        # Capacity counts distinct claims, since joining a run costs nothing.
+        key = flight_key(claim, k)
+        on_stage = kwargs.pop("on_stage", None)
+        with self.lock:
+            if key not in self.submissions and len(self.submissions) >= self.capacity:
+                raise PoolFull(f"{len(self.submissions)} verifications in progress")
+            self.submissions[key] = self.submissions.get(key, 0) + 1
+        if on_stage is not None:
+            self.loop.call_soon_threadsafe(self._listen, key, on_stage)
+        future = asyncio.run_coroutine_threadsafe(self._verify(claim, k, kwargs), self.loop)
+        future.add_done_callback(lambda _future: self._release(key))
+        return future
+
+    def load(self):
+        with self.lock:
+            return {
+                "verification_pool_active": len(self.submissions),
+                "verification_pool_workers": self.workers,
+                "verification_pool_capacity": self.capacity,
+            }
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> VerificationPool:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = VerificationPool()
+            metrics.register_gauges("verification_pool", _pool.load)
+        return _pool
@@ -1,5 +1,8 @@
 
 #%%
+# Bump whenever the instruction text changes; it is part of the stage cache key.
+PROMPT_VERSION = "1"
+
 def make_claim_extraction_query(text: str, claim:str) -> str:
    
     instruction = """Can you extract claims made in the following text without making any reference in the claim and find the matching paper id that claims are made in? Please also assign an accuracy score out of 100, along with the reason for the assigned score, by considering sources outside of the given text.
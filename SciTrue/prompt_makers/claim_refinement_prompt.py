@@ -1,5 +1,8 @@
 
 #%%
+# Bump whenever the instruction text changes; it is part of the stage cache key.
+PROMPT_VERSION = "1"
+
 def make_claim_refinement_query(claim: str) -> str:
    
     instruction = """You are part of a scientific retrieval system. Given an input, do the following:
@@ -1,11 +1,9 @@
 #%%
 import asyncio
 from typing import List
-import nest_asyncio
-
-# Apply the nest_asyncio patch to allow nested event loops
-nest_asyncio.apply()
 
+# Bump whenever the instruction text changes; it is part of the stage cache key.
+PROMPT_VERSION = "1"
 
 async def make_evidence_list_query(claim: str, title: str, paragraph: str, abstract: str) -> str:
     q1 = f'Consider the claim: {claim}.'
@@ -1,23 +1,34 @@
 #%%
-import sys
 import os
-# Importing custom modules
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from generations.evidence_synthesis import main_evidence_list
-from generations.claim_refinement import get_revised_query
-import asyncio
 #%%
-import asyncio
+# Prompt construction for the summary stage. Refinement and retrieval run in
+# pipeline/orchestrator.py, which passes the evidence frame to build_report_prompt.
 
-def make_report_query(claim: str, k: int) -> str:
+# Bump whenever the instruction text changes; it is part of the stage cache key.
+PROMPT_VERSION = "1"
+
+# Optional debug sink: when set, each request's evidence frame is also written
+# to <dir>/<request_id>.parquet. The pipeline itself never reads it back.
+EVIDENCE_DEBUG_DIR = os.getenv("SCITRUE_EVIDENCE_DEBUG_DIR")
+
+def has_rows(df):
+    return df is not None and len(df) > 0
+
+def save_evidence_debug(raw_data, request_id):
+    if not EVIDENCE_DEBUG_DIR or raw_data is None or not request_id:
+        return
+    os.makedirs(EVIDENCE_DEBUG_DIR, exist_ok=True)
+    raw_data.to_parquet(os.path.join(EVIDENCE_DEBUG_DIR, f"{request_id}.parquet"))
+
+NOT_SCIENTIFIC_HINT = "The claim is not a scientific claim or does not make any sense, please try again with a different claim."
+
+def is_usable_revision(revised_query) -> bool:
+    return revised_query is not None and len(revised_query) > 6
+
+def build_report_prompt(claim: str, k: int, raw_data):
+    # Summary prompt from the stage-1 evidence frame: (prompt, ok, hint).
     hint = None
     prompt_grounding = f'Claim: "{claim}"'
-    revised_query = asyncio.run(get_revised_query(claim))
-    if len(revised_query) > 6:
-        raw_data = main_evidence_list(claim=revised_query, k=k)
-    else:
-        return None, False, "The claim is not a scientific claim or does not make any sense, please try again with a different claim."
-    # raw_data = main_evidence_list(claim=revised_query, k=k)
     data = raw_data[raw_data['relevance'] == "yes"]
 
     # Extract necessary fields
@@ -0,0 +1,312 @@
+#%%
+# Columnar export of the activity history for analytics. Entries logged
+# since the last export are flattened into four Parquet tables under
+# EXPORT_DIR, partitioned by day:
+#
+#   claims/date=YYYY-MM-DD/part-<first id>-<last id>.parquet
+#   subclaims/...   one row per sub-claim
+#   sources/...     one row per distinct source cited by an entry
+#   sjr/...         one row per SJR field of a source
+#
+# Entries whose timestamp has no date go to date=unknown. A date filter
+# (since/until) leaves that partition out; without one it is included.
+#
+# The last exported activity id is kept in EXPORT_DIR/_watermark.json, so
+# each run only reads the new rows, from a read-only connection to the
+# store. The query functions below read the export, never the live store.
+#
+#   python -m storage.activity_export export
+#   python -m storage.activity_export top-claims --since 2025-07-01
+import os
+import re
+import glob
+import json
+import sqlite3
+import argparse
+
+from storage.activity_store import ACTIVITY_DB_PATH, DATA_ROOT, normalize_claim
+
+EXPORT_DIR = os.getenv("SCITRUE_EXPORT_DIR", os.path.join(DATA_ROOT, "exports"))
+EXPORT_BATCH = 10_000
+WATERMARK_FILE = "_watermark.json"
+TABLES = ("claims", "subclaims", "sources", "sjr")
+PART_NAME = re.compile(r"part-(\d+)-(\d+)\.parquet$")
+NUMBER = re.compile(r"\d+(?:\.\d+)?")
+UNKNOWN_DATE = "unknown"
+
+
+def _schemas():
+    import pyarrow as pa
+
+    return {
+        "claims": pa.schema([
+            ("id", pa.int64()), ("user", pa.string()), ("email", pa.string()), ("claim", pa.string()),
+            ("claim_key", pa.string()), ("articles", pa.int32()), ("timestamp", pa.string()),
+            ("overall_accuracy", pa.float64()), ("elapsed_seconds", pa.float64()), ("subclaims", pa.int32()),
+        ]),
+        "subclaims": pa.schema([
+            ("entry_id", pa.int64()), ("position", pa.int32()), ("claim", pa.string()),
+            ("accuracy", pa.float64()), ("contribution", pa.string()), ("relevance", pa.string()),
+            ("label", pa.string()), ("type", pa.string()), ("corpus_id", pa.string()),
+        ]),
+        "sources": pa.schema([
+            ("entry_id", pa.int64()), ("corpus_id", pa.string()), ("title", pa.string()),
+            ("authors", pa.string()), ("venue", pa.string()), ("journal_title", pa.string()),
+            ("year", pa.int32()), ("citation_count", pa.int64()), ("url", pa.string()),
+        ]),
+        "sjr": pa.schema([
+            ("entry_id", pa.int64()), ("corpus_id", pa.string()), ("field", pa.string()), ("value", pa.string()),
+        ]),
+    }
+
+
+def parse_number(value):
+    # "85", "70/100", "85%" -> 85.0; None if there is no number.
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return float(value)
+    match = NUMBER.search(str(value or ""))
+    return float(match.group()) if match else None
+
+
+def _int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _str(value):
+    return None if value is None else str(value)
+
+
+def entry_date(entry) -> str:
+    timestamp = str(entry.get("timestamp") or "")
+    return timestamp[:10] if re.match(r"\d{4}-\d{2}-\d{2}", timestamp) else UNKNOWN_DATE
+
+# ----------------- FLATTENING -----------------
+
+def flatten_entry(entry_id: int, entry: dict, rows: dict):
+    # Appends the rows of one activity entry to rows[table] (lists of dicts).
+    subclaims = [sub for sub in entry.get("subclaims") or [] if isinstance(sub, dict)]
+    rows["claims"].append({
+        "id": entry_id,
+        "user": _str(entry.get("user")),
+        "email": _str(entry.get("email")),
+        "claim": _str(entry.get("claim")),
+        "claim_key": normalize_claim(entry.get("claim", "")),
+        "articles": _int(entry.get("articles")),
+        "timestamp": _str(entry.get("timestamp")),
+        "overall_accuracy": parse_number(entry.get("overall accuracy")),
+        "elapsed_seconds": parse_number(entry.get("elapsed seconds")),
+        "subclaims": len(subclaims),
+    })
+    cited = set()
+    for position, sub in enumerate(subclaims):
+        corpus_id = _str(sub.get("corpus_id"))
+        rows["subclaims"].append({
+            "entry_id": entry_id,
+            "position": position,
+            "claim": _str(sub.get("claim")),
+            "accuracy": parse_number(sub.get("accuracy")),
+            "contribution": _str(sub.get("contribution")),
+            "relevance": _str(sub.get("relevance")),
+            "label": _str(sub.get("label")),
+            "type": _str(sub.get("type")),
+            "corpus_id": corpus_id,
+        })
+        if corpus_id is None or corpus_id in cited:
+            continue
+        cited.add(corpus_id)
+        rows["sources"].append({
+            "entry_id": entry_id,
+            "corpus_id": corpus_id,
+            "title": _str(sub.get("title")),
+            "authors": _str(sub.get("authors")),
+            "venue": _str(sub.get("venue")),
+            "journal_title": _str(sub.get("journal_title")),
+            "year": _int(sub.get("year")),
+            "citation_count": _int(sub.get("citationCount")),
+            "url": _str(sub.get("url")),
+        })
+        sjr = sub.get("sjr")
+        if isinstance(sjr, dict):
+            for field, value in sjr.items():
+                rows["sjr"].append({"entry_id": entry_id, "corpus_id": corpus_id,
+                                    "field": str(field), "value": _str(value)})
+
+# ----------------- EXPORT -----------------
+
+def read_watermark(export_dir: str = EXPORT_DIR) -> int:
+    try:
+        with open(os.path.join(export_dir, WATERMARK_FILE), "r") as f:
+            return int(json.load(f)["last_id"])
+    except (FileNotFoundError, ValueError, KeyError, TypeError):
+        return 0
+
+
+def write_watermark(last_id: int, export_dir: str = EXPORT_DIR):
+    path = os.path.join(export_dir, WATERMARK_FILE)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump({"last_id": last_id}, f)
+    os.replace(tmp_path, path)
+
+
+def _remove_unfinished_parts(watermark: int, export_dir: str):
+    # Parts past the watermark come from an export that stopped before
+    # advancing it; that batch is exported again.
+    for path in glob.glob(os.path.join(export_dir, "*", "date=*", "part-*.parquet")):
+        match = PART_NAME.search(path)
+        if match and int(match.group(1)) > watermark:
+            os.remove(path)
+
+
+def _write_batch(rows_by_date: dict, first_id: int, last_id: int, export_dir: str):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schemas = _schemas()
+    for date, rows in rows_by_date.items():
+        for table in TABLES:
+            if not rows[table]:
+                continue
+            directory = os.path.join(export_dir, table, f"date={date}")
+            os.makedirs(directory, exist_ok=True)
+            pq.write_table(
+                pa.Table.from_pylist(rows[table], schema=schemas[table]),
+                os.path.join(directory, f"part-{first_id}-{last_id}.parquet"),
+            )
+
+
+def export_activity(db_path: str = ACTIVITY_DB_PATH, export_dir: str = EXPORT_DIR,
+                    batch_size: int = EXPORT_BATCH) -> int:
+    # Exports the entries logged since the last run; returns how many.
+    os.makedirs(export_dir, exist_ok=True)
+    watermark = read_watermark(export_dir)
+    _remove_unfinished_parts(watermark, export_dir)
+    conn = sqlite3.connect(f"file:{os.path.abspath(db_path)}?mode=ro", uri=True, timeout=30)
+    exported = 0
+    try:
+        while True:
+            batch = conn.execute(
+                "SELECT id, entry FROM activity WHERE id > ? ORDER BY id LIMIT ?", (watermark, batch_size)
+            ).fetchall()
+            if not batch:
+                break
+            rows_by_date = {}
+            for entry_id, entry_json in batch:
+                try:
+                    entry = json.loads(entry_json)
+                except ValueError:
+                    print(f"[WARN] Skipping activity {entry_id}: entry is not valid JSON.")
+                    continue
+                date = entry_date(entry)
+                if date not in rows_by_date:
+                    rows_by_date[date] = {table: [] for table in TABLES}
+                flatten_entry(entry_id, entry, rows_by_date[date])
+            _write_batch(rows_by_date, batch[0][0], batch[-1][0], export_dir)
+            watermark = batch[-1][0]
+            write_watermark(watermark, export_dir)
+            exported += len(batch)
+    finally:
+        conn.close()
+    return exported
+
+# ----------------- QUERIES -----------------
+
+def load_table(table: str, columns=None, since: str = None, until: str = None, export_dir: str = EXPORT_DIR):
+    # One exported table as a DataFrame, reading only the given columns and
+    # the partitions between since and until (YYYY-MM-DD, inclusive). Entries
+    # without a date only match when neither is given.
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+
+    schema = _schemas()[table].append(pa.field("date", pa.string()))
+    directory = os.path.join(export_dir, table)
+    if not os.path.isdir(directory):
+        return schema.empty_table().to_pandas()[columns or schema.names]
+    dataset = ds.dataset(
+        directory, format="parquet", schema=schema,
+        partitioning=ds.partitioning(pa.schema([("date", pa.string())]), flavor="hive"),
+    )
+    condition = None
+    if since or until:
+        # "unknown" sorts after every ISO date, so it would pass any since.
+        condition = ds.field("date") != UNKNOWN_DATE
+    if since:
+        condition &= ds.field("date") >= since
+    if until:
+        condition &= ds.field("date") <= until
+    return dataset.to_table(columns=columns, filter=condition).to_pandas()
+
+
+def top_claims(n: int = 10, since: str = None, until: str = None, export_dir: str = EXPORT_DIR):
+    # Most verified claims: how often, by how many users, and how many of
+    # those runs could have been served from the cache instead.
+    claims = load_table("claims", ["claim_key", "claim", "articles", "email"], since, until, export_dir)
+    grouped = claims.groupby("claim_key").agg(
+        claim=("claim", "first"),
+        verifications=("claim", "size"),
+        users=("email", "nunique"),
+        settings=("articles", "nunique"),
+    )
+    grouped["repeat_runs"] = grouped["verifications"] - grouped["settings"]
+    return grouped.sort_values("verifications", ascending=False).head(n).reset_index()
+
+
+def source_reuse(n: int = 10, since: str = None, until: str = None, export_dir: str = EXPORT_DIR):
+    # Sources cited by the most entries.
+    sources = load_table("sources", ["corpus_id", "title", "entry_id"], since, until, export_dir)
+    grouped = sources.groupby("corpus_id").agg(title=("title", "first"), entries=("entry_id", "nunique"))
+    return grouped.sort_values("entries", ascending=False).head(n).reset_index()
+
+
+def accuracy_distribution(bins=(0, 20, 40, 60, 80, 101), table: str = "claims", since: str = None,
+                          until: str = None, export_dir: str = EXPORT_DIR):
+    # Entries (or sub-claims, table="subclaims") per accuracy range.
+    import pandas as pd
+
+    column = "overall_accuracy" if table == "claims" else "accuracy"
+    values = load_table(table, [column], since, until, export_dir)[column]
+    counts = pd.cut(values, bins=list(bins), right=False).value_counts(sort=False)
+    counts.index = counts.index.astype(str)
+    counts["missing"] = int(values.isna().sum())
+    counts.index.name = "accuracy"
+    return counts.rename("count").reset_index()
+
+
+def latency_by_k(since: str = None, until: str = None, export_dir: str = EXPORT_DIR):
+    # Verification time per number of articles; entries logged before the
+    # elapsed time was recorded are left out.
+    claims = load_table("claims", ["articles", "elapsed_seconds"], since, until, export_dir).dropna()
+    grouped = claims.groupby("articles")["elapsed_seconds"]
+    return grouped.agg(
+        runs="size",
+        mean="mean",
+        p50=lambda s: s.quantile(0.5),
+        p95=lambda s: s.quantile(0.95),
+    ).reset_index()
+
+
+QUERIES = {
+    "top-claims": lambda args: top_claims(args.n, args.since, args.until, args.export_dir),
+    "source-reuse": lambda args: source_reuse(args.n, args.since, args.until, args.export_dir),
+    "accuracy": lambda args: accuracy_distribution(since=args.since, until=args.until, export_dir=args.export_dir),
+    "latency": lambda args: latency_by_k(args.since, args.until, args.export_dir),
+}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export the activity history to Parquet and query the export.")
+    parser.add_argument("command", choices=["export", *QUERIES])
+    parser.add_argument("--db", default=ACTIVITY_DB_PATH)
+    parser.add_argument("--export-dir", default=EXPORT_DIR)
+    parser.add_argument("-n", type=int, default=10)
+    parser.add_argument("--since", help="first day, YYYY-MM-DD")
+    parser.add_argument("--until", help="last day, YYYY-MM-DD")
+    args = parser.parse_args()
+    if args.command == "export":
+        exported = export_activity(args.db, args.export_dir)
+        print(f"Exported {exported} entries to {args.export_dir} (up to id {read_watermark(args.export_dir)}).")
+    else:
+        print(QUERIES[args.command](args).to_string(index=False))
@@ -0,0 +1,240 @@
+#%%
+import os
+import json
+import zlib
+import sqlite3
+import threading
+
+# ====== FILE/DIR PATHS =====
+base_dir = os.path.dirname(os.path.abspath(__file__))
+DATA_ROOT = os.path.join(base_dir, '..', 'data')
+USER_ACTIVITY_PATH = os.path.join(DATA_ROOT, "user_activity.json")
+ACTIVITY_DB_PATH = os.path.join(DATA_ROOT, "user_activity.db")
+
+# One entry per row. The full entry is kept as JSON so the schema written by
+# log_activity stays untouched; the extra columns only exist for the indexes.
+# snapshot holds the rendered report HTML (zlib-compressed JSON) and the
+# version of the renderer that produced it.
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS activity (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    email TEXT,
+    claim TEXT,
+    claim_key TEXT,
+    articles INTEGER,
+    timestamp TEXT,
+    entry TEXT NOT NULL,
+    snapshot BLOB,
+    snapshot_version INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_activity_claim ON activity(claim_key, articles, id);
+CREATE INDEX IF NOT EXISTS idx_activity_email ON activity(email, id);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+# Columns added after the first release, for databases created before them.
+ADDED_COLUMNS = {"snapshot": "BLOB", "snapshot_version": "INTEGER"}
+
+_local = threading.local()
+
+
+def normalize_claim(claim: str) -> str:
+    return (claim or "").strip().lower()
+
+
+def _articles(value) -> int:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return 0
+
+
+def connect(db_path: str = ACTIVITY_DB_PATH) -> sqlite3.Connection:
+    # One connection per thread and database; Streamlit runs every session in
+    # its own thread and sqlite3 connections must not cross threads.
+    connections = getattr(_local, "connections", None)
+    if connections is None:
+        connections = _local.connections = {}
+    conn = connections.get(db_path)
+    if conn is None:
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        conn = sqlite3.connect(db_path, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA busy_timeout=30000")
+        conn.executescript(SCHEMA)
+        _add_columns(conn)
+        connections[db_path] = conn
+        if db_path == ACTIVITY_DB_PATH:
+            migrate_json_activity(USER_ACTIVITY_PATH, db_path)
+    return conn
+
+
+def _add_columns(conn):
+    existing = {row[1] for row in conn.execute("PRAGMA table_info(activity)")}
+    for column, kind in ADDED_COLUMNS.items():
+        if column not in existing:
+            try:
+                conn.execute(f"ALTER TABLE activity ADD COLUMN {column} {kind}")
+            except sqlite3.OperationalError:
+                pass    # added by another process in the meantime
+
+
+def _row_values(entry):
+    return (
+        entry.get("email"),
+        entry.get("claim", ""),
+        normalize_claim(entry.get("claim", "")),
+        _articles(entry.get("articles", 0)),
+        entry.get("timestamp", ""),
+        json.dumps(entry),
+    )
+
+
+def _insert_entries(conn, entries):
+    conn.executemany(
+        "INSERT INTO activity (email, claim, claim_key, articles, timestamp, entry) VALUES (?, ?, ?, ?, ?, ?)",
+        (_row_values(entry) for entry in entries),
+    )
+
+# ----------------- PUBLIC API -----------------
+
+def log_activity(entry, db_path: str = ACTIVITY_DB_PATH, snapshot: dict = None, snapshot_version: int = None) -> int:
+    conn = connect(db_path)
+    cur = conn.execute(
+        "INSERT INTO activity (email, claim, claim_key, articles, timestamp, entry, snapshot, snapshot_version) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+        (*_row_values(entry), _pack(snapshot), snapshot_version if snapshot is not None else None),
+    )
+    return cur.lastrowid
+
+
+def find_cached_entry(claim, articles, db_path: str = ACTIVITY_DB_PATH):
+    # (entry id, entry) of the oldest match, same as the linear scan over
+    # user_activity.json did; (None, None) if the claim was never verified.
+    row = connect(db_path).execute(
+        "SELECT id, entry FROM activity WHERE claim_key = ? AND articles = ? ORDER BY id LIMIT 1",
+        (normalize_claim(claim), _articles(articles)),
+    ).fetchone()
+    return (row[0], json.loads(row[1])) if row else (None, None)
+
+
+def find_cached_summary(claim, articles, db_path: str = ACTIVITY_DB_PATH):
+    return find_cached_entry(claim, articles, db_path)[1]
+
+
+def get_activity_history(email, db_path: str = ACTIVITY_DB_PATH, with_ids: bool = False):
+    # Oldest first; with_ids gives (entry id, entry) pairs.
+    rows = connect(db_path).execute(
+        "SELECT id, entry FROM activity WHERE email = ? ORDER BY id", (email,)
+    ).fetchall()
+    if with_ids:
+        return [(row[0], json.loads(row[1])) for row in rows]
+    return [json.loads(row[1]) for row in rows]
+
+
+def get_history_page(email, offset: int = 0, limit: int = 10, search: str = None,
+                     db_path: str = ACTIVITY_DB_PATH):
+    # (rows, total) for one page of a user's history, newest first. Rows hold
+    # id, claim, articles and timestamp only; load the entry itself with
+    # get_entry when it is opened. search matches a substring of the claim.
+    where = "email = ?"
+    params = [email]
+    if search and search.strip():
+        pattern = normalize_claim(search).replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        where += " AND claim_key LIKE ? ESCAPE '\\'"
+        params.append(f"%{pattern}%")
+    conn = connect(db_path)
+    total = conn.execute(f"SELECT COUNT(*) FROM activity WHERE {where}", params).fetchone()[0]
+    rows = conn.execute(
+        f"SELECT id, claim, articles, timestamp FROM activity WHERE {where} ORDER BY id DESC LIMIT ? OFFSET ?",
+        (*params, int(limit), max(0, int(offset))),
+    ).fetchall()
+    return [{"id": row[0], "claim": row[1], "articles": row[2], "timestamp": row[3]} for row in rows], total
+
+
+def get_entry(entry_id, db_path: str = ACTIVITY_DB_PATH):
+    row = connect(db_path).execute("SELECT entry FROM activity WHERE id = ?", (entry_id,)).fetchone()
+    return json.loads(row[0]) if row else None
+
+
+def iter_claims_since(last_id: int = 0, db_path: str = ACTIVITY_DB_PATH):
+    # (id, claim, articles) for every entry logged after last_id, oldest first.
+    return connect(db_path).execute(
+        "SELECT id, claim, articles FROM activity WHERE id > ? ORDER BY id", (last_id,)
+    ).fetchall()
+
+
+def count_activity(db_path: str = ACTIVITY_DB_PATH) -> int:
+    return connect(db_path).execute("SELECT COUNT(*) FROM activity").fetchone()[0]
+
+# ----------------- RENDERED SNAPSHOTS -----------------
+
+def _pack(snapshot):
+    if snapshot is None:
+        return None
+    return zlib.compress(json.dumps(snapshot).encode("utf-8"), 6)
+
+
+def get_snapshot(entry_id, version: int, db_path: str = ACTIVITY_DB_PATH):
+    # The stored snapshot if it was rendered by this renderer version, else None.
+    row = connect(db_path).execute(
+        "SELECT snapshot, snapshot_version FROM activity WHERE id = ?", (entry_id,)
+    ).fetchone()
+    if row is None or row[0] is None or row[1] != version:
+        return None
+    try:
+        return json.loads(zlib.decompress(row[0]))
+    except (zlib.error, ValueError):
+        return None
+
+
+def put_snapshot(entry_id, snapshot: dict, version: int, db_path: str = ACTIVITY_DB_PATH):
+    connect(db_path).execute(
+        "UPDATE activity SET snapshot = ?, snapshot_version = ? WHERE id = ?",
+        (_pack(snapshot), version, entry_id),
+    )
+
+# ----------------- MIGRATION -----------------
+
+def migrate_json_activity(json_path: str = USER_ACTIVITY_PATH, db_path: str = ACTIVITY_DB_PATH) -> int:
+    # One-shot import of the old whole-file log. The import and its marker are
+    # committed together, so an interrupted migration simply runs again.
+    conn = connect(db_path)
+    if conn.execute("SELECT 1 FROM meta WHERE key = 'migrated_json'").fetchone():
+        return 0
+    try:
+        with open(json_path, "r") as f:
+            logs = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        logs = []
+    if not isinstance(logs, list):
+        logs = []
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        if conn.execute("SELECT 1 FROM meta WHERE key = 'migrated_json'").fetchone():
+            conn.execute("ROLLBACK")
+            return 0
+        _insert_entries(conn, (entry for entry in logs if isinstance(entry, dict)))
+        conn.execute(
+            "INSERT INTO meta (key, value) VALUES ('migrated_json', ?)",
+            (os.path.abspath(json_path),),
+        )
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    return len(logs)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Import user_activity.json into the SQLite activity store.")
+    parser.add_argument("--json", default=USER_ACTIVITY_PATH)
+    parser.add_argument("--db", default=ACTIVITY_DB_PATH)
+    args = parser.parse_args()
+    migrated = migrate_json_activity(args.json, args.db)
+    print(f"Migrated {migrated} entries into {args.db} ({count_activity(args.db)} total).")
@@ -0,0 +1,163 @@
+#%%
+# Near-duplicate claim lookup over the activity store.
+# Claims are turned into hashed word-stem + character-trigram vectors; an
+# inverted index on word stems narrows the candidates before the cosine check,
+# so a query only touches claims that share at least one content word.
+# Cosine alone scores "X causes Y" and "X does not cause Y" as near
+# duplicates, so a candidate is only reused when claim_guard() agrees too:
+# same negation, same direction words (increase/decrease, ...), same
+# population words (men/women, ...) and same short identifiers and numbers
+# ("vitamin D", "type 2"). The cache stays off unless SCITRUE_SIMILARITY_CACHE=1.
+import os
+import re
+import math
+import zlib
+import threading
+from collections import defaultdict
+
+from storage.activity_store import ACTIVITY_DB_PATH, get_entry, iter_claims_since
+
+SIMILARITY_CACHE_ENABLED = os.getenv("SCITRUE_SIMILARITY_CACHE", "0") == "1"
+SIMILARITY_THRESHOLD = float(os.getenv("SCITRUE_SIMILARITY_THRESHOLD", "0.9"))
+
+N_BUCKETS = 1 << 20
+STEM_LENGTH = 6
+TRIGRAM_WEIGHT = 0.5
+
+STOPWORDS = {
+    "a", "an", "the", "is", "are", "was", "were", "be", "been", "being", "do", "does", "did",
+    "of", "to", "for", "in", "on", "at", "by", "with", "from", "and", "or", "that", "this",
+    "it", "its", "as", "can", "could", "may", "might", "will", "would", "should", "has",
+    "have", "had", "than", "then", "there", "their", "what", "which", "who", "whether", "if",
+}
+
+NEGATIONS = {"not", "no", "never", "none", "nor", "neither", "nothing", "without", "cannot", "t"}   # "t" from "doesn't"
+# Stem (first STEM_LENGTH letters) -> direction.
+DIRECTIONS = {
+    "increa": 1, "raise": 1, "raises": 1, "raised": 1, "raisin": 1, "rise": 1, "rises": 1, "boost": 1,
+    "improv": 1, "enhanc": 1, "promot": 1, "higher": 1, "more": 1, "greate": 1, "gain": 1, "gains": 1,
+    "benefi": 1, "helps": 1, "help": 1, "strong": 1, "elevat": 1, "accele": 1, "up": 1,
+    "decrea": -1, "reduce": -1, "reduci": -1, "reduct": -1, "lower": -1, "lowers": -1, "less": -1,
+    "fewer": -1, "declin": -1, "drop": -1, "drops": -1, "worsen": -1, "impair": -1, "inhibi": -1,
+    "suppre": -1, "weaken": -1, "harm": -1, "harms": -1, "harmfu": -1, "slow": -1, "slows": -1,
+    "down": -1, "loss": -1, "lose": -1, "loses": -1, "hurt": -1, "hurts": -1,
+}
+POPULATIONS = {
+    "men", "man", "male", "males", "women", "woman", "female", "females", "boys", "girls",
+    "children", "child", "kids", "infants", "infant", "babies", "adolescents", "teens", "teenagers",
+    "adults", "adult", "elderly", "older", "younger", "young", "seniors", "pregnant", "mothers",
+    "fathers", "patients", "smokers", "nonsmokers", "athletes", "students", "workers", "veterans",
+    "animals", "mice", "rats", "humans", "dogs", "cats",
+}
+
+_word_re = re.compile(r"[a-z0-9]+")
+
+
+def _bucket(feature: str) -> int:
+    return zlib.crc32(feature.encode("utf-8")) % N_BUCKETS
+
+
+def claim_stems(claim: str):
+    words = _word_re.findall((claim or "").lower())
+    return [w[:STEM_LENGTH] for w in words if w not in STOPWORDS]
+
+
+def claim_guard(claim: str) -> tuple:
+    # Features two claims must share before their cosine counts: negation,
+    # direction words, population words, and identifiers (tokens of at most
+    # two characters or containing a digit, e.g. "d" in "vitamin D", "b12").
+    words = _word_re.findall((claim or "").lower())
+    negated = sum(w in NEGATIONS for w in words) % 2 == 1
+    directions = frozenset(DIRECTIONS[w[:STEM_LENGTH]] for w in words if w[:STEM_LENGTH] in DIRECTIONS)
+    populations = frozenset(w for w in words if w in POPULATIONS)
+    identifiers = frozenset(
+        w for w in words
+        if w not in STOPWORDS and w not in NEGATIONS and w not in DIRECTIONS and (len(w) <= 2 or any(c.isdigit() for c in w))
+    )
+    return negated, directions, populations, identifiers
+
+
+def same_meaning(a: str, b: str) -> bool:
+    # False when the claims differ in polarity, population or identifiers.
+    return claim_guard(a) == claim_guard(b)
+
+
+def claim_vector(claim: str):
+    vector = defaultdict(float)
+    for word in _word_re.findall((claim or "").lower()):
+        if word in STOPWORDS:
+            continue
+        vector[_bucket("w:" + word[:STEM_LENGTH])] += 1.0
+        padded = f" {word} "
+        for i in range(len(padded) - 2):
+            vector[_bucket("c:" + padded[i:i + 3])] += TRIGRAM_WEIGHT
+    norm = math.sqrt(sum(v * v for v in vector.values()))
+    if not norm:
+        return {}
+    return {b: v / norm for b, v in vector.items()}
+
+
+def cosine(a, b) -> float:
+    if len(a) > len(b):
+        a, b = b, a
+    return sum(v * b.get(k, 0.0) for k, v in a.items())
+
+
+class ClaimIndex:
+    def __init__(self, db_path: str = ACTIVITY_DB_PATH):
+        self.db_path = db_path
+        self.last_id = 0
+        self.vectors = {}                   # (claim_key, articles) -> (entry id, vector, guard)
+        self.postings = defaultdict(set)    # stem -> {(claim_key, articles)}
+        self.lock = threading.Lock()
+
+    def refresh(self):
+        # Pick up entries logged since the last query (by this or any other process).
+        for entry_id, claim, articles in iter_claims_since(self.last_id, self.db_path):
+            self.last_id = entry_id
+            key = ((claim or "").strip().lower(), articles)
+            if key in self.vectors:
+                continue
+            self.vectors[key] = (entry_id, claim_vector(claim), claim_guard(claim))
+            for stem in set(claim_stems(claim)):
+                self.postings[stem].add(key)
+
+    def query(self, claim: str, articles: int, threshold: float = SIMILARITY_THRESHOLD):
+        with self.lock:
+            self.refresh()
+            vector = claim_vector(claim)
+            guard = claim_guard(claim)
+            candidates = set()
+            for stem in set(claim_stems(claim)):
+                candidates.update(key for key in self.postings.get(stem, ()) if key[1] == articles)
+            best_id, best_score = None, 0.0
+            for key in candidates:
+                entry_id, other, other_guard = self.vectors[key]
+                if other_guard != guard:
+                    continue
+                score = cosine(vector, other)
+                if score > best_score:
+                    best_id, best_score = entry_id, score
+        if best_id is None or best_score < threshold:
+            return None, best_score
+        return best_id, best_score
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def get_claim_index(db_path: str = ACTIVITY_DB_PATH) -> ClaimIndex:
+    # Module-level, so every Streamlit session in the process shares one index.
+    with _indexes_lock:
+        if db_path not in _indexes:
+            _indexes[db_path] = ClaimIndex(db_path)
+        return _indexes[db_path]
+
+
+def find_similar_entry(claim, articles, threshold: float = SIMILARITY_THRESHOLD, db_path: str = ACTIVITY_DB_PATH):
+    # Returns (entry id, entry, score); id and entry are None when nothing clears the threshold.
+    entry_id, score = get_claim_index(db_path).query(claim, int(articles), threshold)
+    if entry_id is None:
+        return None, None, score
+    return entry_id, get_entry(entry_id, db_path), score
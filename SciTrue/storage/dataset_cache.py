@@ -0,0 +1,209 @@
+#%%
+# Parquet copies of the sheets of data/Datasets.xlsx. The workbook is parsed
+# once per content hash: every sheet is written, cells as text and without
+# treating any row as a header, to
+#
+#   DATASET_CACHE_DIR/<sha256 prefix>/<sheet>.parquet
+#
+# with a manifest.json listing the sheets and their header rows. Later loads
+# hash the workbook, find that directory and read the Parquet files through a
+# memory map, only the requested columns, with pyarrow alone (no pandas or
+# openpyxl import). Columns are named after the Excel letters (A, B, ...);
+# with header=True the first row gives the names, as pandas.read_excel does.
+#
+#   python -m storage.dataset_cache sheets
+#   python -m storage.dataset_cache sample --sheet Social_Science -n 20 > data/test3.txt
+import os
+import sys
+import json
+import random
+import hashlib
+import argparse
+import threading
+
+from storage.activity_store import DATA_ROOT
+
+DATASETS_PATH = os.getenv("SCITRUE_DATASETS_PATH", os.path.join(DATA_ROOT, "Datasets.xlsx"))
+DATASET_CACHE_DIR = os.getenv("SCITRUE_DATASET_CACHE_DIR", os.path.join(DATA_ROOT, "cache", "datasets"))
+MANIFEST_FILE = "manifest.json"
+HASH_PREFIX = 16
+
+
+def workbook_hash(path: str = DATASETS_PATH) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()[:HASH_PREFIX]
+
+
+def column_letter(i: int) -> str:
+    # 0 -> "A", 25 -> "Z", 26 -> "AA"
+    letters = ""
+    i += 1
+    while i:
+        i, rem = divmod(i - 1, 26)
+        letters = chr(ord("A") + rem) + letters
+    return letters
+
+
+def _header_names(cells) -> list:
+    # First-row cells as column names, the way pandas.read_excel names them.
+    names, seen = [], {}
+    for i, cell in enumerate(cells):
+        name = f"Unnamed: {i}" if cell is None else str(cell)
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}.{seen[name]}"
+        else:
+            seen[name] = 0
+        names.append(name)
+    return names
+
+
+def _sheet_file(sheet: str) -> str:
+    return "".join(c if c.isalnum() or c in "-_" else "_" for c in sheet) + ".parquet"
+
+# ----------------- CONVERSION -----------------
+
+def convert_workbook(path: str = DATASETS_PATH, cache_dir: str = DATASET_CACHE_DIR) -> str:
+    # Writes the Parquet copy of every sheet; returns its directory.
+    import pandas as pd
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    target = os.path.join(cache_dir, workbook_hash(path))
+    tmp_dir = f"{target}.tmp-{os.getpid()}"
+    os.makedirs(tmp_dir, exist_ok=True)
+    sheets = pd.read_excel(path, sheet_name=None, header=None, dtype=str)
+    manifest = {"workbook": os.path.basename(path), "sheets": {}}
+    for sheet, frame in sheets.items():
+        letters = [column_letter(i) for i in range(frame.shape[1])]
+        columns = {
+            letter: pa.array([None if pd.isna(v) else v for v in frame.iloc[:, i]], type=pa.string())
+            for i, letter in enumerate(letters)
+        }
+        file_name = _sheet_file(sheet)
+        pq.write_table(pa.table(columns, schema=pa.schema([(letter, pa.string()) for letter in letters])),
+                       os.path.join(tmp_dir, file_name))
+        first_row = [None if pd.isna(v) else v for v in frame.iloc[0]] if len(frame) else []
+        manifest["sheets"][sheet] = {
+            "file": file_name,
+            "rows": len(frame),
+            "header": dict(zip(_header_names(first_row), letters)),
+        }
+    with open(os.path.join(tmp_dir, MANIFEST_FILE), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    try:
+        os.replace(tmp_dir, target)     # another process may have finished the same conversion first
+    except OSError:
+        import shutil
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+    return target
+
+# ----------------- LOADING -----------------
+
+_manifests = {}     # (path, mtime_ns, size, cache_dir) -> (cache directory, manifest)
+_manifests_lock = threading.Lock()
+
+
+def dataset_manifest(path: str = DATASETS_PATH, cache_dir: str = DATASET_CACHE_DIR):
+    # (cache directory, manifest) for the workbook as it is now, converting it if needed.
+    st = os.stat(path)
+    key = (os.path.abspath(path), st.st_mtime_ns, st.st_size, cache_dir)
+    with _manifests_lock:
+        cached = _manifests.get(key)
+    if cached is not None:
+        return cached
+    target = os.path.join(cache_dir, workbook_hash(path))
+    manifest_path = os.path.join(target, MANIFEST_FILE)
+    if not os.path.exists(manifest_path):
+        # stderr, so `sample > claims.txt` on a cold cache writes only claims.
+        print(f"[INFO] converting {os.path.basename(path)} to Parquet under {target}", file=sys.stderr)
+        target = convert_workbook(path, cache_dir)
+    with open(manifest_path, "r", encoding="utf-8") as f:
+        cached = (target, json.load(f))
+    with _manifests_lock:
+        _manifests[key] = cached
+    return cached
+
+
+def sheet_names(path: str = DATASETS_PATH, cache_dir: str = DATASET_CACHE_DIR) -> list:
+    return list(dataset_manifest(path, cache_dir)[1]["sheets"])
+
+
+def load_sheet(sheet: str, columns=None, header: bool = True,
+               path: str = DATASETS_PATH, cache_dir: str = DATASET_CACHE_DIR):
+    # The sheet as a pyarrow Table of strings (None for empty cells).
+    # header=True: names from the first row, which is not returned as data;
+    # columns are then header names, otherwise Excel letters.
+    import pyarrow.parquet as pq
+
+    target, manifest = dataset_manifest(path, cache_dir)
+    info = manifest["sheets"].get(sheet)
+    if info is None:
+        raise KeyError(f"No sheet {sheet!r} in {os.path.basename(path)}; sheets: {', '.join(manifest['sheets'])}")
+    names = info["header"] if header else {}
+    letters = None
+    if columns is not None:
+        available = list(names) if header else list(info["header"].values())
+        missing = [c for c in columns if c not in available]
+        if missing:
+            raise KeyError(f"No column(s) {missing} in sheet {sheet!r}; columns: {', '.join(available)}")
+        letters = [names[c] for c in columns] if header else list(columns)
+    table = pq.ParquetFile(os.path.join(target, info["file"]), memory_map=True).read(columns=letters)
+    if header:
+        by_letter = {letter: name for name, letter in names.items()}
+        table = table.slice(1).rename_columns([by_letter[letter] for letter in table.column_names])
+    return table
+
+
+def load_sheet_frame(sheet: str, columns=None, header: bool = True,
+                     path: str = DATASETS_PATH, cache_dir: str = DATASET_CACHE_DIR):
+    # load_sheet as a pandas DataFrame.
+    return load_sheet(sheet, columns, header, path, cache_dir).to_pandas()
+
+
+def sheet_claims(sheet: str, column: str = None, path: str = DATASETS_PATH, cache_dir: str = DATASET_CACHE_DIR) -> list:
+    # Non-empty cells of one column, quotes stripped. Defaults to the "Claim"
+    # column; sheets without one are bare claim lists, whose first row (taken
+    # as the header by pandas) is a claim as well.
+    _, manifest = dataset_manifest(path, cache_dir)
+    header = manifest["sheets"].get(sheet, {}).get("header", {})
+    if column is None and "Claim" in header:
+        column = "Claim"
+    if column is not None:
+        values = load_sheet(sheet, [column], path=path, cache_dir=cache_dir).column(0).to_pylist()
+    else:
+        values = load_sheet(sheet, ["A"], header=False, path=path, cache_dir=cache_dir).column(0).to_pylist()
+    return [v.strip().strip('"“”').strip() for v in values if v and v.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Parquet cache of data/Datasets.xlsx.")
+    parser.add_argument("command", choices=["convert", "sheets", "sample"])
+    parser.add_argument("--workbook", default=DATASETS_PATH)
+    parser.add_argument("--cache-dir", default=DATASET_CACHE_DIR)
+    parser.add_argument("--sheet", help="sheet to sample claims from")
+    parser.add_argument("--column", help="column holding the claims (default: Claim, or the first column)")
+    parser.add_argument("-n", type=int, default=None, help="number of claims (default: all)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    if args.command == "convert":
+        print(convert_workbook(args.workbook, args.cache_dir))
+    elif args.command == "sheets":
+        _, manifest = dataset_manifest(args.workbook, args.cache_dir)
+        for sheet, info in manifest["sheets"].items():
+            print(f"{sheet}\t{info['rows']} rows\t{', '.join(info['header'])}")
+    else:
+        if not args.sheet:
+            parser.error("sample needs --sheet")
+        claims = sheet_claims(args.sheet, args.column, args.workbook, args.cache_dir)
+        if args.n is not None and args.n < len(claims):
+            claims = random.Random(args.seed).sample(claims, args.n)
+        print("\n".join(claims))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,306 @@
+#%%
+# Persistent queue of verification jobs. The Streamlit app enqueues a claim
+# and polls the job; background workers (pipeline/job_workers.py) claim jobs,
+# report progress and partial summary text, and store the final result.
+# Any process sharing the database can run workers: claiming a job is a
+# single UPDATE, so two workers never run the same job. Everyone who
+# submitted a claim while its job was pending is recorded as a waiter of that
+# job. The same database holds the leases that keep processes from verifying
+# one claim in parallel, and the result each run leaves for processes that
+# waited on its lease.
+import os
+import json
+import time
+import uuid
+import pickle
+import sqlite3
+import threading
+
+from storage.activity_store import DATA_ROOT, normalize_claim
+
+JOB_DB_PATH = os.getenv("SCITRUE_JOB_DB", os.path.join(DATA_ROOT, "jobs.db"))
+# A running job without a heartbeat for this long belongs to a dead worker.
+JOB_STALE_SECONDS = float(os.getenv("SCITRUE_JOB_STALE_SECONDS", "300"))
+JOB_MAX_ATTEMPTS = 3
+JOB_RETENTION_SECONDS = 7 * 24 * 60 * 60
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    claim TEXT NOT NULL,
+    claim_key TEXT NOT NULL,
+    articles INTEGER NOT NULL,
+    user TEXT,
+    email TEXT,
+    session TEXT,
+    status TEXT NOT NULL,
+    stage TEXT,
+    progress INTEGER NOT NULL DEFAULT 0,
+    hint TEXT,
+    partial TEXT,
+    result TEXT,
+    error TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    worker TEXT,
+    created REAL NOT NULL,
+    started REAL,
+    heartbeat REAL,
+    finished REAL
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs(status, created);
+CREATE INDEX IF NOT EXISTS idx_jobs_email ON jobs(email, created);
+CREATE INDEX IF NOT EXISTS idx_jobs_claim ON jobs(claim_key, articles, status);
+CREATE TABLE IF NOT EXISTS job_waiters (
+    job_id TEXT NOT NULL,
+    session TEXT,
+    user TEXT,
+    email TEXT,
+    created REAL NOT NULL,
+    UNIQUE (job_id, session, email)
+);
+CREATE INDEX IF NOT EXISTS idx_waiters_session ON job_waiters(session, created);
+CREATE TABLE IF NOT EXISTS leases (
+    key TEXT PRIMARY KEY,
+    owner TEXT NOT NULL,
+    expires REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS flight_results (
+    key TEXT PRIMARY KEY,
+    result BLOB NOT NULL,
+    created REAL NOT NULL
+);
+"""
+
+# Columns added after the first release; created on connect when missing.
+ADDED_COLUMNS = {"session": "TEXT"}
+
+_local = threading.local()
+
+
+def connect(db_path: str = JOB_DB_PATH) -> sqlite3.Connection:
+    connections = getattr(_local, "connections", None)
+    if connections is None:
+        connections = _local.connections = {}
+    conn = connections.get(db_path)
+    if conn is None:
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        conn = sqlite3.connect(db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA busy_timeout=30000")
+        conn.executescript(SCHEMA)
+        _add_columns(conn)
+        connections[db_path] = conn
+    return conn
+
+
+def _add_columns(conn):
+    existing = {row[1] for row in conn.execute("PRAGMA table_info(jobs)")}
+    for column, kind in ADDED_COLUMNS.items():
+        if column not in existing:
+            try:
+                conn.execute(f"ALTER TABLE jobs ADD COLUMN {column} {kind}")
+            except sqlite3.OperationalError:
+                pass    # added by another process in the meantime
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_session ON jobs(session, created)")
+
+
+def _job(row):
+    if row is None:
+        return None
+    job = dict(row)
+    for field in ("partial", "result"):
+        job[field] = json.loads(job[field]) if job[field] else None
+    return job
+
+# ----------------- PRODUCER SIDE -----------------
+
+def enqueue_job(claim: str, articles: int, user: str = None, email: str = None, session: str = None,
+                db_path: str = JOB_DB_PATH):
+    # Returns (job_id, coalesced). While a job for the same claim and number of
+    # articles is queued or running, its id is returned instead of a new job.
+    # session identifies the browser session that submitted it.
+    conn = connect(db_path)
+    claim_key = normalize_claim(claim)
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        row = conn.execute(
+            "SELECT id FROM jobs WHERE claim_key = ? AND articles = ? AND status IN (?, ?) ORDER BY created LIMIT 1",
+            (claim_key, int(articles), QUEUED, RUNNING),
+        ).fetchone()
+        coalesced = row is not None
+        if coalesced:
+            job_id = row["id"]
+        else:
+            job_id = uuid.uuid4().hex
+            conn.execute(
+                "INSERT INTO jobs (id, claim, claim_key, articles, user, email, session, status, created) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (job_id, claim, claim_key, int(articles), user, email, session, QUEUED, time.time()),
+            )
+        conn.execute(
+            "INSERT OR IGNORE INTO job_waiters (job_id, session, user, email, created) VALUES (?, ?, ?, ?, ?)",
+            (job_id, session, user, email, time.time()),
+        )
+        conn.execute("COMMIT")
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    return job_id, coalesced
+
+
+def job_waiters(job_id: str, db_path: str = JOB_DB_PATH) -> list:
+    # Everyone who submitted the job's claim while it was pending, first submitter first.
+    rows = connect(db_path).execute(
+        "SELECT session, user, email FROM job_waiters WHERE job_id = ? ORDER BY created, rowid", (job_id,)
+    ).fetchall()
+    return [dict(row) for row in rows]
+
+
+def get_job(job_id: str, db_path: str = JOB_DB_PATH):
+    return _job(connect(db_path).execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone())
+
+
+def queue_position(job_id: str, db_path: str = JOB_DB_PATH) -> int:
+    # Number of queued jobs ahead of this one.
+    row = connect(db_path).execute(
+        "SELECT COUNT(*) FROM jobs WHERE status = ? AND created < (SELECT created FROM jobs WHERE id = ?)",
+        (QUEUED, job_id),
+    ).fetchone()
+    return row[0]
+
+
+def latest_active_job(session: str, db_path: str = JOB_DB_PATH):
+    # Lets a reconnected session pick up the job it started before. Keyed on
+    # the session, not the email: EMNLP visitors all log in as "emnlp".
+    # A session that joined another visitor's job finds that job.
+    if not session:
+        return None
+    row = connect(db_path).execute(
+        "SELECT jobs.* FROM job_waiters JOIN jobs ON jobs.id = job_waiters.job_id "
+        "WHERE job_waiters.session = ? AND jobs.status IN (?, ?) ORDER BY job_waiters.created DESC LIMIT 1",
+        (session, QUEUED, RUNNING),
+    ).fetchone()
+    return _job(row)
+
+# ----------------- WORKER SIDE -----------------
+
+def claim_next_job(worker: str, db_path: str = JOB_DB_PATH):
+    # Oldest queued job, marked running for this worker; None if the queue is empty.
+    conn = connect(db_path)
+    now = time.time()
+    while True:
+        row = conn.execute(
+            "SELECT id FROM jobs WHERE status = ? ORDER BY created LIMIT 1", (QUEUED,)
+        ).fetchone()
+        if row is None:
+            return None
+        cur = conn.execute(
+            "UPDATE jobs SET status = ?, worker = ?, started = ?, heartbeat = ?, attempts = attempts + 1 "
+            "WHERE id = ? AND status = ?",
+            (RUNNING, worker, now, now, row["id"], QUEUED),
+        )
+        if cur.rowcount == 1:
+            return get_job(row["id"], db_path)
+        # Another worker took it first; try the next one.
+
+
+def update_job(job_id: str, stage: str = None, progress: int = None, partial=None, hint: str = None,
+               db_path: str = JOB_DB_PATH):
+    # Also serves as the heartbeat of a running job.
+    assignments = ["heartbeat = ?"]
+    values = [time.time()]
+    for column, value in (("stage", stage), ("progress", progress), ("hint", hint)):
+        if value is not None:
+            assignments.append(f"{column} = ?")
+            values.append(value)
+    if partial is not None:
+        assignments.append("partial = ?")
+        values.append(json.dumps(partial))
+    connect(db_path).execute(f"UPDATE jobs SET {', '.join(assignments)} WHERE id = ?", (*values, job_id))
+
+
+def finish_job(job_id: str, result, db_path: str = JOB_DB_PATH):
+    now = time.time()
+    connect(db_path).execute(
+        "UPDATE jobs SET status = ?, stage = 'done', progress = 100, result = ?, heartbeat = ?, finished = ? WHERE id = ?",
+        (DONE, json.dumps(result), now, now, job_id),
+    )
+
+
+def fail_job(job_id: str, error: str = None, hint: str = None, db_path: str = JOB_DB_PATH):
+    now = time.time()
+    connect(db_path).execute(
+        "UPDATE jobs SET status = ?, error = ?, hint = COALESCE(?, hint), heartbeat = ?, finished = ? WHERE id = ?",
+        (FAILED, error, hint, now, now, job_id),
+    )
+
+
+def requeue_stale_jobs(stale_seconds: float = JOB_STALE_SECONDS, db_path: str = JOB_DB_PATH) -> int:
+    # Running jobs whose worker stopped reporting go back to the queue, or
+    # fail once they have been tried JOB_MAX_ATTEMPTS times.
+    conn = connect(db_path)
+    cutoff = time.time() - stale_seconds
+    failed = conn.execute(
+        "UPDATE jobs SET status = ?, error = 'worker stopped responding', finished = ? "
+        "WHERE status = ? AND heartbeat < ? AND attempts >= ?",
+        (FAILED, time.time(), RUNNING, cutoff, JOB_MAX_ATTEMPTS),
+    ).rowcount
+    requeued = conn.execute(
+        "UPDATE jobs SET status = ?, worker = NULL, stage = NULL, progress = 0, partial = NULL "
+        "WHERE status = ? AND heartbeat < ?",
+        (QUEUED, RUNNING, cutoff),
+    ).rowcount
+    if failed or requeued:
+        print(f"[WARN] Requeued {requeued} and failed {failed} stale job(s).")
+    return requeued
+
+
+def purge_finished_jobs(max_age: float = JOB_RETENTION_SECONDS, db_path: str = JOB_DB_PATH) -> int:
+    # Results are in the activity store; finished jobs are only kept for polling.
+    conn = connect(db_path)
+    purged = conn.execute(
+        "DELETE FROM jobs WHERE status IN (?, ?) AND finished < ?", (DONE, FAILED, time.time() - max_age)
+    ).rowcount
+    conn.execute("DELETE FROM job_waiters WHERE job_id NOT IN (SELECT id FROM jobs)")
+    return purged
+
+# ----------------- LEASES -----------------
+
+def try_acquire_lease(key: str, owner: str, ttl: float, db_path: str = JOB_DB_PATH) -> bool:
+    # True if owner now holds the lease on key, taking over an expired one.
+    now = time.time()
+    cur = connect(db_path).execute(
+        "INSERT INTO leases (key, owner, expires) VALUES (?, ?, ?) "
+        "ON CONFLICT(key) DO UPDATE SET owner = excluded.owner, expires = excluded.expires "
+        "WHERE leases.expires < ? OR leases.owner = excluded.owner",
+        (key, owner, now + ttl, now),
+    )
+    return cur.rowcount == 1
+
+
+def release_lease(key: str, owner: str, db_path: str = JOB_DB_PATH):
+    connect(db_path).execute("DELETE FROM leases WHERE key = ? AND owner = ?", (key, owner))
+
+
+def put_flight_result(key: str, result, max_age: float, db_path: str = JOB_DB_PATH):
+    # Leaves the result of a leased run for the processes waiting on the
+    # lease; results older than max_age are dropped on the way.
+    now = time.time()
+    conn = connect(db_path)
+    conn.execute("DELETE FROM flight_results WHERE created < ?", (now - max_age,))
+    conn.execute(
+        "INSERT OR REPLACE INTO flight_results (key, result, created) VALUES (?, ?, ?)",
+        (key, pickle.dumps(result, protocol=pickle.HIGHEST_PROTOCOL), now),
+    )
+
+
+def get_flight_result(key: str, since: float, db_path: str = JOB_DB_PATH):
+    # The result stored for key at or after since (time.time()), else None.
+    row = connect(db_path).execute(
+        "SELECT result FROM flight_results WHERE key = ? AND created >= ?", (key, since)
+    ).fetchone()
+    return None if row is None else pickle.loads(row["result"])
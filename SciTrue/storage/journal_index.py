@@ -0,0 +1,202 @@
+#%%
+# In-memory SCImago (SJR) journal index, built once per process.
+# Lookups go ISSN -> exact normalized title -> alias -> fuzzy match; the
+# fuzzy step only scores journals sharing the query's rarest title words, so
+# resolving a whole report stays in the low milliseconds. A fuzzy match must
+# also have the same series letters and numbers ("Physics A" is not "Physics B").
+#
+# The table is SCImago's journal ranking export, which is not shipped with the
+# repo: download it from https://www.scimagojr.com/journalrank.php ("Download
+# data") to data/scimagojr.csv or point SCITRUE_SJR_CSV at it. Without it the
+# index is empty and every venue goes to a per-journal get_journal_info_dict
+# lookup, as before the index existed. SCITRUE_SJR_INDEX=1 makes a missing
+# table an error instead; SCITRUE_SJR_INDEX=0 skips the table altogether.
+import os
+import re
+import csv
+import difflib
+import threading
+from collections import defaultdict
+
+base_dir = os.path.dirname(os.path.abspath(__file__))
+SJR_CSV_PATH = os.getenv("SCITRUE_SJR_CSV", os.path.join(base_dir, '..', 'data', 'scimagojr.csv'))
+SJR_INDEX_SETTING = os.getenv("SCITRUE_SJR_INDEX", "")
+SJR_INDEX_ENABLED = SJR_INDEX_SETTING != "0"
+SJR_INDEX_REQUIRED = SJR_INDEX_SETTING == "1"
+FUZZY_CUTOFF = float(os.getenv("SCITRUE_SJR_FUZZY_CUTOFF", "0.9"))
+MAX_FUZZY_CANDIDATES = 200
+
+_word_re = re.compile(r"[a-z0-9]+")
+_paren_re = re.compile(r"\([^)]*\)")
+_issn_re = re.compile(r"^\d{7}[\dx]$")
+_roman_re = re.compile(r"^(i{1,3}|iv|vi{0,3}|ix|xi{0,3})$")
+
+
+def normalize_journal_name(name: str) -> str:
+    name = (name or "").lower().replace("&", " and ")
+    words = _word_re.findall(name)
+    if words and words[0] == "the":
+        words = words[1:]
+    return " ".join(words)
+
+
+def series_tokens(key: str) -> tuple:
+    # Section letters, numbers and roman numerals of a normalized title, e.g.
+    # ("a",) for "journal of physics a mathematical and theoretical". A leading
+    # "a" is the article, not a section.
+    words = key.split()
+    return tuple(
+        w for i, w in enumerate(words)
+        if (len(w) == 1 and not (i == 0 and w == "a")) or w.isdigit() or _roman_re.match(w)
+    )
+
+
+def normalize_issn(value: str) -> str:
+    value = re.sub(r"[^0-9xX]", "", value or "").lower()
+    return value if _issn_re.match(value) else ""
+
+
+def alias_keys(title: str):
+    keys = {normalize_journal_name(title)}
+    keys.add(normalize_journal_name(_paren_re.sub(" ", title)))
+    # "Journal of X: Y" is often cited as just "Journal of X".
+    if ":" in title:
+        keys.add(normalize_journal_name(title.split(":", 1)[0]))
+    keys.discard("")
+    return keys
+
+
+def _number(value: str):
+    value = (value or "").strip().replace(",", ".")
+    try:
+        return float(value) if "." in value else int(value)
+    except ValueError:
+        return value
+
+
+class JournalIndex:
+    def __init__(self, rows=()):
+        self.records = []
+        self.keys = []
+        self.series = []
+        self.by_title = {}
+        self.by_alias = {}
+        self.by_issn = {}
+        self.by_word = defaultdict(list)
+        self.fuzzy_memo = {}
+        for row in rows:
+            self.add(row)
+
+    def add(self, row):
+        title = row.get("Title", "")
+        if not title:
+            return
+        record = {
+            "Title": title,
+            "Issn": row.get("Issn", ""),
+            "SJR": _number(row.get("SJR", "")),
+            "SJR Best Quartile": row.get("SJR Best Quartile", ""),
+            "H index": _number(row.get("H index", "")),
+            "Country": row.get("Country", ""),
+            "Publisher": row.get("Publisher", ""),
+        }
+        idx = len(self.records)
+        key = normalize_journal_name(title)
+        self.records.append(record)
+        self.keys.append(key)
+        self.series.append(series_tokens(key))
+        # Rows are ranked by SJR, so the first title seen wins on collisions.
+        self.by_title.setdefault(key, idx)
+        for alias in alias_keys(title):
+            self.by_alias.setdefault(alias, idx)
+        for issn in (row.get("Issn") or "").split(","):
+            issn = normalize_issn(issn)
+            if issn:
+                self.by_issn.setdefault(issn, idx)
+        for word in set(key.split()):
+            self.by_word[word].append(idx)
+
+    def __len__(self):
+        return len(self.records)
+
+    def _fuzzy(self, key):
+        if key in self.fuzzy_memo:
+            return self.fuzzy_memo[key]
+        words = [w for w in set(key.split()) if w in self.by_word]
+        best_idx = None
+        if words:
+            # Two rarest words, so a typo in one of them still finds the journal.
+            rarest = sorted(words, key=lambda w: len(self.by_word[w]))[:2]
+            candidates = set()
+            for word in rarest:
+                candidates.update(self.by_word[word][:MAX_FUZZY_CANDIDATES])
+            series = series_tokens(key)
+            matcher = difflib.SequenceMatcher(b=key, autojunk=False)
+            best_score = FUZZY_CUTOFF
+            for idx in candidates:
+                if self.series[idx] != series:
+                    continue
+                matcher.set_seq1(self.keys[idx])
+                if matcher.real_quick_ratio() < best_score or matcher.quick_ratio() < best_score:
+                    continue
+                score = matcher.ratio()
+                if score >= best_score:
+                    best_idx, best_score = idx, score
+        if len(self.fuzzy_memo) > 10000:
+            self.fuzzy_memo.clear()
+        self.fuzzy_memo[key] = best_idx
+        return best_idx
+
+    def resolve(self, name: str):
+        # Journal record for a title, alias or ISSN, or None.
+        issn = normalize_issn(name)
+        if issn and issn in self.by_issn:
+            return self.records[self.by_issn[issn]]
+        key = normalize_journal_name(name)
+        if not key:
+            return None
+        idx = self.by_title.get(key)
+        if idx is None:
+            idx = self.by_alias.get(key)
+        if idx is None:
+            idx = self._fuzzy(key)
+        return self.records[idx] if idx is not None else None
+
+    def resolve_many(self, names):
+        # Batch form used by the pipeline: {name: record or None} for every name.
+        return {name: self.resolve(name) for name in set(names) if name}
+
+
+def load_journal_index(csv_path: str = SJR_CSV_PATH) -> JournalIndex:
+    # SCImago exports are ';'-separated with decimal commas.
+    if not SJR_INDEX_ENABLED:
+        print("[WARN] SJR index disabled (SCITRUE_SJR_INDEX=0); every venue uses a per-journal lookup.")
+        return JournalIndex()
+    if not os.path.exists(csv_path):
+        message = (
+            f"SJR table not found at '{csv_path}'. Download it from https://www.scimagojr.com/journalrank.php "
+            "to that path (or set SCITRUE_SJR_CSV)"
+        )
+        if SJR_INDEX_REQUIRED:
+            raise FileNotFoundError(f"{message}, or unset SCITRUE_SJR_INDEX to use per-journal lookups only.")
+        print(f"[WARN] {message}; every venue uses a per-journal lookup.")
+        return JournalIndex()
+    with open(csv_path, "r", encoding="utf-8-sig", newline="") as f:
+        sample = f.read(4096)
+        f.seek(0)
+        delimiter = ";" if sample.count(";") >= sample.count(",") else ","
+        return JournalIndex(csv.DictReader(f, delimiter=delimiter))
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_journal_index() -> JournalIndex:
+    # Process-wide index shared by every session and request.
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = load_journal_index()
+    return _index
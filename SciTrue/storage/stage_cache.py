@@ -0,0 +1,211 @@
+#%%
+# On-disk, content-addressed cache for the individual pipeline stages.
+# A key is the hash of (stage, prompt-template version, model, stage input),
+# so editing one prompt only invalidates the stages that use it, and results
+# of different models never share an entry (see completion_model()). Entries
+# expire after a per-stage TTL and the least recently used ones are evicted
+# once the cache grows past its size cap.
+import os
+import json
+import time
+import pickle
+import sqlite3
+import hashlib
+import threading
+import functools
+
+base_dir = os.path.dirname(os.path.abspath(__file__))
+STAGE_CACHE_PATH = os.getenv(
+    "SCITRUE_STAGE_CACHE_PATH", os.path.join(base_dir, '..', 'outputs', 'cache', 'stage_cache.db')
+)
+STAGE_CACHE_ENABLED = os.getenv("SCITRUE_STAGE_CACHE", "1") == "1"
+STAGE_CACHE_MAX_BYTES = int(os.getenv("SCITRUE_STAGE_CACHE_MAX_MB", "512")) * 1024 * 1024
+# Re-read SUM(size) every this many puts, for writes by other processes.
+RESYNC_EVERY = 256
+# Module-level names calls.one_generation may keep its model in.
+MODEL_ATTRIBUTES = ("MODEL", "MODEL_NAME", "DEFAULT_MODEL", "model", "model_name")
+
+DAY = 24 * 60 * 60
+DEFAULT_TTL = 7 * DAY
+STAGE_TTLS = {
+    "refinement": 30 * DAY,
+    "retrieval": 3 * DAY,   # new papers show up; keep retrieval fresher
+    "summary": 7 * DAY,
+    "extraction": 7 * DAY,
+    "sjr": 90 * DAY,
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS stage_cache (
+    key TEXT PRIMARY KEY,
+    stage TEXT NOT NULL,
+    created REAL NOT NULL,
+    accessed REAL NOT NULL,
+    size INTEGER NOT NULL,
+    value BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_stage_cache_accessed ON stage_cache(accessed);
+"""
+
+MISSING = object()
+_local = threading.local()
+_totals = {}        # db_path -> [bytes stored, puts since the last resync]
+_totals_lock = threading.Lock()
+
+
+@functools.lru_cache(maxsize=None)
+def completion_model() -> str:
+    # The model behind calls.one_generation.get_one_completion, which every
+    # LLM stage goes through. SCITRUE_MODEL names it when the module does not
+    # expose it; "unknown" if neither does.
+    try:
+        from calls import one_generation
+    except ImportError:
+        one_generation = None
+    for attribute in MODEL_ATTRIBUTES:
+        model = getattr(one_generation, attribute, None)
+        if isinstance(model, str) and model:
+            return model
+    return os.getenv("SCITRUE_MODEL") or "unknown"
+
+
+def _connect(db_path: str = STAGE_CACHE_PATH) -> sqlite3.Connection:
+    connections = getattr(_local, "connections", None)
+    if connections is None:
+        connections = _local.connections = {}
+    conn = connections.get(db_path)
+    if conn is None:
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        conn = sqlite3.connect(db_path, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript(SCHEMA)
+        connections[db_path] = conn
+    return conn
+
+
+def stage_key(stage: str, payload, version: str = "1", model: str = None) -> str:
+    model = model or completion_model()
+    blob = json.dumps([stage, version, model, payload], sort_keys=True, default=str)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+def get_cached(key: str, stage: str, db_path: str = STAGE_CACHE_PATH):
+    # Returns the cached value, or MISSING so that None can be cached too.
+    conn = _connect(db_path)
+    row = conn.execute("SELECT created, value FROM stage_cache WHERE key = ?", (key,)).fetchone()
+    if row is None:
+        return MISSING
+    now = time.time()
+    if now - row[0] > STAGE_TTLS.get(stage, DEFAULT_TTL):
+        _delete(conn, key, len(row[1]), db_path)
+        return MISSING
+    try:
+        value = pickle.loads(row[1])
+    except Exception:
+        _delete(conn, key, len(row[1]), db_path)
+        return MISSING
+    conn.execute("UPDATE stage_cache SET accessed = ? WHERE key = ?", (now, key))
+    return value
+
+
+def _total(conn, db_path, delta: int = 0, put: bool = False) -> int:
+    # Running size of the cache. Starts from SUM(size) and is re-read every
+    # RESYNC_EVERY puts; in between, puts and deletes adjust it.
+    with _totals_lock:
+        total = _totals.get(db_path)
+        if total is None or (put and total[1] >= RESYNC_EVERY):
+            total = _totals[db_path] = [conn.execute("SELECT COALESCE(SUM(size), 0) FROM stage_cache").fetchone()[0], 0]
+        else:
+            total[0] += delta
+        if put:
+            total[1] += 1
+        return total[0]
+
+
+def _delete(conn, key, size, db_path):
+    conn.execute("DELETE FROM stage_cache WHERE key = ?", (key,))
+    _total(conn, db_path, -size)
+
+
+def put_cached(key: str, stage: str, value, db_path: str = STAGE_CACHE_PATH):
+    blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+    now = time.time()
+    conn = _connect(db_path)
+    old = conn.execute("SELECT size FROM stage_cache WHERE key = ?", (key,)).fetchone()
+    conn.execute(
+        "INSERT OR REPLACE INTO stage_cache (key, stage, created, accessed, size, value) VALUES (?, ?, ?, ?, ?, ?)",
+        (key, stage, now, now, len(blob), blob),
+    )
+    total = _total(conn, db_path, len(blob) - (old[0] if old else 0), put=True)
+    if total > STAGE_CACHE_MAX_BYTES:
+        evict(STAGE_CACHE_MAX_BYTES, db_path)
+
+
+def evict(max_bytes: int = STAGE_CACHE_MAX_BYTES, db_path: str = STAGE_CACHE_PATH):
+    # Drop least recently used entries until the cache is back under 90% of the cap.
+    conn = _connect(db_path)
+    with _totals_lock:
+        _totals.pop(db_path, None)
+    total = _total(conn, db_path)
+    if total <= max_bytes:
+        return
+    target = max_bytes * 0.9
+    for key, size in conn.execute("SELECT key, size FROM stage_cache ORDER BY accessed").fetchall():
+        if total <= target:
+            break
+        _delete(conn, key, size, db_path)
+        total -= size
+
+
+def _tag(tags, result):
+    if tags is not None:
+        tags["cache"] = result
+
+
+def cached_call(stage: str, payload, fn, version: str = "1", model: str = None, cache_if=bool, tags=None):
+    # Run fn() unless this stage already produced a result for the same input,
+    # prompt version and model. Results failing cache_if (empty by default) are
+    # returned but not stored, so a bad completion is retried next time.
+    # tags, e.g. a tracing span's, gets cache = "hit" / "miss" / "off".
+    if not STAGE_CACHE_ENABLED:
+        _tag(tags, "off")
+        return fn()
+    key = stage_key(stage, payload, version, model)
+    value = get_cached(key, stage)
+    if value is not MISSING:
+        _tag(tags, "hit")
+        return value
+    _tag(tags, "miss")
+    value = fn()
+    if cache_if(value):
+        put_cached(key, stage, value)
+    return value
+
+
+async def cached_acall(stage: str, payload, coro_fn, version: str = "1", model: str = None, cache_if=bool,
+                       tags=None):
+    # cached_call for coroutine stages; coro_fn is only awaited on a miss.
+    if not STAGE_CACHE_ENABLED:
+        _tag(tags, "off")
+        return await coro_fn()
+    key = stage_key(stage, payload, version, model)
+    value = get_cached(key, stage)
+    if value is not MISSING:
+        _tag(tags, "hit")
+        return value
+    _tag(tags, "miss")
+    value = await coro_fn()
+    if cache_if(value):
+        put_cached(key, stage, value)
+    return value
+
+
+def clear_stage(stage: str = None, db_path: str = STAGE_CACHE_PATH):
+    conn = _connect(db_path)
+    if stage is None:
+        conn.execute("DELETE FROM stage_cache")
+    else:
+        conn.execute("DELETE FROM stage_cache WHERE stage = ?", (stage,))
+    with _totals_lock:
+        _totals.pop(db_path, None)
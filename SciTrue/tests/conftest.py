@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Tests import the packages the way the apps do, from the SciTrue directory.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
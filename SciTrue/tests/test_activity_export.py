@@ -0,0 +1,24 @@
+import storage.activity_export as ae
+import storage.activity_store as store
+
+
+def log(db_path, claim, timestamp):
+    store.log_activity({"user": "u", "email": "u@x", "claim": claim, "articles": 3, "timestamp": timestamp,
+                        "overall accuracy": "80/100", "subclaims": []}, db_path)
+
+
+def test_entries_without_a_date_only_match_unfiltered_queries(tmp_path):
+    db_path = str(tmp_path / "activity.db")
+    export_dir = str(tmp_path / "exports")
+    log(db_path, "Coffee reduces disease risk", "2025-07-01 10:00:00")
+    log(db_path, "Tea lowers blood pressure", "2025-07-03 10:00:00")
+    log(db_path, "Salt raises blood pressure", "yesterday")
+    assert ae.export_activity(db_path, export_dir) == 3
+
+    def claims(since=None, until=None):
+        return sorted(ae.load_table("claims", ["claim"], since, until, export_dir)["claim"])
+
+    assert claims() == ["Coffee reduces disease risk", "Salt raises blood pressure", "Tea lowers blood pressure"]
+    assert claims(since="2025-07-02") == ["Tea lowers blood pressure"]
+    assert claims(until="2025-07-02") == ["Coffee reduces disease risk"]
+    assert claims(since="2025-07-01", until="2025-07-03") == ["Coffee reduces disease risk", "Tea lowers blood pressure"]
@@ -0,0 +1,97 @@
+import os
+import sys
+import json
+import asyncio
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "eval"))
+
+import batch_runner as br
+
+
+class StatusError(Exception):
+    def __init__(self, status):
+        super().__init__(f"HTTP {status}")
+        self.status_code = status
+
+
+class Response:
+    def __init__(self, status):
+        self.status_code = status
+
+
+class HTTPError(Exception):
+    # requests.HTTPError keeps the status on its response.
+    def __init__(self, status):
+        super().__init__(f"HTTP {status}")
+        self.response = Response(status)
+
+
+class RateLimitError(Exception):
+    pass
+
+
+class AuthenticationError(Exception):
+    pass
+
+
+def test_only_rate_limits_timeouts_and_server_errors_are_retried():
+    for e in (StatusError(429), StatusError(500), StatusError(503), HTTPError(502), HTTPError(408),
+              RateLimitError("slow down"), TimeoutError(), asyncio.TimeoutError()):
+        assert br.is_retryable(e), e
+    for e in (StatusError(401), StatusError(400), HTTPError(404), AuthenticationError("bad key"),
+              ValueError("bad json"), KeyError("choices")):
+        assert not br.is_retryable(e), e
+
+
+def test_auth_error_fails_the_claim_without_retrying(monkeypatch):
+    monkeypatch.setattr(br, "backoff_delay", lambda attempt: 0.0)
+    calls = []
+
+    def request(claim, num_articles):
+        calls.append(claim)
+        raise StatusError(401)
+
+    record = asyncio.run(br.process_claim("c", 5, request, json.loads, br.RateLimiter(0)))
+    assert len(calls) == 1 and "401" in record["error"]
+
+
+def test_server_error_is_retried(monkeypatch):
+    monkeypatch.setattr(br, "backoff_delay", lambda attempt: 0.0)
+    calls = []
+
+    def request(claim, num_articles):
+        calls.append(claim)
+        if len(calls) < 3:
+            raise StatusError(503)
+        return '{"ok": true}'
+
+    record = asyncio.run(br.process_claim("c", 5, request, json.loads, br.RateLimiter(0)))
+    assert len(calls) == 3 and record["output"] == {"ok": True}
+
+
+def test_checkpoint_is_keyed_by_model_and_prompt_version(tmp_path, monkeypatch):
+    monkeypatch.setenv("SCITRUE_RATE_TEST", "0")
+    output_path = str(tmp_path / "results.json")
+    claims = [("a", 5), ("b", 5)]
+    calls = []
+
+    def request(claim, num_articles):
+        calls.append(claim)
+        return '{"claim": "%s"}' % claim
+
+    def run(model, prompt_version):
+        return asyncio.run(br.run_batch(claims, request, json.loads, output_path, "test", model, prompt_version,
+                                        concurrency=2))
+
+    run("gpt-4o", "1")
+    assert sorted(calls) == ["a", "b"]
+    run("gpt-4o", "1")                      # resumed: nothing to redo
+    assert len(calls) == 2
+    run("gpt-4o-mini", "1")                 # other model: everything reruns
+    assert len(calls) == 4
+    results = run("gpt-4o-mini", "2")       # other prompt: everything reruns
+    assert len(calls) == 6
+    assert results == [{"claim": c, "num_articles": 5, "output": {"claim": c}} for c, _ in claims]
+    with open(output_path, encoding="utf-8") as f:
+        assert json.load(f) == results
+    assert br.load_checkpoint(output_path + ".checkpoint.jsonl", "gpt-4o", "1").keys() == {"a", "b"}
@@ -0,0 +1,45 @@
+import pytest
+
+from storage.activity_store import log_activity
+from storage.claim_similarity import ClaimIndex, claim_vector, cosine, same_meaning, SIMILARITY_THRESHOLD
+
+OPPOSITES = [
+    ("Vaccines cause autism", "Vaccines do not cause autism"),
+    ("Coffee increases cancer risk", "Coffee decreases cancer risk"),
+    ("Smoking causes lung cancer", "Smoking does not cause lung cancer"),
+    ("Aspirin reduces heart attack risk in men", "Aspirin reduces heart attack risk in women"),
+    ("Vitamin D prevents colds", "Vitamin C prevents colds"),
+    ("Exercise lowers blood pressure", "Exercise raises blood pressure"),
+]
+REPHRASINGS = [
+    ("Coffee increases the risk of cancer", "Coffee increases cancer risk"),
+    ("Smoking causes lung cancer.", "smoking causes lung cancer"),
+    ("Vaccines don't cause autism", "Vaccines do not cause autism"),
+]
+
+
+@pytest.mark.parametrize("a, b", OPPOSITES)
+def test_opposite_claims_do_not_match(a, b):
+    assert not same_meaning(a, b)
+
+
+@pytest.mark.parametrize("a, b", REPHRASINGS)
+def test_rephrasings_match(a, b):
+    assert same_meaning(a, b)
+
+
+@pytest.mark.parametrize("a, b", OPPOSITES)
+def test_index_does_not_serve_opposite_claim(tmp_path, a, b):
+    db_path = str(tmp_path / "activity.db")
+    log_activity({"claim": a, "articles": 5, "email": "u@x", "summary": "s"}, db_path)
+    index = ClaimIndex(db_path)
+    assert cosine(claim_vector(a), claim_vector(b)) > 0.5      # close enough to fool the cosine alone
+    assert index.query(b, 5, threshold=0.5)[0] is None
+
+
+def test_index_serves_rephrasing(tmp_path):
+    db_path = str(tmp_path / "activity.db")
+    entry_id = log_activity({"claim": "Coffee increases the risk of cancer", "articles": 5, "email": "u@x"}, db_path)
+    index = ClaimIndex(db_path)
+    assert index.query("Coffee increases cancer risk", 5, SIMILARITY_THRESHOLD)[0] == entry_id
+    assert index.query("Coffee increases cancer risk", 3, SIMILARITY_THRESHOLD)[0] is None
@@ -0,0 +1,22 @@
+import os
+import sys
+import json
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "eval"))
+
+from eval_store import EvalStore
+
+
+def test_every_save_updates_the_eval_file(tmp_path):
+    path = str(tmp_path / "alice_gpt4o3.json")
+    store = EvalStore(path)
+    store.upsert({"claim": "Coffee reduces disease risk", "overall_verdict": "No"})
+    store.upsert({"claim": "Tea lowers blood pressure", "overall_verdict": "Yes"})
+    store.upsert({"claim": " coffee reduces disease risk", "overall_verdict": "Yes"})
+    with open(path, encoding="utf-8") as f:
+        saved = json.load(f)
+    assert [(ev["claim"].strip().lower(), ev["overall_verdict"]) for ev in saved] == [
+        ("coffee reduces disease risk", "Yes"), ("tea lowers blood pressure", "Yes"),
+    ]
+    assert sorted(os.listdir(tmp_path)) == ["alice_gpt4o3.json"]
+    assert EvalStore(path).get("Tea lowers blood pressure")["overall_verdict"] == "Yes"
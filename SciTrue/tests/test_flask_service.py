@@ -0,0 +1,35 @@
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "demo"))
+
+import flask_service as fs
+
+
+def test_rate_limit_is_per_client_and_slides():
+    limiter = fs.ClientRateLimiter(2, window=60)
+    assert limiter.retry_after("a", now=0) == 0
+    assert limiter.retry_after("a", now=1) == 0
+    assert limiter.retry_after("a", now=2) == 58
+    assert limiter.retry_after("b", now=2) == 0
+    assert limiter.retry_after("a", now=60) == 0      # the request at 0 left the window
+
+
+def test_verify_needs_the_token_or_a_local_client(monkeypatch):
+    monkeypatch.setattr(fs, "API_TOKEN", None)
+    monkeypatch.setattr(fs, "API_TOKENS", {})
+    assert fs.api_identity(None, "127.0.0.1") == "api"
+    assert fs.api_identity(None, "10.0.0.5") is None
+    monkeypatch.setattr(fs, "API_TOKEN", "s3cret")
+    assert fs.api_identity("Bearer s3cret", "10.0.0.5") == "api"
+    assert fs.api_identity("Bearer wrong", "10.0.0.5") is None
+    assert fs.api_identity(None, "127.0.0.1") is None
+
+
+def test_each_token_acts_for_its_own_account(monkeypatch):
+    monkeypatch.setattr(fs, "API_TOKEN", None)
+    monkeypatch.setattr(fs, "API_TOKENS", fs.parse_api_tokens("alice@example.org=t1, bob@example.org=t2,broken"))
+    assert fs.API_TOKENS == {"t1": "alice@example.org", "t2": "bob@example.org"}
+    assert fs.api_identity("Bearer t1", "10.0.0.5") == "alice@example.org"
+    assert fs.api_identity("bearer t2", "10.0.0.5") == "bob@example.org"
+    assert fs.api_identity("Bearer t3", "127.0.0.1") is None
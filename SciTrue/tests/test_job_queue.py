@@ -0,0 +1,37 @@
+import sqlite3
+
+import storage.job_queue as jq
+
+
+def test_active_job_is_found_by_session_not_email(tmp_path):
+    db_path = str(tmp_path / "jobs.db")
+    job_id, _ = jq.enqueue_job("Coffee reduces disease risk", 3, "emnlp", "emnlp", "session-a", db_path)
+    assert jq.latest_active_job("session-a", db_path)["id"] == job_id
+    assert jq.latest_active_job("session-b", db_path) is None      # same email, other visitor
+    assert jq.latest_active_job(None, db_path) is None
+
+
+def test_session_column_is_added_to_an_old_database(tmp_path):
+    db_path = str(tmp_path / "jobs.db")
+    conn = sqlite3.connect(db_path)
+    conn.execute(
+        "CREATE TABLE jobs (id TEXT PRIMARY KEY, claim TEXT NOT NULL, claim_key TEXT NOT NULL, "
+        "articles INTEGER NOT NULL, user TEXT, email TEXT, status TEXT NOT NULL, stage TEXT, "
+        "progress INTEGER NOT NULL DEFAULT 0, hint TEXT, partial TEXT, result TEXT, error TEXT, "
+        "attempts INTEGER NOT NULL DEFAULT 0, worker TEXT, created REAL NOT NULL, started REAL, "
+        "heartbeat REAL, finished REAL)"
+    )
+    conn.close()
+    job_id, _ = jq.enqueue_job("Tea lowers blood pressure", 2, session="s", db_path=db_path)
+    assert jq.get_job(job_id, db_path)["session"] == "s"
+
+
+def test_every_submitter_of_a_coalesced_job_is_a_waiter(tmp_path):
+    db_path = str(tmp_path / "jobs.db")
+    job_id, coalesced = jq.enqueue_job("Coffee reduces disease risk", 3, "emnlp", "emnlp", "session-a", db_path)
+    assert not coalesced
+    assert jq.enqueue_job("coffee reduces disease risk ", 3, "bob", "bob@x", "session-b", db_path) == (job_id, True)
+    assert jq.enqueue_job("Coffee reduces disease risk", 3, "bob", "bob@x", "session-b", db_path) == (job_id, True)
+    waiters = jq.job_waiters(job_id, db_path)
+    assert [(w["session"], w["email"]) for w in waiters] == [("session-a", "emnlp"), ("session-b", "bob@x")]
+    assert jq.latest_active_job("session-b", db_path)["id"] == job_id
@@ -0,0 +1,47 @@
+import pytest
+
+import storage.journal_index as ji
+from storage.journal_index import JournalIndex, series_tokens
+
+ROWS = [
+    {"Title": "Journal of Physics A: Mathematical and Theoretical", "Issn": "17518113, 17518121", "SJR": "0,6"},
+    {"Title": "Journal of Physics B: Atomic, Molecular and Optical Physics", "Issn": "09534075", "SJR": "0,5"},
+    {"Title": "Acta Crystallographica Section D: Structural Biology", "Issn": "20597983", "SJR": "1,2"},
+    {"Title": "Physical Review E", "Issn": "24700045", "SJR": "0,8"},
+    {"Title": "Diabetes Care", "Issn": "01495992", "SJR": "6,0"},
+]
+
+
+@pytest.fixture
+def index():
+    return JournalIndex(ROWS)
+
+
+def test_series_tokens():
+    assert series_tokens("journal of physics a mathematical and theoretical") == ("a",)
+    assert series_tokens("a journal of medicine") == ()
+    assert series_tokens("journal of vol 12 part ii") == ("12", "ii")
+
+
+@pytest.mark.parametrize("name", ["Journal of Physics C", "Physical Review D", "Acta Crystallographica Section F"])
+def test_fuzzy_match_rejects_sibling_series(index, name):
+    assert index.resolve(name) is None
+
+
+def test_fuzzy_match_keeps_same_series(index):
+    assert index.resolve("Journal of Physics B")["Title"].startswith("Journal of Physics B")
+    assert index.resolve("Jounral of Physics B: Atomic, Molecular and Optical Physics")["Issn"] == "09534075"
+    assert index.resolve("Physical Reviews E")["Title"] == "Physical Review E"
+    assert index.resolve("Diabetes care.")["SJR"] == 6.0
+    assert index.resolve("0149-5992")["Title"] == "Diabetes Care"
+
+
+def test_missing_table_falls_back_unless_required(tmp_path, monkeypatch):
+    monkeypatch.setattr(ji, "SJR_INDEX_ENABLED", True)
+    monkeypatch.setattr(ji, "SJR_INDEX_REQUIRED", False)
+    assert len(ji.load_journal_index(str(tmp_path / "missing.csv"))) == 0
+    monkeypatch.setattr(ji, "SJR_INDEX_REQUIRED", True)
+    with pytest.raises(FileNotFoundError, match="SCITRUE_SJR_INDEX"):
+        ji.load_journal_index(str(tmp_path / "missing.csv"))
+    monkeypatch.setattr(ji, "SJR_INDEX_ENABLED", False)
+    assert len(ji.load_journal_index(str(tmp_path / "missing.csv"))) == 0
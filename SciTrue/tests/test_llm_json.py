@@ -0,0 +1,190 @@
+# Corpus and fuzz tests for the tolerant LLM JSON parser. The corpus is every
+# parsed output and raw response in eval/*/*.json. Each value is written back
+# out with the mistakes models make (code fences, prose around it, trailing
+# commas, smart quotes, raw newlines, Python literals, a cut-off tail), and
+# parse_llm_json must return the original value (or, for a cut-off tail, a
+# value of the same type or LLMJSONError).
+import os
+import glob
+import json
+import random
+
+import pytest
+
+from pipeline.llm_json import JSONFieldStreamer, LLMJSONError, LLMJSONTruncated, parse_llm_json
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PROSE_BEFORE = ["", "Here is the JSON you asked for:\n", "Based on [1] and [2], the assessment is:\n\n"]
+PROSE_AFTER = ["", "\n\nLet me know if you need anything else.", "\n}\n\n**Note:** sources [3] were not accessible."]
+LOSSLESS = ("clean", "fence", "prose", "trailing_commas", "smart_quotes", "raw_newlines", "python_literals", "combined")
+ITERATIONS = 200
+
+
+def load_corpus(base_dir=BASE_DIR):
+    # (values, raw_responses) from the eval result files.
+    values, raw = [], []
+    for path in sorted(glob.glob(os.path.join(base_dir, "eval", "*", "*.json"))):
+        with open(path, "r", encoding="utf-8") as f:
+            records = json.load(f)
+        for record in records:
+            if isinstance(record.get("raw_response"), str):
+                raw.append(record["raw_response"])
+            if isinstance(record.get("output"), dict):
+                values.append(record["output"])
+            if isinstance(record.get("subclaims"), list):
+                values.append(record["subclaims"])
+            if isinstance(record.get("summary"), str):
+                values.append({"executive summary": record["summary"], "accuracy": record.get("overall accuracy")})
+    return values, raw
+
+
+VALUES, RAW = load_corpus()
+
+
+def render(value, style, indent=0):
+    # json.dumps with the given set of mistakes.
+    pad = "  " * (indent + 1)
+    if isinstance(value, dict):
+        items = [f"{pad}{render_string(str(key), style)}: {render(item, style, indent + 1)}" for key, item in value.items()]
+        return "{\n" + ",\n".join(items) + ("," if items and "trailing_commas" in style else "") + "\n" + "  " * indent + "}"
+    if isinstance(value, list):
+        items = [pad + render(item, style, indent + 1) for item in value]
+        return "[\n" + ",\n".join(items) + ("," if items and "trailing_commas" in style else "") + "\n" + "  " * indent + "]"
+    if isinstance(value, str):
+        return render_string(value, style)
+    if "python_literals" in style and (value is None or isinstance(value, bool)):
+        return repr(value)
+    return json.dumps(value)
+
+
+def render_string(text, style):
+    smart = "smart_quotes" in style and "“" not in text and "”" not in text
+    out = []
+    for ch in text:
+        if ch == "\\":
+            out.append("\\\\")
+        elif ch == '"':
+            out.append('"' if smart else '\\"')
+        elif ch == "\n" and "raw_newlines" in style:
+            out.append("\n")
+        elif ch < " ":
+            out.append(json.dumps(ch)[1:-1])
+        else:
+            out.append(ch)
+    if smart:
+        return "“" + "".join(out) + "”"
+    return '"' + "".join(out) + '"'
+
+
+def mutate(value, mutation, rng):
+    if mutation == "combined":
+        style = {m for m in ("trailing_commas", "smart_quotes", "raw_newlines", "python_literals") if rng.random() < 0.5}
+        text = render(value, style)
+        return wrap(text, rng, fence=rng.random() < 0.5, prose=rng.random() < 0.5)
+    text = render(value, {mutation})
+    if mutation == "fence":
+        return wrap(text, rng, fence=True, prose=False)
+    if mutation == "prose":
+        return wrap(text, rng, fence=False, prose=True)
+    return text
+
+
+def wrap(text, rng, fence, prose):
+    if fence:
+        text = "```json\n" + text + "\n```"
+    if prose:
+        text = rng.choice(PROSE_BEFORE[1:]) + text + rng.choice(PROSE_AFTER[1:])
+    return text
+
+
+def garble(text, rng):
+    # Random edits; only checks that nothing but LLMJSONError escapes.
+    chars = list(text)
+    for _ in range(rng.randint(1, 8)):
+        i = rng.randrange(len(chars) + 1)
+        op = rng.random()
+        if op < 0.4 and i < len(chars):
+            del chars[i]
+        elif op < 0.8:
+            chars.insert(i, rng.choice('{}[]",:\\“”\n ax1'))
+        else:
+            chars = chars[:i]
+    return "".join(chars)
+
+
+def test_corpus_is_not_empty():
+    assert VALUES and RAW
+
+
+@pytest.mark.parametrize("mutation", LOSSLESS)
+def test_lossless_mutations_parse_to_the_original_value(mutation):
+    rng = random.Random(mutation)
+    for _ in range(ITERATIONS):
+        value = rng.choice(VALUES)
+        text = mutate(value, mutation, rng)
+        assert parse_llm_json(text) == value, text[:200]
+
+
+def test_truncated_output_gives_the_same_type_or_llmjsonerror():
+    rng = random.Random(1)
+    for _ in range(ITERATIONS):
+        value = rng.choice(VALUES)
+        text = render(value, set())
+        text = text[:rng.randint(1, len(text) - 1)]
+        try:
+            parsed = parse_llm_json(text)
+        except LLMJSONError:
+            continue
+        assert isinstance(parsed, type(value)), text[:200]
+
+
+def test_complete_rejects_truncated_output_and_says_how():
+    text = json.dumps({"executive summary": "Coffee helps.", "accuracy": "80/100", "reason for accuracy": "Two trials."})
+    assert parse_llm_json("Sure:\n" + text, expect=dict, complete=True)["accuracy"] == "80/100"
+    for end, cut, value in (
+        (text.index("helps") + 2, True, {"executive summary": "Coffee he"}),
+        (text.index("reason") - 2, False, {"executive summary": "Coffee helps.", "accuracy": "80/100"}),
+        (len(text) - 1, False, json.loads(text)),
+    ):
+        with pytest.raises(LLMJSONTruncated) as e:
+            parse_llm_json(text[:end], expect=dict, complete=True)
+        assert (e.value.cut, e.value.value) == (cut, value)
+        assert parse_llm_json(text[:end], expect=dict) == value
+
+
+def test_garbled_output_raises_nothing_but_llmjsonerror():
+    rng = random.Random(2)
+    for _ in range(ITERATIONS):
+        text = garble(render(rng.choice(VALUES), set()), rng)
+        try:
+            parse_llm_json(text)
+        except LLMJSONError:
+            pass
+
+
+def test_raw_responses_the_eval_scripts_failed_on_are_recovered():
+    for text in RAW:
+        assert isinstance(parse_llm_json(text, expect=dict), dict)
+
+
+def test_expect_skips_values_of_the_other_type():
+    text = 'Sources: ["a", "b"]\n```json\n{"accuracy": "80/100",}\n```'
+    assert parse_llm_json(text, expect=dict) == {"accuracy": "80/100"}
+    with pytest.raises(LLMJSONError):
+        parse_llm_json("no JSON here", expect=list)
+
+
+def test_field_streamer_decodes_watched_fields_across_chunks():
+    value = {"claim": "x", "executive summary": "Coffee \"helps\" \u00e9\nlater", "accuracy": "80/100",
+             "nested": {"accuracy": "ignored"}}
+    text = json.dumps(value)
+    rng = random.Random(3)
+    streamer = JSONFieldStreamer(("executive summary", "accuracy"))
+    deltas = {"executive summary": "", "accuracy": ""}
+    i = 0
+    while i < len(text):
+        step = rng.randint(1, 7)
+        for field, delta in streamer.feed(text[i:i + step]).items():
+            deltas[field] += delta
+        i += step
+    assert streamer.values == deltas == {"executive summary": value["executive summary"], "accuracy": "80/100"}
@@ -0,0 +1,89 @@
+import asyncio
+import functools
+
+import pipeline.single_flight as sf
+import storage.job_queue as jq
+
+
+def test_waiting_process_takes_the_lease_holders_result(tmp_path, monkeypatch):
+    db_path = str(tmp_path / "jobs.db")
+    for name in ("try_acquire_lease", "release_lease", "put_flight_result", "get_flight_result"):
+        monkeypatch.setattr(sf, name, functools.partial(getattr(jq, name), db_path=db_path))
+    monkeypatch.setattr(sf, "LEASE_POLL_SECONDS", 0.01)
+    key = sf.flight_key("Coffee reduces disease risk", 3)
+    runs = []
+
+    async def run():
+        runs.append(1)
+        return {"ok": True, "run": len(runs)}
+
+    async def other_process_finishes():
+        await asyncio.sleep(0.05)
+        jq.put_flight_result(key, {"ok": True, "run": "other"}, 60, db_path)
+        jq.release_lease(key, "other", db_path)
+
+    async def main():
+        assert jq.try_acquire_lease(key, "other", 60, db_path)
+        waiter = asyncio.ensure_future(sf.with_lease(key, run, owner="this", on_shared=shared.append))
+        await other_process_finishes()
+        return await waiter
+
+    shared = []
+    assert asyncio.run(main()) == {"ok": True, "run": "other"}
+    assert runs == [] and shared == [{"ok": True, "run": "other"}]
+    # Without a waiting period there is nothing to share: the pipeline runs.
+    assert asyncio.run(sf.with_lease(key, run, owner="this")) == {"ok": True, "run": 1}
+
+
+def test_lease_of_a_hung_run_is_renewed_for_max_seconds_only(tmp_path, monkeypatch):
+    db_path = str(tmp_path / "jobs.db")
+    for name in ("try_acquire_lease", "release_lease", "put_flight_result", "get_flight_result"):
+        monkeypatch.setattr(sf, name, functools.partial(getattr(jq, name), db_path=db_path))
+    monkeypatch.setattr(sf, "LEASE_SECONDS", 0.6)
+    key = sf.flight_key("Coffee reduces disease risk", 3)
+
+    async def hang():
+        await asyncio.sleep(10)
+
+    async def main():
+        holder = asyncio.ensure_future(sf.with_lease(key, hang, owner="this", max_seconds=0.9))
+        await asyncio.sleep(1.0)
+        renewed = not jq.try_acquire_lease(key, "other", 60, db_path)
+        await asyncio.sleep(1.2)
+        expired = jq.try_acquire_lease(key, "other", 60, db_path)
+        holder.cancel()
+        return renewed, expired
+
+    assert asyncio.run(main()) == (True, True)
+
+
+def test_run_is_cancelled_when_its_last_caller_gives_up():
+    flights = sf.SingleFlight()
+    started, cancelled = [], []
+
+    async def run():
+        started.append(1)
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.append(1)
+            raise
+        return "done"
+
+    async def main():
+        first = asyncio.ensure_future(flights.do("key", run))
+        second = asyncio.ensure_future(flights.do("key", run))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        await asyncio.sleep(0.01)
+        assert cancelled == [] and flights.in_flight() == 1     # the second caller still waits
+        second.cancel()
+        await asyncio.sleep(0.01)
+        assert cancelled == [1] and flights.in_flight() == 0
+        third = asyncio.ensure_future(flights.do("key", run))  # a new request starts a new run
+        await asyncio.sleep(0.01)
+        assert len(started) == 2
+        third.cancel()
+        await asyncio.sleep(0.01)
+
+    asyncio.run(main())
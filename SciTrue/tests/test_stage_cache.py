@@ -0,0 +1,24 @@
+import storage.stage_cache as sc
+
+
+def test_running_total_tracks_puts_replacements_and_eviction(tmp_path, monkeypatch):
+    db_path = str(tmp_path / "stage_cache.db")
+    blob_size = len(sc.pickle.dumps("x" * 1000, protocol=sc.pickle.HIGHEST_PROTOCOL))
+    monkeypatch.setattr(sc, "STAGE_CACHE_MAX_BYTES", blob_size * 10)
+    for i in range(10):
+        sc.put_cached(f"k{i}", "summary", "x" * 1000, db_path)
+    sc.put_cached("k0", "summary", "x" * 1000, db_path)     # replacement, same size
+    conn = sc._connect(db_path)
+    stored = conn.execute("SELECT SUM(size) FROM stage_cache").fetchone()[0]
+    assert sc._total(conn, db_path) == stored == blob_size * 10
+
+    sc.put_cached("k10", "summary", "x" * 1000, db_path)    # over the cap: evict down to 90%
+    stored = conn.execute("SELECT SUM(size) FROM stage_cache").fetchone()[0]
+    assert stored <= blob_size * 9
+    assert sc._total(conn, db_path) == stored
+    assert sc.get_cached("k10", "summary", db_path) == "x" * 1000
+
+
+def test_model_is_part_of_the_key():
+    assert sc.stage_key("summary", "p", "1", "gpt-4o") != sc.stage_key("summary", "p", "1", "gpt-4o-mini")
+    assert sc.stage_key("summary", "p", "1") == sc.stage_key("summary", "p", "1", sc.completion_model())